@@ -2,25 +2,27 @@
 """
 Simple, beginner-friendly Loan Automation orchestrator using LangGraph.
 - Uses a dict as the state schema (avoids LangGraph schema warning).
-- Uses SqliteSaver checkpointer correctly (requires configurable keys on invoke).
+- Uses a tuned SqliteSaver checkpointer (checkpointing.py: WAL, batched commits,
+  pruning of finished threads; requires configurable keys on invoke).
 - Calls your existing tools.perform_underwriting and generate_sanction_letter.
-- Adds an LLM explanation via gemini_api.call_gemini.
+- Adds an LLM explanation via llm_batcher.explainer (micro-batched, deadline +
+  templated fallback).
+- Talks to the user through session_io.ask/say (the console by default), so
+  replay.py can drive the same graph headless from scripted sessions.
 """
 
-import sqlite3
+import threading
+import time
+import uuid
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.sqlite import SqliteSaver
 
 # local helpers (must exist in your tools.py and gemini_api.py)
-from tools import verify_kyc, verify_phone, perform_underwriting, generate_sanction_letter, chat_with_customer
-from gemini_api import call_gemini
-
-# ----------------------------
-# Checkpointer (SqliteSaver)
-# ----------------------------
-# create sqlite connection (allow multi-threading)
-_conn = sqlite3.connect("checkpoints.sqlite", check_same_thread=False)
-_checkpointer = SqliteSaver(_conn)  # your requested saver
+from tools import resolve_customer, verify_kyc, verify_phone, perform_underwriting, generate_sanction_letter, chat_with_customer
+from llm_guard import guarded_call, template_explanation
+from llm_batcher import explainer
+from checkpointing import get_checkpointer
+from session_io import ScriptedIO, ask, say, use_io
+from tracing import span, traced
 
 # ----------------------------
 # Initial state factory
@@ -32,6 +34,8 @@ def create_initial_state():
     """
     return {
         "customer_name": "",
+        "customer_id": None,  # set by verification from the typed name
+        "session_id": None,   # the checkpoint thread id; tags audit log records
         "loan_amount": 0.0,
         "kyc_verified": False,
         "underwriting_result": None,
@@ -43,27 +47,28 @@ def create_initial_state():
 # Worker Agents (simple and explicit)
 # ----------------------------
 
+@traced("node.sales")
 def sales_agent(state: dict):
-    print("\n💬 Sales Agent (Riya): Hello! I’m Riya from LoanMart. How can I help you today?")
+    say("\n💬 Sales Agent (Riya): Hello! I’m Riya from LoanMart. How can I help you today?")
 
     # Step 1: Ask user reason for loan (friendly chat)
-    user_input = input("You: ").strip()
+    user_input = ask("You: ").strip()
 
     # Step 2: Ask full name (if not already in state)
     if not state.get("customer_name"):
-        print("💬 Sales Agent (Riya): Great! Could you please tell me your full name?")
-        state["customer_name"] = input("You: ").strip()
+        say("💬 Sales Agent (Riya): Great! Could you please tell me your full name?")
+        state["customer_name"] = ask("You: ").strip()
 
     # Step 3: Ask loan amount
     if not state.get("loan_amount"):
-        print(f"💬 Sales Agent (Riya): Thanks, {state['customer_name']}! How much would you like to borrow?")
+        say(f"💬 Sales Agent (Riya): Thanks, {state['customer_name']}! How much would you like to borrow?")
         while True:
-            val = input("You: ").strip()
+            val = ask("You: ").strip()
             try:
                 state["loan_amount"] = float(val.replace("₹", "").replace(",", ""))
                 break
             except Exception:
-                print("💬 Sales Agent: Please enter a valid numeric amount (e.g., 50000).")
+                say("💬 Sales Agent: Please enter a valid numeric amount (e.g., 50000).")
 
   
 
@@ -74,8 +79,8 @@ def sales_agent(state: dict):
             f"They want a loan of ₹{state['loan_amount']}. "
             "Respond as a friendly, convincing Sales Agent guiding them to proceed and make it breif."
         )
-        reply = call_gemini(prompt)
-        print(f"💬 Sales Agent (Riya): {reply}")
+        reply = guarded_call(prompt, fallback="Great choice! Let's quickly verify your details so we can get your loan moving.")
+        say(f"💬 Sales Agent (Riya): {reply}")
     except Exception as e:
         print(f"[LLM Error] {e}")
 
@@ -84,65 +89,70 @@ def sales_agent(state: dict):
     return state
 
 
+@traced("node.verify_kyc")
 def verification_agent(state: dict):
-    print("\n🧍 VERIFICATION AGENT:")
+    say("\n🧍 VERIFICATION AGENT:")
     
-    # Step 1: Check if KYC exists
-    kyc_result = verify_kyc(state["customer_name"])
+    # Step 1: Match the typed name to a customer, then check KYC by customer_id.
+    # The record's own name is only used once the phone check passes, so a
+    # near-miss never reveals another customer's name.
+    match = resolve_customer(state["customer_name"])
+    if match.get("status") == "success":
+        state["customer_id"] = match["customer_id"]
+    kyc_result = verify_kyc(state.get("customer_id") or state["customer_name"])
     if not (isinstance(kyc_result, dict) and kyc_result.get("status") == "success"):
-        print(" KYC record not found in CRM.")
+        say(" KYC record not found in CRM.")
         state["kyc_verified"] = False
         state["underwriting_result"] = {"decision": "REJECT", "reason": "KYC not found"}
         state["__next__"] = END
         return state
     
     # Step 2: Ask last 4 digits of phone for verification
-    last4 = input("Enter last 4 digits of your mobile number for verification: ").strip()
-    phone_result = verify_phone(state["customer_name"], last4)
+    last4 = ask("Enter last 4 digits of your mobile number for verification: ").strip()
+    phone_result = verify_phone(state.get("customer_id") or state["customer_name"], last4, kyc_result=kyc_result)
     
     if phone_result.get("status") == "success":
         state["kyc_verified"] = True
-        print("✅ KYC + Phone Verified!")
+        state["customer_name"] = kyc_result["kyc"]["full_name"]
+        say(f"✅ KYC + Phone Verified! Welcome, {state['customer_name']}.")
         state["__next__"] = "underwriting"
     else:
         state["kyc_verified"] = False
         state["underwriting_result"] = {"decision": "REJECT", "reason": phone_result.get("message", "Phone verification failed")}
-        print(f"❌ Verification failed: {phone_result.get('message')}")
+        say(f"❌ Verification failed: {phone_result.get('message')}")
         state["__next__"] = END
 
     return state
 
 
+@traced("node.underwriting")
 def underwriting_agent(state: dict):
-    print("\n💼 UNDERWRITING AGENT:")
+    say("\n💼 UNDERWRITING AGENT:")
 
     # safety: check KYC flag
     if not state.get("kyc_verified"):
-        print("⚠️ Cannot proceed — KYC not verified.")
+        say("⚠️ Cannot proceed — KYC not verified.")
         state["underwriting_result"] = {"decision": "REJECT", "reason": "KYC not verified"}
         state["__next__"] = END
         return state
 
-    result = perform_underwriting(state["customer_name"], state["loan_amount"])
+    result = perform_underwriting(state.get("customer_id") or state["customer_name"], state["loan_amount"],
+                                  session_id=state.get("session_id"))
     state["underwriting_result"] = result
 
     decision = result.get("decision")
     reason = result.get("reason", "")
-    print(f"Decision: {decision} | Reason: {reason}")
+    say(f"Decision: {decision} | Reason: {reason}")
 
     #  Show uploaded file if available
     if "uploaded_slip" in result:
-        print(f"📎 Uploaded slip: {result['uploaded_slip']}")
+        say(f"📎 Uploaded slip: {result['uploaded_slip']}")
 
-    # Ask Gemini for friendly explanation
+    # Ask Gemini for friendly explanation (the decision above is already final;
+    # a slow or failing LLM only swaps this sentence for the template)
     try:
-        prompt = (
-            f"Customer {state['customer_name']} requested ₹{state['loan_amount']}. "
-            f"Underwriting returned: {decision} because: {reason}. "
-            "Please give one friendly sentence explanation for the customer."
-        )
-        explanation = call_gemini(prompt)
-        print(f"🤖 LLM says: {explanation}")
+        explanation = explainer.explain(decision, reason, fallback=template_explanation(result))
+        say(f"🤖 LLM says: {explanation}")
         state["underwriting_result"]["llm_explanation"] = explanation
     except Exception as e:
         print(f"[LLM Error] {e}")
@@ -156,24 +166,32 @@ def underwriting_agent(state: dict):
     return state
 
 
+@traced("node.sanction_letter")
 def sanction_agent(state: dict):
-    print("\n📄 SANCTION AGENT:")
+    say("\n📄 SANCTION AGENT:")
     decision = (state.get("underwriting_result") or {}).get("decision")
     if decision == "APPROVE" or decision == "APPROVED":
-        # generate_sanction_letter uses FPDF in your tools.py
-        file_path = generate_sanction_letter(state["customer_name"], state["loan_amount"])
+        # rendered by the letter_service worker pool (see letter_service.py)
+        reason = state["underwriting_result"].get("reason")
+        file_path = generate_sanction_letter(state["customer_name"], state["loan_amount"], reason)
         state["sanction_file"] = file_path
-        print(f" Sanction letter created: {file_path}")
+        say(f" Sanction letter created: {file_path}")
     else:
-        print(" Loan not approved — no sanction letter generated.")
+        say(" Loan not approved — no sanction letter generated.")
     state["__next__"] = END
     return state
 
 # ----------------------------
-# Master Agent (orchestrator) with checkpointer config
+# Graph
 # ----------------------------
-def master_agent():
-    print("🏦 Welcome to SmartLoan Automation System!")
+NODE_NAMES = ("sales", "verify_kyc", "underwriting", "sanction_letter")
+CHECKPOINT_NS = "loan_agent_ns"
+
+
+def build_graph(checkpointer=None):
+    # default: the tuned SqliteSaver shared by every graph run in the process
+    if checkpointer is None:
+        checkpointer = get_checkpointer()
 
     # Use dict as the state schema to avoid schema warnings
     workflow = StateGraph(dict)
@@ -194,30 +212,130 @@ def master_agent():
     workflow.add_edge("sanction_letter", END)
 
     # compile with checkpointer (SqliteSaver)
-    graph = workflow.compile(checkpointer=_checkpointer)
+    return workflow.compile(checkpointer=checkpointer)
 
-    # create initial state
-    state = create_initial_state()
 
-    # get a thread id (required by LangGraph checkpointer)
-    # we use customer_name as thread id (ask if empty). This makes the checkpoint keyed per user.
-    if not state.get("customer_name"):
-        name = input("Enter customer full name to start (this will be the checkpoint thread id): ").strip()
-        state["customer_name"] = name
+_graph = None
+_graph_lock = threading.Lock()
+
 
-    thread_id = state["customer_name"] or "loan_default_thread"
+def get_graph():
+    """
+    The compiled workflow, built once per process and shared by every session.
+    A compiled graph holds no per-run state (that lives in the checkpointer,
+    keyed by thread id), so any number of sessions can run through it at once.
+    """
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
 
+
+def new_thread_id() -> str:
+    """Unique checkpoint thread id for one loan application."""
+    return f"loan-{uuid.uuid4().hex}"
+
+
+def session_config(thread_id: str) -> dict:
     # LangGraph requires configurable keys like thread_id / checkpoint_ns / checkpoint_id
-    config = {"configurable": {"thread_id": str(thread_id), "checkpoint_ns": "loan_agent_ns"}}
+    return {"configurable": {"thread_id": str(thread_id), "checkpoint_ns": CHECKPOINT_NS}}
+
+
+def run_session(graph=None, customer_name: str = "", thread_id: str = None) -> tuple:
+    """
+    Run one conversation through the graph (default: the shared compiled
+    graph) with whatever ask()/say() provider is active. Returns
+    (final_state, node_timings) where node_timings is a list of
+    (node_name, seconds).
+    """
+    graph = graph if graph is not None else get_graph()
+    thread_id = thread_id or new_thread_id()
+    state = create_initial_state()
+    state["customer_name"] = customer_name
+    state["session_id"] = str(thread_id)
+    config = session_config(thread_id)
+
+    # stream node by node (the checkpointer persists state between nodes) and
+    # time each step; with a dict schema every update is the full state
+    timings = []
+    final_state = state
+    with span("agent.session", thread_id=str(thread_id)):
+        last = time.perf_counter()
+        for update in graph.stream(state, config=config, stream_mode="updates"):
+            now = time.perf_counter()
+            for node, value in update.items():
+                timings.append((node, now - last))
+                if isinstance(value, dict):
+                    final_state = value
+            last = now
+
+        # conversation is over: keep only its final checkpoint (pruned after the retention period)
+        if graph.checkpointer is not None and hasattr(graph.checkpointer, "finish_thread"):
+            graph.checkpointer.finish_thread(thread_id)
+    return final_state, timings
+
+
+def run_scripted_session(graph, script: dict, echo: bool = False) -> dict:
+    """
+    Headless run of one scripted session:
+    {"session_id": ..., "customer_name": ..., "inputs": ["reason", "50000", "3210", ...]}
+    Returns the outcome, transcript and per-node timings.
+    """
+    # the script's session_id is only a label: re-running a file must not
+    # resume the checkpoints of an earlier run
+    thread_id = new_thread_id()
+    session_id = script.get("session_id") or thread_id
+    io = ScriptedIO(script.get("inputs", []), echo=echo)
+    start = time.perf_counter()
+    error = None
+    final_state, timings = {}, []
+    with use_io(io):
+        try:
+            final_state, timings = run_session(graph, script.get("customer_name", ""), thread_id)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    result = final_state.get("underwriting_result") or {}
+    return {
+        "session_id": session_id,
+        "thread_id": thread_id,
+        "customer_name": script.get("customer_name", ""),
+        "decision": result.get("decision"),
+        "reason": result.get("reason"),
+        "sanction_file": final_state.get("sanction_file"),
+        "error": error,
+        "duration_s": round(time.perf_counter() - start, 6),
+        "node_timings": timings,
+        "transcript": io.transcript,
+    }
+
+
+# ----------------------------
+# Master Agent (orchestrator) with checkpointer config
+# ----------------------------
+def master_agent():
+    print("🏦 Welcome to SmartLoan Automation System!")
+
+    # compiled once; every application below runs through the same graph
+    graph = get_graph()
+
+    while True:
+        name = ask("Enter customer full name to start: ").strip()
+        # each application gets its own checkpoint thread, so two applications
+        # from the same customer never share (or overwrite) checkpoints
+        thread_id = new_thread_id()
+        print(f"[Session] {thread_id}")
+
+        state, _ = run_session(graph, name, thread_id)
 
-    # invoke graph with config so checkpointer knows where to store/load checkpoints
-    # graph.invoke will persist state between nodes via checkpointer
-    graph.invoke(state, config=config)
+        print("\n🎉 Process completed. Thank you for using SmartLoan!")
+        print("Final underwriting result:", state.get("underwriting_result"))
+        if state.get("sanction_file"):
+            print("Sanction file:", state["sanction_file"])
 
-    print("\n🎉 Process completed. Thank you for using SmartLoan!")
-    print("Final underwriting result:", state.get("underwriting_result"))
-    if state.get("sanction_file"):
-        print("Sanction file:", state["sanction_file"])
+        if ask("\nStart another application? (y/n): ").strip().lower() not in ("y", "yes"):
+            break
 
 # ----------------------------
 # CLI entrypoint
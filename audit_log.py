@@ -0,0 +1,426 @@
+# file: audit_log.py
+"""
+Durable, append-only log of underwriting decisions.
+
+    record_decision("perform_underwriting", "TC-100001", 50000, result, session_id=...)
+
+- record_decision() only enqueues the record; the caller never waits for
+  the disk. When the queue is full it blocks instead of dropping: the trail
+  must be complete.
+- A background writer takes everything queued, appends it to the current
+  segment as JSON lines and fsyncs once for the whole batch (group commit).
+  While one fsync runs the next batch builds up, so fsyncs per decision
+  fall as load rises. flush() waits until everything queued is on disk.
+- A failed write (disk full, I/O error, ...) is retried in a fresh segment
+  a few times. If it keeps failing, the log is marked failed and record()
+  switches to writing synchronously; if that fails too, the OSError is
+  raised to the caller, never a silent drop or an endless wait.
+- Each process writes its own segments, so several workers can share
+  AUDIT_LOG_DIR:
+      <dir>/decisions-<start time>-<pid>-<n>.jsonl
+  A segment is sealed at AUDIT_SEGMENT_BYTES. Sealing writes a small
+  .idx summary next to it (time range, count, decisions), which lets
+  queries skip whole segments.
+- query() / the CLI scan the segments. Customer and decision filters are
+  matched on raw bytes first (records use a fixed key order), so only
+  matching lines get parsed.
+
+    python audit_log.py --customer TC-100001
+    python audit_log.py --decision REJECT --since 2026-10-01 --until 2026-10-02 --count
+
+AUDIT_LOG_DIR="" turns the log off.
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import mmap
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", "audit_log")
+AUDIT_SEGMENT_BYTES = int(os.getenv("AUDIT_SEGMENT_BYTES", 64 * 1024 * 1024))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 100000))
+MAX_BATCH = 4096
+WRITE_RETRIES = 3
+RETRY_DELAY_SECONDS = 0.05  # doubled on every retry
+
+# record layout; the order is fixed so query() can match fields as bytes
+FIELDS = ("ts", "tool", "customer", "session", "amount", "decision", "reason")
+
+
+def _json_default(value):
+    # NumPy scalars (loan_math results)
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def encode_record(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+            + "\n").encode("utf-8")
+
+
+class AuditLog:
+    """Queue + background group-commit writer over rotating segment files."""
+
+    def __init__(self, directory: str = AUDIT_LOG_DIR, segment_bytes: int = AUDIT_SEGMENT_BYTES,
+                 queue_size: int = AUDIT_QUEUE_SIZE, fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"records": 0, "batches": 0, "fsyncs": 0, "segments": 0, "max_batch": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._prefix = f"decisions-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._segment_no = 0
+        self._file = None
+        self._summary = None
+        self._closed = False
+        self.failed = None  # the error that stopped the writer, once it has
+        self._stranded = []  # records the writer couldn't write before it stopped
+        self._sync_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, record: dict):
+        """Queue one decision record (FIELDS first, extras after); returns at once unless the log failed."""
+        while self.failed is None:
+            try:
+                self.queue.put(record, timeout=0.5)
+                return
+            except queue.Full:
+                continue  # the writer is behind; wait, but notice if it dies
+        self._write_sync([record])
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far is fsynced; False on timeout."""
+        if self.failed is not None:
+            self._write_sync([])
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        if not done.wait(timeout):
+            return False
+        if self.failed is not None:
+            self._write_sync([])
+        return True
+
+    def close(self):
+        """Write out the queue, seal the current segment and stop the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        while self.failed is None:
+            try:
+                self.queue.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+        if self.failed is not None:
+            try:
+                self._write_sync([])
+            except OSError as e:
+                print(f"[Audit] {len(self._stranded)} decision records could not be written: {e}")
+            self._seal()
+
+    # ----------------------------
+    # Writer thread
+    # ----------------------------
+    def _run(self):
+        batch = []
+        try:
+            stop = False
+            while not stop:
+                batch = [self.queue.get()]
+                while len(batch) < MAX_BATCH:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                records, waiters = [], []
+                for item in batch:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        records.append(item)
+                if records:
+                    self._commit_retrying(records)
+                for waiter in waiters:
+                    waiter.set()
+                batch = []
+        except Exception as e:
+            print(f"[Audit] Audit writer stopped: {e}; writing synchronously from now on")
+            self._stranded = [item for item in batch if isinstance(item, dict)]
+            self.failed = e
+            # whatever is still queued is picked up by the next synchronous write
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            self._drain()
+        finally:
+            if self.failed is None:
+                self._seal()
+
+    def _drain(self):
+        """Move queued records to _stranded and release flush() waiters (after the writer stopped)."""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not None:
+                self._stranded.append(item)
+
+    def _write_sync(self, records: list):
+        """Write stranded, still-queued and new records in the caller's thread; raises OSError on failure."""
+        with self._sync_lock:
+            self._drain()
+            self._stranded.extend(records)
+            if self._stranded:
+                self._commit(self._stranded)
+                self._stranded = []
+
+    def _commit_retrying(self, records: list):
+        for attempt in range(WRITE_RETRIES):
+            try:
+                return self._commit(records)
+            except OSError as e:
+                print(f"[Audit] Audit write failed ({e}); retrying in a new segment")
+                time.sleep(RETRY_DELAY_SECONDS * 2 ** attempt)
+        self._commit(records)
+
+    def _commit(self, records: list):
+        """Append one batch and fsync it: one disk sync for the whole group."""
+        if self._file is not None and self._file.tell() >= self.segment_bytes:
+            self._seal()
+        if self._file is None:
+            self._open_segment()
+        start = self._file.tell()
+        try:
+            self._append(b"".join(encode_record(record) for record in records))
+        except OSError:
+            self._abandon_segment(start)
+            raise
+        for record in records:
+            self._summarize(record)
+        if self.fsync:
+            self.stats["fsyncs"] += 1
+        self.stats["records"] += len(records)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(records))
+
+    def _append(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _abandon_segment(self, good_size: int):
+        """After a failed write: cut the segment back to its last good batch and seal it, as far as possible."""
+        path = self._file.name
+        try:
+            self._file.close()
+        except OSError:
+            pass  # closing flushes the same unwritable buffer
+        self._file = None
+        try:
+            os.truncate(path, good_size)
+            self._write_summary(path)
+        except OSError:
+            pass  # a torn last line is skipped by query()
+
+    def _open_segment(self):
+        self._segment_no += 1
+        path = os.path.join(self.directory, f"{self._prefix}-{self._segment_no:04d}.jsonl")
+        self._file = open(path, "ab")
+        self._summary = {"min_ts": None, "max_ts": None, "count": 0, "decisions": Counter()}
+        self.stats["segments"] += 1
+        if self.fsync:
+            # make the new file's directory entry durable too
+            fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _summarize(self, record: dict):
+        s, ts = self._summary, record.get("ts", 0)
+        s["min_ts"] = ts if s["min_ts"] is None else min(s["min_ts"], ts)
+        s["max_ts"] = ts if s["max_ts"] is None else max(s["max_ts"], ts)
+        s["count"] += 1
+        s["decisions"][str(record.get("decision"))] += 1
+
+    def _seal(self):
+        """Close the current segment and write its .idx summary."""
+        if self._file is None:
+            return
+        file, self._file = self._file, None
+        file.close()
+        self._write_summary(file.name)
+
+    def _write_summary(self, path: str):
+        with open(path[:-len(".jsonl")] + ".idx", "w") as f:
+            json.dump(self._summary, f)
+
+
+# ----------------------------
+# Shared instance + hook for the underwriting tools
+# ----------------------------
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_audit_log():
+    """The process-wide AuditLog under AUDIT_LOG_DIR (None when disabled)."""
+    global _log
+    if _log is None and AUDIT_LOG_DIR:
+        with _log_lock:
+            if _log is None:
+                _log = AuditLog(AUDIT_LOG_DIR)
+                atexit.register(_log.close)
+    return _log
+
+
+def record_decision(tool: str, customer: str, amount: float, result: dict, session_id: str = None, **extra):
+    """Append an underwriting decision (`result` as the tool returns it) to the audit log."""
+    log = get_audit_log()
+    if log is None:
+        return
+    decision = result.get("decision") or result.get("loan_status")
+    record = {"ts": round(time.time(), 6), "tool": tool, "customer": customer, "session": session_id,
+              "amount": amount, "decision": decision, "reason": result.get("reason")}
+    for key in ("emi", "max_borrowable"):
+        if key in result:
+            record[key] = result[key]
+    record.update((key, value) for key, value in extra.items() if value is not None)
+    log.record(record)
+
+
+# ----------------------------
+# Query
+# ----------------------------
+def _segments(directory: str) -> list:
+    return sorted(glob.glob(os.path.join(directory, "decisions-*.jsonl")))
+
+
+def _summary(segment: str):
+    try:
+        with open(segment[:-len(".jsonl")] + ".idx") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # still being written (or crashed before sealing): scan it
+
+
+def _lines_containing(data, needles: list):
+    """Lines of `data` (bytes-like) containing every needle, found with find() instead of parsing."""
+    first, rest = needles[0], needles[1:]
+    pos = data.find(first)
+    while pos != -1:
+        start = data.rfind(b"\n", 0, pos) + 1
+        end = data.find(b"\n", pos)
+        if end == -1:
+            end = len(data)
+        line = data[start:end]
+        if all(n in line for n in rest):
+            yield line
+        pos = data.find(first, end)
+
+
+def _all_lines(data):
+    start = 0
+    while start < len(data):
+        end = data.find(b"\n", start)
+        if end == -1:
+            end = len(data)
+        yield data[start:end]
+        start = end + 1
+
+
+def query(directory: str = AUDIT_LOG_DIR, customer: str = None, decision: str = None,
+          since: float = None, until: float = None):
+    """
+    Yield the decision records matching every given filter: `customer`
+    (exact), `decision` (prefix, so "APPROVE" also matches "APPROVED"), and
+    `since` <= ts < `until` (epoch seconds).
+    """
+    needles = []
+    if customer is not None:
+        needles.append(b'"customer":' + json.dumps(customer, ensure_ascii=False).encode("utf-8") + b",")
+    if decision is not None:
+        needles.append(b'"decision":"' + decision.encode("utf-8"))
+
+    for segment in _segments(directory):
+        summary = _summary(segment)
+        if summary is not None:
+            if not summary["count"]:
+                continue
+            if since is not None and summary["max_ts"] < since:
+                continue
+            if until is not None and summary["min_ts"] >= until:
+                continue
+            if decision is not None and not any(d.startswith(decision) for d in summary["decisions"]):
+                continue
+        with open(segment, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                continue
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                lines = _lines_containing(data, needles) if needles else _all_lines(data)
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    ts = record.get("ts", 0)
+                    if since is not None and ts < since:
+                        continue
+                    if until is not None and ts >= until:
+                        continue
+                    if customer is not None and record.get("customer") != customer:
+                        continue
+                    if decision is not None and not str(record.get("decision")).startswith(decision):
+                        continue
+                    yield record
+
+
+def _parse_time(value: str) -> float:
+    """Epoch seconds or an ISO date/time (local time)."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the underwriting decision audit log.")
+    parser.add_argument("--dir", default=AUDIT_LOG_DIR or "audit_log")
+    parser.add_argument("--customer", help="customer id (or name, as it was passed to underwriting)")
+    parser.add_argument("--decision", help="APPROVE, REJECT, PAYSALARY_REQUIRED, ... (prefix match)")
+    parser.add_argument("--since", type=_parse_time, help="epoch seconds or ISO time, inclusive")
+    parser.add_argument("--until", type=_parse_time, help="epoch seconds or ISO time, exclusive")
+    parser.add_argument("--count", action="store_true", help="print only the number of matches")
+    args = parser.parse_args()
+
+    records = query(args.dir, args.customer, args.decision, args.since, args.until)
+    if args.count:
+        print(sum(1 for _ in records))
+        return
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
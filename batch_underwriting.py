@@ -0,0 +1,277 @@
+# file: batch_underwriting.py
+"""
+Batch underwriting for whole application files.
+
+Reads a JSONL or CSV file of applications (`name` or `customer_id`, plus
+`loan_amount`), resolves every applicant with a single store lookup, and then
+applies the same rules as tools.perform_underwriting on NumPy columns:
+
+1. Reject if customer data is missing or credit score < 700.
+2. Approve if loan <= pre-approved limit.
+3. If loan <= 2x limit, approve only if EMI <= 50% of monthly salary
+   (salary from the customer's financial profile, since there is no slip
+   upload in a batch run).
+4. Reject if loan > 2x limit.
+
+Usage:
+    python batch_underwriting.py applications.jsonl decisions.jsonl
+    python batch_underwriting.py applications.csv decisions.csv --letters
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+import weakref
+
+import numpy as np
+
+from customer_store import get_customer_store
+from eligibility import MIN_CREDIT_SCORE
+from loan_math import SALARY_EMI_RATIO, emi as loan_emi
+
+OUTPUT_FIELDS = ["customer_key", "customer_id", "loan_amount", "decision", "reason", "emi", "sanction_file"]
+
+
+# ----------------------------
+# Reading / writing application files
+# ----------------------------
+def _is_csv(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() == ".csv"
+
+
+def read_applications(path: str) -> list:
+    """Return a list of application dicts from a JSONL or CSV file."""
+    with open(path, "r", newline="") as f:
+        if _is_csv(path):
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_decisions(path: str, rows: list):
+    """Write decision rows to a JSONL or CSV file (format picked from the extension)."""
+    with open(path, "w", newline="") as f:
+        if _is_csv(path):
+            fields = OUTPUT_FIELDS + (["explanation"] if rows and "explanation" in rows[0] else [])
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+
+
+def _parse_amount(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace("₹", "").replace(",", ""))
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+# ----------------------------
+# Columnar decision engine
+# ----------------------------
+# decision codes, in rule priority order (the first matching rule wins)
+MISSING, LOW_SCORE, INVALID_AMOUNT, WITHIN_LIMIT, EMI_OK, EMI_TOO_HIGH, OVER_2X = range(7)
+
+DECISIONS = np.array(["REJECT", "REJECT", "REJECT", "APPROVE", "APPROVE", "REJECT", "REJECT"], dtype=object)
+FIXED_REASONS = np.array([
+    "Customer data missing",
+    None,  # formatted per row
+    "Invalid loan amount",
+    "Within pre-approved limit",
+    None,  # formatted per row
+    None,  # formatted per row
+    "Loan exceeds 2× pre-approved limit",
+], dtype=object)
+
+# per-snapshot column cache: built once, reused by every batch run against that
+# version of the customer data (a hot reload brings a new snapshot)
+_columns_cache = weakref.WeakKeyDictionary()
+
+
+def profile_columns(snapshot) -> dict:
+    """
+    Credit score, limit, salary and customer_id as arrays indexed by snapshot row.
+    Each array has one extra zero/None row at the end, so row -1 (unknown
+    customer) indexes a harmless sentinel instead of needing a mask.
+    """
+    cols = _columns_cache.get(snapshot)
+    if cols is None:
+        column = lambda field: np.append(np.asarray(snapshot.field_values(field), dtype=np.float64), 0.0)  # noqa: E731
+        cols = {
+            "customer_id": np.array(snapshot.field_values("customer_id") + [None], dtype=object),
+            "score": column("credit_score"),
+            "limit": column("pre_approved_limit"),
+            "salary": column("monthly_salary"),
+        }
+        _columns_cache[snapshot] = cols
+    return cols
+
+
+def underwrite_batch(applications: list, store=None) -> list:
+    """
+    Decide every application in one pass and return one result dict per row,
+    in input order.
+    """
+    store = store if store is not None else get_customer_store()
+    snapshot = store.snapshot()  # one consistent data version for the whole batch
+    n = len(applications)
+
+    # one index lookup per row; everything after this is array arithmetic
+    keys = [app.get("customer_id") or app.get("name") or "" for app in applications]
+    rows = np.fromiter((snapshot.row_of(k) for k in keys), dtype=np.int64, count=n)
+    amount = np.fromiter((_parse_amount(app.get("loan_amount")) for app in applications), dtype=np.float64, count=n)
+
+    cols = profile_columns(snapshot)
+    found = rows >= 0
+    score = cols["score"][rows]
+    limit = cols["limit"][rows]
+    salary = cols["salary"][rows]
+    customer_ids = cols["customer_id"][rows].tolist()
+
+    emi = loan_emi(amount)  # same EMI as tools.perform_underwriting
+
+    invalid = np.isnan(amount)
+    low_score = found & (score < MIN_CREDIT_SCORE)
+    eligible = found & ~low_score & ~invalid
+    within_limit = eligible & (amount <= limit)
+    in_band = eligible & ~within_limit & (amount <= 2 * limit)
+    emi_ok = in_band & (emi <= SALARY_EMI_RATIO * salary)
+    emi_too_high = in_band & ~emi_ok
+
+    codes = np.select(
+        [~found, low_score, invalid, within_limit, emi_ok, emi_too_high],
+        [MISSING, LOW_SCORE, INVALID_AMOUNT, WITHIN_LIMIT, EMI_OK, EMI_TOO_HIGH],
+        default=OVER_2X,
+    )
+
+    decisions = DECISIONS[codes]
+    reasons = FIXED_REASONS[codes]
+    # only the score/EMI reasons carry numbers, so only those rows are formatted
+    for i in np.flatnonzero(codes == LOW_SCORE):
+        reasons[i] = f"Low credit score: {int(score[i])}"
+    for i in np.flatnonzero(codes == EMI_OK):
+        reasons[i] = f"EMI ₹{emi[i]:,.2f} within 50% salary"
+    for i in np.flatnonzero(codes == EMI_TOO_HIGH):
+        reasons[i] = f"EMI ₹{emi[i]:,.2f} exceeds 50% salary"
+
+    emi_out = np.where(in_band, np.round(emi, 2), np.nan).tolist()
+    amount_out = amount.tolist()
+    nan_to_none = lambda v: None if v != v else v
+
+    return [
+        {
+            "customer_key": key,
+            "customer_id": cid,
+            "loan_amount": nan_to_none(amt),
+            "decision": decision,
+            "reason": reason,
+            "emi": nan_to_none(e),
+            "sanction_file": None,
+        }
+        for key, cid, amt, decision, reason, e in zip(keys, customer_ids, amount_out, decisions, reasons, emi_out)
+    ]
+
+
+def render_letters(results: list, store=None):
+    """Render sanction letters for every approved row in bulk (sets `sanction_file`)."""
+    from letter_service import letter_service
+
+    store = store if store is not None else get_customer_store()
+    approved = [r for r in results if r["decision"] == "APPROVE"]
+    letters = []
+    for r in approved:
+        c = store.get_by_id(r["customer_id"])
+        letters.append((c["full_name"] if c else r["customer_key"], r["loan_amount"], r["reason"]))
+    for r, path in zip(approved, letter_service.render_many(letters)):
+        r["sanction_file"] = path
+
+
+def add_explanations(results: list) -> dict:
+    """
+    Attach a friendly LLM sentence (`explanation`) to every row. Requests go
+    through the micro-batcher, so N rows cost about N / LLM_BATCH_MAX calls;
+    rows the LLM doesn't answer get the templated sentence.
+    """
+    from llm_batcher import explainer
+    from llm_guard import template_explanation
+
+    items = [(r["decision"], r["reason"]) for r in results]
+    fallbacks = [template_explanation(r) for r in results]
+    for r, text in zip(results, explainer.explain_many(items, fallbacks)):
+        r["explanation"] = text
+    return explainer.summary()
+
+
+def run_batch(input_path: str, output_path: str, store=None, letters: bool = False,
+              explain: bool = False) -> dict:
+    """Underwrite an application file and write decisions; returns run stats."""
+    start = time.perf_counter()
+    applications = read_applications(input_path)
+    read_s = time.perf_counter() - start
+
+    decide_start = time.perf_counter()
+    results = underwrite_batch(applications, store=store)
+    decide_s = time.perf_counter() - decide_start
+
+    letters_s = 0.0
+    if letters:
+        letters_start = time.perf_counter()
+        render_letters(results, store=store)
+        letters_s = time.perf_counter() - letters_start
+
+    explain_s = 0.0
+    llm = None
+    if explain:
+        explain_start = time.perf_counter()
+        llm = add_explanations(results)
+        explain_s = time.perf_counter() - explain_start
+
+    write_start = time.perf_counter()
+    write_decisions(output_path, results)
+    write_s = time.perf_counter() - write_start
+
+    total_s = time.perf_counter() - start
+    approved = sum(1 for r in results if r["decision"] == "APPROVE")
+    return {
+        "rows": len(results),
+        "approved": approved,
+        "rejected": len(results) - approved,
+        "read_s": round(read_s, 4),
+        "decide_s": round(decide_s, 4),
+        "letters_s": round(letters_s, 4),
+        "explain_s": round(explain_s, 4),
+        "llm": llm,
+        "write_s": round(write_s, 4),
+        "rows_per_s": round(len(results) / total_s, 1) if total_s > 0 else None,
+    }
+
+
+# ----------------------------
+# CLI entrypoint
+# ----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Underwrite a JSONL/CSV file of loan applications.")
+    parser.add_argument("input", help="applications file (.jsonl or .csv)")
+    parser.add_argument("output", help="decisions file (.jsonl or .csv)")
+    parser.add_argument("--letters", action="store_true", help="also render sanction letters for approvals")
+    parser.add_argument("--explain", action="store_true", help="add a micro-batched LLM explanation per row")
+    args = parser.parse_args()
+
+    stats = run_batch(args.input, args.output, letters=args.letters, explain=args.explain)
+    print(f"[Batch] {stats['rows']} applications → {stats['approved']} approved, {stats['rejected']} rejected")
+    print(f"[Batch] read {stats['read_s']}s | decide {stats['decide_s']}s | letters {stats['letters_s']}s "
+          f"| write {stats['write_s']}s "
+          f"| {stats['rows_per_s']} rows/s")
+    if stats["llm"]:
+        llm = stats["llm"]
+        print(f"[Batch] explain {stats['explain_s']}s | {llm['requests']} explanations "
+              f"({llm['cache_hits']} cached) in {llm['upstream_calls']} LLM calls "
+              f"| {llm['items_per_call']} items/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# file: benchmarks/bench_agent_replay.py
+"""
+Sessions/sec and per-node latency of the agent graph driven headless by
+replay.py, on a thread pool and on a process pool.
+
+Sessions are scripted over the customers in customers.json (run from the
+repo root). Set LLM_DEADLINE_SECONDS low (or point the guard at a fast
+model) so LLM time doesn't dominate the numbers.
+
+    python benchmarks/bench_agent_replay.py --sessions 400 --workers 1,8,32
+"""
+
+import argparse
+import os
+
+from synthetic_data import REPO_ROOT, make_sessions
+from customer_store import load_customers
+from replay import replay, print_report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--workers", default="1,8,32")
+    parser.add_argument("--modes", default="thread,process")
+    args = parser.parse_args()
+
+    slip = os.path.join(REPO_ROOT, "dummy_salary_slip.pdf")
+    scripts = make_sessions(load_customers(), args.sessions, slip_path=slip)
+    for mode in args.modes.split(","):
+        for workers in [int(w) for w in args.workers.split(",")]:
+            print(f"\n=== mode={mode} workers={workers} ===")
+            _, report = replay(scripts, workers=workers, mode=mode)
+            print_report(report)
+
+
+if __name__ == "__main__":
+    main()
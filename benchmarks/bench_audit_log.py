@@ -0,0 +1,135 @@
+# file: benchmarks/bench_audit_log.py
+"""
+Audit log (audit_log.py) write and query performance.
+
+Write: --threads callers record --decisions underwriting decisions between
+them, through the group-committed AuditLog and, for comparison, with a
+synchronous append + fsync per decision (what writing the trail on the chat
+path would cost). Reports the latency the caller sees (p50/p99), decisions
+per second until everything is durable, and decisions per fsync.
+
+Query: --records decisions spread over a month of timestamps and
+--customers customers, in segments of --segment-mb. Times a lookup by
+customer, by decision within one day, and a full parse of every line
+(what a plain JSONL scan would do).
+
+    python benchmarks/bench_audit_log.py --threads 16 --decisions 20000 --records 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import synthetic_data  # noqa: F401  (puts the repo root on sys.path)
+from audit_log import AuditLog, encode_record, query
+
+DECISIONS = ["APPROVE", "REJECT", "PAYSALARY_REQUIRED", "APPROVED", "REJECTED"]
+
+
+def make_record(rng: random.Random, customers: int, ts: float) -> dict:
+    return {"ts": round(ts, 6), "tool": "perform_underwriting_gradio",
+            "customer": f"TC-{100000 + rng.randrange(customers)}", "session": "%032x" % rng.getrandbits(128),
+            "amount": float(rng.randrange(10, 500) * 1000), "decision": rng.choice(DECISIONS),
+            "reason": "Within pre-approved limit"}
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class SyncLog:
+    """Baseline: every decision appended and fsynced before the caller continues."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "ab")
+        self._lock = threading.Lock()
+
+    def record(self, record: dict):
+        with self._lock:
+            self._file.write(encode_record(record))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def flush(self):
+        pass
+
+
+def write_bench(log, threads: int, decisions: int, customers: int) -> dict:
+    latencies = [[] for _ in range(threads)]
+
+    def caller(i):
+        rng = random.Random(i)
+        mine = latencies[i]
+        for _ in range(decisions // threads):
+            record = make_record(rng, customers, time.time())
+            start = time.perf_counter()
+            log.record(record)
+            mine.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=caller, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    log.flush()
+    elapsed = time.perf_counter() - start
+    flat = [x for per in latencies for x in per]
+    return {"rate": len(flat) / elapsed, "p50_us": percentile(flat, 0.5) * 1e6,
+            "p99_us": percentile(flat, 0.99) * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--decisions", type=int, default=20000)
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--segment-mb", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"write: {args.decisions} decisions from {args.threads} threads")
+        print(f"{'writer':14} {'decisions/s':>12} {'call p50 µs':>12} {'call p99 µs':>12} {'per fsync':>10}")
+        sync = write_bench(SyncLog(os.path.join(tmp, "sync.jsonl")), args.threads, args.decisions, args.customers)
+        print(f"{'sync fsync':14} {sync['rate']:12,.0f} {sync['p50_us']:12.1f} {sync['p99_us']:12.1f} {1:10.1f}")
+        log = AuditLog(os.path.join(tmp, "write"))
+        grouped = write_bench(log, args.threads, args.decisions, args.customers)
+        log.close()
+        per_fsync = log.stats["records"] / max(log.stats["fsyncs"], 1)
+        print(f"{'group commit':14} {grouped['rate']:12,.0f} {grouped['p50_us']:12.1f} "
+              f"{grouped['p99_us']:12.1f} {per_fsync:10.1f}")
+
+        directory = os.path.join(tmp, "query")
+        log = AuditLog(directory, segment_bytes=args.segment_mb * 1024 * 1024)
+        rng = random.Random(3)
+        t0 = time.time() - 30 * 86400
+        step = 30 * 86400 / args.records
+        for i in range(args.records):
+            log.record(make_record(rng, args.customers, t0 + i * step))
+        log.close()
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(f"\nquery: {args.records:,} decisions, {log.stats['segments']} segments, {size / 1e6:.0f} MB")
+
+        customer = f"TC-{100000 + args.customers // 2}"
+        day = t0 + 15 * 86400
+        cases = [
+            (f"customer {customer}", lambda: list(query(directory, customer=customer))),
+            ("REJECT on one day", lambda: list(query(directory, decision="REJECT", since=day, until=day + 86400))),
+            ("parse every line", lambda: [json.loads(line) for f in sorted(os.listdir(directory))
+                                          if f.endswith(".jsonl")
+                                          for line in open(os.path.join(directory, f), "rb")]),
+        ]
+        for label, fn in cases:
+            start = time.perf_counter()
+            found = fn()
+            print(f"{label:28} {(time.perf_counter() - start) * 1000:10.1f} ms  ({len(found):,} records)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# file: benchmarks/bench_batch_underwriting.py
+"""
+Throughput of batch_underwriting.underwrite_batch vs calling
+tools.perform_underwriting_gradio once per application.
+
+    python benchmarks/bench_batch_underwriting.py --customers 100000 --applications 50000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+
+from synthetic_data import make_customers
+from customer_store import CustomerStore
+from batch_underwriting import underwrite_batch
+
+
+def make_applications(customers, n, seed=7):
+    rng = random.Random(seed)
+    apps = []
+    for _ in range(n):
+        c = customers[rng.randrange(len(customers))]
+        limit = c["financial_profile"]["pre_approved_limit"]
+        # spread amounts across all three bands (≤ limit, ≤ 2x, > 2x)
+        amount = round(limit * rng.uniform(0.3, 2.5), -2)
+        if rng.random() < 0.5:
+            apps.append({"customer_id": c["customer_id"], "loan_amount": amount})
+        else:
+            apps.append({"name": c["full_name"], "loan_amount": amount})
+    return apps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--applications", type=int, default=50000)
+    parser.add_argument("--per-row-sample", type=int, default=5000)
+    args = parser.parse_args()
+
+    customers = make_customers(args.customers)
+    store = CustomerStore(customers=customers)
+    apps = make_applications(customers, args.applications)
+
+    start = time.perf_counter()
+    underwrite_batch(apps, store=store)
+    batch_s = time.perf_counter() - start
+
+    # per-row path: make the synthetic store the process-wide one, which the
+    # tools' services and eligibility index read from
+    import customer_store
+    customer_store._store = store
+    # underwrite_batch writes no audit records, so the per-row path doesn't either
+    os.environ.setdefault("AUDIT_LOG_DIR", "")
+    import tools
+
+    sample = apps[:args.per_row_sample]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for app in sample:
+            key = app.get("customer_id") or app.get("name")
+            tools.perform_underwriting_gradio(key, app["loan_amount"])
+    per_row_s = time.perf_counter() - start
+
+    batch_rate = len(apps) / batch_s
+    per_row_rate = len(sample) / per_row_s
+    print(f"customers={args.customers} applications={args.applications}")
+    print(f"batch   : {batch_rate:>12,.0f} rows/s ({batch_s:.3f}s for {len(apps)})")
+    print(f"per-row : {per_row_rate:>12,.0f} rows/s ({per_row_s:.3f}s for {len(sample)})")
+    print(f"speedup : {batch_rate / per_row_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
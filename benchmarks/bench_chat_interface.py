@@ -0,0 +1,270 @@
+# file: benchmarks/bench_chat_interface.py
+"""
+Load test for gradio_app.chat_interface: thousands of concurrent
+conversations driven straight through the state machine (no browser), through
+every step: start → get_name → get_amount → verify_phone_digits →
+upload_payslip (when the amount needs a slip) → done.
+
+Everything but the LLM is real: the customer store (synthetic customers
+written to a temp customers file), underwriting, salary slip parsing (CSV
+slips) and sanction letter PDFs. --backend-latency adds a delay to every
+CRM / bureau / OfferMart lookup, to stand in for remote services. The LLM is
+a local stub that takes
+--llm-latency seconds per reply and streams it in --llm-chunks chunks.
+
+chat_interface streams each turn, so every step reports both the time to
+its first update (what the user waits for before seeing anything) and the
+total turn latency (p50/p95/p99/max) for a timed round, then the
+traced memory (tracemalloc) after each of --memory-rounds further rounds and
+the biggest allocation growth, so a leak in the hot path shows up as steady
+growth between rounds.
+
+    python benchmarks/bench_chat_interface.py --conversations 2000 --concurrency 500
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from synthetic_data import make_customers
+from session_store import get_session_store
+
+STEPS = ["start", "get_name", "get_amount", "verify_phone_digits", "upload_payslip", "done"]
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+REPLY = "Happy to help with your loan! Let's verify a couple of details and you'll be on your way."
+
+
+class StubStream:
+    """Async iterator over a reply's chunks, spread evenly over `latency` seconds."""
+
+    def __init__(self, latency: float, chunks: int):
+        words = REPLY.split(" ")
+        step = max(1, len(words) // chunks)
+        self.parts = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+        self.delay = latency / len(self.parts)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for part in self.parts:
+            await asyncio.sleep(self.delay)
+            yield StubResponse(part)
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel: fixed reply after a fixed delay (streamed in chunks)."""
+
+    def __init__(self, latency: float, chunks: int = 8):
+        self.latency = latency
+        self.chunks = chunks
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        time.sleep(self.latency)
+        return StubResponse(REPLY)
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        if stream:
+            return StubStream(self.latency, self.chunks)
+        await asyncio.sleep(self.latency)
+        return StubResponse(REPLY)
+
+
+SERVICE_METHODS = {"crm": ["get_kyc_details", "verify_phone_last4"],
+                   "bureau": ["get_credit_score"], "offers": ["get_offer"]}
+
+
+def slow_down_services(tools, latency: float):
+    """Make every mock service lookup take `latency` seconds longer (a blocking call, like a real client)."""
+    def slow(fn):
+        def wrapper(*args, **kwargs):
+            time.sleep(latency)
+            return fn(*args, **kwargs)
+        return wrapper
+
+    for name, methods in SERVICE_METHODS.items():
+        service = tools._service(name)
+        for method in methods:
+            setattr(service, method, slow(getattr(service, method)))
+
+
+def make_conversations(customers: list, n: int, slip_dir: str, seed: int = 7) -> list:
+    """One scripted conversation per entry; the answers per step, plus a CSV salary slip."""
+    rng = random.Random(seed)
+    conversations = []
+    for i in range(n):
+        c = customers[i % len(customers)]
+        profile = c["financial_profile"]
+        limit = profile["pre_approved_limit"]
+        last4 = c["kyc_details"]["phone_number"][-4:]
+        name = c["full_name"]
+        kind = rng.random()
+        if kind < 0.05:
+            name = f"Nobody Known {i}"
+        elif kind < 0.10:
+            last4 = "0000" if last4 != "0000" else "1111"
+        if kind < 0.40:
+            amount = rng.randrange(10000, limit + 1, 1000)
+        elif kind < 0.85:
+            amount = rng.randrange(limit + 1000, 2 * limit + 1, 1000)
+        else:
+            amount = 2 * limit + rng.randrange(1000, 100000, 1000)
+
+        slip = os.path.join(slip_dir, f"{c['customer_id']}.csv")
+        if not os.path.exists(slip):
+            with open(slip, "w") as f:
+                f.write(f"Employee,{c['full_name']}\nBasic Salary,{profile['monthly_salary'] // 2}\n"
+                        f"Net Salary,{profile['monthly_salary']}\n")
+        conversations.append({
+            "start": "",
+            "get_name": f"My name is {name}",
+            "get_amount": f"₹{amount:,}",
+            "verify_phone_digits": last4,
+            "upload_payslip": slip,
+            "done": "thanks",
+        })
+    return conversations
+
+
+async def run_conversation(chat_interface, conversation: dict, sem, samples, first_samples):
+    async with sem:
+        state = None
+        for _ in range(len(STEPS) + 1):
+            step = state.step.value if state is not None else "start"
+            upload = conversation[step] if step == "upload_payslip" else None
+            message = "" if step == "upload_payslip" else conversation[step]
+            start = time.perf_counter()
+            first = None
+            async for _, state, *_ in chat_interface(message, state, upload):
+                if first is None:
+                    first = time.perf_counter() - start
+            samples[step].append(time.perf_counter() - start)
+            first_samples[step].append(first)
+            if step == "done":
+                break
+        # finished sessions stay in the store until SESSION_TTL_SECONDS; drop them
+        # here so the memory rounds only see what the turns themselves keep
+        get_session_store().delete(state.session_id)
+
+
+async def run_round(chat_interface, conversations, concurrency, samples, first_samples=None):
+    sem = asyncio.Semaphore(concurrency)
+    first_samples = first_samples if first_samples is not None else defaultdict(list)
+    await asyncio.gather(*(run_conversation(chat_interface, c, sem, samples, first_samples)
+                           for c in conversations))
+
+
+def _pct(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+
+def print_steps(samples: dict, first_samples: dict):
+    print(f"{'step':<20} | {'turns':>6} | {'first p50':>9} | {'first p95':>9} | "
+          f"{'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'max ms':>8}")
+    for step in STEPS:
+        s = sorted(samples.get(step, []))
+        f = sorted(first_samples.get(step, []))
+        if s:
+            print(f"{step:<20} | {len(s):>6} | {_pct(f, 50):>9.2f} | {_pct(f, 95):>9.2f} | "
+                  f"{_pct(s, 50):>8.2f} | {_pct(s, 95):>8.2f} | {_pct(s, 99):>8.2f} | {s[-1] * 1000:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-chunks", type=int, default=8, help="chunks per streamed reply")
+    parser.add_argument("--backend-latency", type=float, default=0.0,
+                        help="extra seconds per CRM/bureau/offer lookup")
+    parser.add_argument("--no-llm-cache", action="store_true", help="send every prompt to the stub LLM")
+    parser.add_argument("--memory-rounds", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="keep the tools' console output")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    customers_path = os.path.join(tmp.name, "customers.json")
+    customers = make_customers(args.customers)
+    with open(customers_path, "w") as f:
+        json.dump(customers, f)
+    slip_dir = os.path.join(tmp.name, "slips")
+    os.makedirs(slip_dir)
+    conversations = make_conversations(customers, args.conversations, slip_dir)
+
+    # keep every file the app writes inside the temp dir; these are read at import
+    os.environ.setdefault("LLM_CACHE_PATH", "")
+    os.environ.setdefault("SANCTION_LETTER_DIR", os.path.join(tmp.name, "letters"))
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(tmp.name, "uploads"))
+    os.environ.setdefault("AUDIT_LOG_DIR", os.path.join(tmp.name, "audit_log"))
+    os.environ.setdefault("TRACE_FILE", os.path.join(tmp.name, "traces.jsonl"))
+    import customer_store
+    customer_store.get_customer_store(customers_path)  # the app's services share this store
+    import gemini_api
+    gemini_api._models[gemini_api.DEFAULT_MODEL] = StubModel(args.llm_latency, args.llm_chunks)
+    if args.no_llm_cache:
+        gemini_api.get_llm_cache().max_memory_entries = 0
+    from gradio_app import chat_interface
+    if args.backend_latency:
+        import tools
+        slow_down_services(tools, args.backend_latency)
+
+    quiet = open(os.devnull, "w")
+    out = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(quiet)
+    with out:
+        asyncio.run(run_round(chat_interface, conversations[:100], 100, defaultdict(list)))  # warm up
+
+        samples, first_samples = defaultdict(list), defaultdict(list)
+        start = time.perf_counter()
+        asyncio.run(run_round(chat_interface, conversations, args.concurrency, samples, first_samples))
+        elapsed = time.perf_counter() - start
+
+    turns = sum(len(s) for s in samples.values())
+    print(f"{args.conversations} conversations ({turns} turns) at concurrency {args.concurrency} "
+          f"in {elapsed:.2f}s → {args.conversations / elapsed:,.0f} conversations/s")
+    print_steps(samples, first_samples)
+
+    if args.memory_rounds:
+        tracemalloc.start(10)
+        gc.collect()
+        baseline = tracemalloc.take_snapshot()
+        print(f"\n{'round':>5} | {'traced MB':>9} | {'growth MB':>9}")
+        first = last = tracemalloc.get_traced_memory()[0]
+        for r in range(1, args.memory_rounds + 1):
+            with out:
+                asyncio.run(run_round(chat_interface, conversations, args.concurrency, defaultdict(list)))
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0]
+            print(f"{r:>5} | {current / 1e6:>9.2f} | {(current - last) / 1e6:>+9.2f}")
+            last = current
+        print(f"total growth over {args.memory_rounds} rounds: {(last - first) / 1e6:+.2f} MB")
+        print("top allocation growth:")
+        for stat in tracemalloc.take_snapshot().compare_to(baseline, "lineno")[:5]:
+            print(f"  {stat}")
+        tracemalloc.stop()
+
+    quiet.close()
+    from letter_service import letter_service
+    letter_service.shutdown()
+    from audit_log import get_audit_log
+    if get_audit_log() is not None:
+        get_audit_log().close()  # before its directory goes away with tmp
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
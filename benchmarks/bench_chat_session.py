@@ -0,0 +1,176 @@
+# file: benchmarks/bench_chat_session.py
+"""
+Per-session memory and per-turn serialization cost of a chat session as it
+gets longer: --sessions scripted conversations run through chat_interface
+to their decision, then keep chatting ("thanks") up to each --turns count.
+
+    before   the old representation: a dict with every state key, and a
+             history that grows by two messages on every turn after the
+             decision (the message and another "Loan process complete")
+    compact  chat_session.ChatSession as chat_interface keeps it now: only
+             non-default fields saved, history capped at CHAT_HISTORY_MAX,
+             no repeated "done" message
+
+The compact sessions are the real ones from the session store. The before
+ones are built from the same conversations the way the old code grew them.
+Columns:
+- KB/session: memory held by a loaded session.
+- record B: the stored record size.
+- turn µs: load + decode + encode, what every turn pays to resume and
+  save.
+- browser B: the payload of one Gradio event. Before, it shipped the
+  history up and down plus the state dict. Now it ships the history down
+  and {"session_id"}.
+
+    python benchmarks/bench_chat_session.py --sessions 200 --turns 10,100,1000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from synthetic_data import make_customers
+from bench_chat_interface import StubModel, make_conversations
+from session_store import decode_record, encode_record, get_session_store
+
+LEGACY_KEYS = {"step": "start", "customer_name": "", "customer_id": None, "loan_amount": 0.0,
+               "kyc_verified": False, "underwriting_result": None, "sanction_file": None,
+               "payslip_file": None, "monthly_salary": None, "pre_approved_limit": None}
+
+
+def legacy_record(session, turns_after_done: int) -> tuple:
+    """(state dict, history) the way the old chat_interface kept this session."""
+    state = {"session_id": session.session_id, **LEGACY_KEYS}
+    state.update({k: v for k, v in session.to_state().items() if k in state})
+    done = "✅ Loan process complete. Refresh to start a new application."
+    history = [turn for turn in session.history if turn != (None, done)]
+    for _ in range(turns_after_done):
+        history += [("thanks", None), (None, done)]
+    return state, history
+
+
+def measure(blobs: list, load) -> dict:
+    """Memory per loaded session and load+save time per turn for one kind of record."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [load(blob) for blob in blobs]
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / len(blobs)
+    tracemalloc.stop()
+    del held
+
+    start = time.perf_counter()
+    for blob in blobs:
+        state, history = load(blob)
+        encode_record(state, history)
+    turn_us = (time.perf_counter() - start) / len(blobs) * 1e6
+    return {"kb": per_session / 1024, "bytes": sum(map(len, blobs)) / len(blobs), "turn_us": turn_us}
+
+
+def load_legacy(blob):
+    record = decode_record(blob)
+    return record["state"], record["history"]
+
+
+def load_compact(blob):
+    from chat_session import ChatSession
+    record = decode_record(blob)
+    session = ChatSession.from_record(record["state"], record["history"])
+    return session.to_state(), session.history
+
+
+def browser_bytes(state: dict, history: list, compact: bool) -> float:
+    history_bytes = len(json.dumps(history, ensure_ascii=False))
+    if compact:
+        return history_bytes + len(json.dumps({"session_id": state["session_id"]}))
+    return 2 * history_bytes + len(json.dumps(state, ensure_ascii=False))
+
+
+async def drive(chat_interface, conversations: list, checkpoints: list) -> dict:
+    """Run every conversation to its decision, then on to each checkpoint turn count; snapshot the records."""
+    store = get_session_store()
+    snapshots = {t: [] for t in checkpoints}
+    for conversation in conversations:
+        state, turns, done_at = None, 0, None
+        while turns < max(checkpoints):
+            step = state.step.value if state is not None else "start"
+            upload = conversation[step] if step == "upload_payslip" else None
+            message = "" if step == "upload_payslip" else conversation[step]
+            async for _, state, *_ in chat_interface(message, state, upload):
+                pass
+            turns += 1
+            if done_at is None and state.step.value == "done":
+                done_at = turns
+            if turns in snapshots:
+                snapshots[turns].append((store.load(state.session_id), turns - (done_at or turns)))
+        store.delete(state.session_id)
+    return snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", default="10,100,1000", help="comma-separated turn counts per session")
+    parser.add_argument("--customers", type=int, default=2000)
+    args = parser.parse_args()
+    checkpoints = sorted(int(t) for t in args.turns.split(","))
+
+    tmp = tempfile.TemporaryDirectory()
+    customers = make_customers(args.customers)
+    customers_path = os.path.join(tmp.name, "customers.json")
+    with open(customers_path, "w") as f:
+        json.dump(customers, f)
+    slip_dir = os.path.join(tmp.name, "slips")
+    os.makedirs(slip_dir)
+    conversations = make_conversations(customers, args.sessions, slip_dir)
+
+    # keep every file the app writes inside the temp dir; these are read at import
+    for key in ("SANCTION_LETTER_DIR", "UPLOAD_DIR", "AUDIT_LOG_DIR"):
+        os.environ.setdefault(key, os.path.join(tmp.name, key.lower()))
+    os.environ.setdefault("LLM_CACHE_PATH", "")
+    os.environ.setdefault("TRACE_FILE", "")
+    import customer_store
+    customer_store.get_customer_store(customers_path)
+    import gemini_api
+    gemini_api._models[gemini_api.DEFAULT_MODEL] = StubModel(0.0)
+    from gradio_app import chat_interface
+    from chat_session import CHAT_HISTORY_MAX, ChatSession
+
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        snapshots = asyncio.run(drive(chat_interface, conversations, checkpoints))
+
+    print(f"{args.sessions} sessions, history capped at {CHAT_HISTORY_MAX} messages")
+    print(f"{'turns':>6} {'model':8} {'history':>8} {'KB/session':>11} {'record B':>9} "
+          f"{'turn µs':>8} {'browser B':>10}")
+    for turns in checkpoints:
+        rows = {"before": [], "compact": []}
+        for record, after_done in snapshots[turns]:
+            session = ChatSession.from_record(record["state"], record["history"])
+            legacy_state, legacy_history = legacy_record(session, after_done)
+            rows["before"].append((encode_record(legacy_state, legacy_history), legacy_state, legacy_history))
+            rows["compact"].append((encode_record(session.to_state(), session.history),
+                                    session.to_state(), session.history))
+        for model, loader in (("before", load_legacy), ("compact", load_compact)):
+            entries = rows[model]
+            result = measure([blob for blob, _, _ in entries], loader)
+            history_len = sum(len(h) for _, _, h in entries) / len(entries)
+            payload = sum(browser_bytes(s, h, model == "compact") for _, s, h in entries) / len(entries)
+            print(f"{turns:>6} {model:8} {history_len:>8.0f} {result['kb']:>11.1f} {result['bytes']:>9.0f} "
+                  f"{result['turn_us']:>8.1f} {payload:>10.0f}")
+
+    from letter_service import letter_service
+    letter_service.shutdown()
+    from audit_log import get_audit_log
+    if get_audit_log() is not None:
+        get_audit_log().close()  # before its directory goes away with tmp
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# file: benchmarks/bench_checkpointer.py
+"""
+Checkpoint overhead per node for the loan workflow's graph shape, at 1, 8 and
+64 concurrent sessions: no checkpointer vs the old SqliteSaver setup (one
+connection, default journaling) vs checkpointing.TunedSqliteSaver.
+
+Nodes are trivial, so the numbers are the checkpointer's own cost.
+
+    python benchmarks/bench_checkpointer.py --sessions 1,8,64 --runs 20
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import synthetic_data  # noqa: F401  (puts the repo root on sys.path)
+from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpointing import TunedSqliteSaver
+
+NODES = ("sales", "verify_kyc", "underwriting", "sanction_letter")
+
+
+def build_graph(checkpointer):
+    workflow = StateGraph(dict)
+
+    def make_node(name):
+        def node(state: dict):
+            state["steps"] = state.get("steps", 0) + 1
+            state["last"] = name
+            return state
+        return node
+
+    for name in NODES:
+        workflow.add_node(name, make_node(name))
+    workflow.set_entry_point(NODES[0])
+    for a, b in zip(NODES, NODES[1:]):
+        workflow.add_edge(a, b)
+    workflow.add_edge(NODES[-1], END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def run_sessions(graph, sessions: int, runs: int, finish=None) -> float:
+    """Run `sessions` concurrent conversations, `runs` graph runs each; returns seconds."""
+    def session(_):
+        for _ in range(runs):
+            thread_id = uuid.uuid4().hex
+            state = {"customer_name": "Bench User", "loan_amount": 100000.0, "steps": 0}
+            graph.invoke(state, config={"configurable": {"thread_id": thread_id}})
+            if finish is not None:
+                finish(thread_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", default="1,8,64")
+    parser.add_argument("--runs", type=int, default=20, help="graph runs per session")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>8} | {'backend':<22} | {'µs/node':>9} | {'overhead µs/node':>16} | {'db size':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for sessions in [int(s) for s in args.sessions.split(",")]:
+            node_count = sessions * args.runs * len(NODES)
+
+            baseline_s = run_sessions(build_graph(None), sessions, args.runs)
+            base_us = baseline_s / node_count * 1e6
+            print(f"{sessions:>8} | {'no checkpointer':<22} | {base_us:>9.1f} | {'-':>16} | {'-':>9}")
+
+            path = os.path.join(tmp, f"default_{sessions}.sqlite")
+            conn = sqlite3.connect(path, check_same_thread=False)  # exactly what agent.py used to do
+            saver = SqliteSaver(conn)
+            elapsed = run_sessions(build_graph(saver), sessions, args.runs)
+            conn.close()
+            us = elapsed / node_count * 1e6
+            print(f"{sessions:>8} | {'SqliteSaver (old)':<22} | {us:>9.1f} | {us - base_us:>16.1f} | "
+                  f"{os.path.getsize(path) / 1024:>6.0f} KB")
+
+            path = os.path.join(tmp, f"tuned_{sessions}.sqlite")
+            saver = TunedSqliteSaver(path, retention_seconds=0)
+            elapsed = run_sessions(build_graph(saver), sessions, args.runs, finish=saver.finish_thread)
+            saver.prune()
+            saver.close()
+            us = elapsed / node_count * 1e6
+            print(f"{sessions:>8} | {'TunedSqliteSaver':<22} | {us:>9.1f} | {us - base_us:>16.1f} | "
+                  f"{os.path.getsize(path) / 1024:>6.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# file: benchmarks/bench_columnar_store.py
+"""
+customers.json (json.load into dicts) vs the memory-mapped .col file
+(columnar_store.py): open time, per-process memory with --workers processes
+serving the same file at once, and service lookup latency (CRM KYC, credit
+score, offer; by customer_id and by name).
+
+Memory is read from /proc: RSS counts every resident page, PSS splits shared
+pages between the processes mapping them, which is what the .col file's
+page-cache sharing saves. "+app" is measured again after each worker has
+also resolved one typed name (tools.resolve_customer) and made one
+underwriting decision (tools.perform_underwriting_gradio), i.e. with the
+name and eligibility indexes built as a real server would have them.
+
+    python benchmarks/bench_columnar_store.py --customers 1000000 --workers 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_data import make_customers
+import columnar_store
+
+
+def memory_mb() -> dict:
+    """RSS and PSS of this process in MB (Linux /proc)."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower()] = int(rest.split()[0]) / 1024
+    return values
+
+
+def open_services(path: str, shared: bool = False):
+    from customer_store import CustomerStore, get_customer_store
+    from crm_server import CRMServer
+    from credit_bureau import CreditBureau
+    from offer_mart import OfferMart
+    store = get_customer_store(path) if shared else CustomerStore(path)
+    return store, CRMServer(store), CreditBureau(store), OfferMart(store)
+
+
+def lookups(path: str, count: int, seed: int = 0, shared: bool = False) -> tuple:
+    """Open `path` (as the process-wide store if `shared`) and time service calls: ({open_s, by_id_us, by_name_us}, store)."""
+    start = time.perf_counter()
+    store, crm, bureau, offers = open_services(path, shared)
+    open_s = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    keys = [f"TC-{100000 + rng.randrange(len(store))}" for _ in range(count)]
+    names = [store.fields(k, "full_name")[0] for k in keys[:count // 2]]
+    with contextlib.redirect_stdout(io.StringIO()):  # the mock services print
+        start = time.perf_counter()
+        for key in keys:
+            crm.get_kyc_details(key)
+            bureau.get_credit_score(key)
+            offers.get_offer(key)
+        by_id_us = (time.perf_counter() - start) / (3 * len(keys)) * 1e6
+        start = time.perf_counter()
+        for name in names:
+            bureau.get_credit_score(name)
+        by_name_us = (time.perf_counter() - start) / len(names) * 1e6
+    return {"open_s": open_s, "by_id_us": by_id_us, "by_name_us": by_name_us}, store
+
+
+def worker(path: str, count: int, seed: int):
+    """
+    Open the store and serve lookups, then one name resolution and one
+    underwriting decision through tools.py (which build the name and
+    eligibility indexes); report memory after each, then stay alive until
+    stdin closes.
+    """
+    os.environ["AUDIT_LOG_DIR"] = ""  # read when tools is imported
+    os.environ.setdefault("TRACE_FILE", "")
+    os.environ.setdefault("LLM_CACHE_PATH", "")
+    import tools  # the app's modules count towards the baseline, not the data
+    base = memory_mb()
+    _, store = lookups(path, count, seed, shared=True)  # keep the store alive while measuring
+    services = memory_mb()
+    customer_id, name, limit = store.fields(f"TC-{100000 + seed}", "customer_id", "full_name", "pre_approved_limit")
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert tools.resolve_customer(name.upper()[:-1])["status"] == "success"  # a typo: the fuzzy path
+        tools.perform_underwriting_gradio(customer_id, 1.5 * limit)
+    app = memory_mb()
+    print(json.dumps({"rss_mb": services["rss"] - base["rss"], "pss_mb": services["pss"] - base["pss"],
+                      "app_rss_mb": app["rss"] - base["rss"], "app_pss_mb": app["pss"] - base["pss"]}),
+          flush=True)
+    sys.stdin.read()
+
+
+def run_workers(path: str, workers: int, lookups: int) -> list:
+    procs = [
+        subprocess.Popen([sys.executable, __file__, "--worker", path, "--lookups", str(lookups), "--seed", str(i)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for i in range(workers)
+    ]
+    # every worker reports while all of them are still alive, so PSS reflects the sharing
+    results = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args.worker, args.lookups, args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "customers.json")
+        col_path = os.path.join(tmp, "customers.col")
+        with open(json_path, "w") as f:
+            json.dump(make_customers(args.customers), f)
+        stats = columnar_store.convert(json_path, col_path)
+        print(f"{args.customers:,} customers: customers.json {os.path.getsize(json_path) / 1e6:.0f} MB, "
+              f"customers.col {stats['bytes'] / 1e6:.0f} MB (converted in {stats['seconds']:.1f} s)")
+        print(f"{'format':8} {'open s':>8} {'id µs':>8} {'name µs':>8} "
+              f"{'RSS MB':>8} {'PSS MB':>8} {'+app RSS':>9} {'+app PSS':>9}  "
+              f"(memory per process, {args.workers} processes at once)")
+        for label, path in (("json", json_path), ("col", col_path)):
+            timing, _ = lookups(path, args.lookups)
+            memory = run_workers(path, args.workers, args.lookups)
+            mean = lambda key: sum(m[key] for m in memory) / len(memory)  # noqa: E731
+            print(f"{label:8} {timing['open_s']:8.2f} {timing['by_id_us']:8.1f} {timing['by_name_us']:8.1f} "
+                  f"{mean('rss_mb'):8.0f} {mean('pss_mb'):8.0f} {mean('app_rss_mb'):9.0f} {mean('app_pss_mb'):9.0f}")
+
+if __name__ == "__main__":
+    main()
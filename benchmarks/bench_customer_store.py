@@ -0,0 +1,58 @@
+# file: benchmarks/bench_customer_store.py
+"""
+Lookup cost of the indexed CustomerStore vs the old linear scan, as the
+customer base grows. Indexed lookups should stay flat; the scan grows O(n).
+
+    python benchmarks/bench_customer_store.py
+"""
+
+import argparse
+import random
+import time
+
+from synthetic_data import make_customers
+from customer_store import CustomerStore
+
+
+def linear_scan(customers, name):
+    # the lookup CRMServer / CreditBureau / OfferMart used to do
+    for c in customers:
+        if c["full_name"].lower() == name.lower():
+            return c
+    return None
+
+
+def time_per_lookup(fn, keys):
+    start = time.perf_counter()
+    for k in keys:
+        fn(k)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000,500000")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--scan-lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'customers':>10} | {'load (s)':>9} | {'by name (µs)':>12} | {'by id (µs)':>10} | {'linear scan (µs)':>16}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        customers = make_customers(n)
+        rng = random.Random(n)
+        sample = [customers[rng.randrange(n)] for _ in range(args.lookups)]
+        names = [c["full_name"].upper() for c in sample]
+        ids = [c["customer_id"] for c in sample]
+
+        start = time.perf_counter()
+        store = CustomerStore(customers=customers)
+        load_s = time.perf_counter() - start
+
+        by_name = time_per_lookup(store.get_by_name, names)
+        by_id = time_per_lookup(store.get_by_id, ids)
+        scan = time_per_lookup(lambda k: linear_scan(customers, k), names[:args.scan_lookups])
+        print(f"{n:>10} | {load_s:>9.3f} | {by_name * 1e6:>12.2f} | {by_id * 1e6:>10.2f} | {scan * 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# file: benchmarks/bench_eligibility.py
+"""
+Underwriting decision cost: the old path (OfferMart + Credit Bureau lookups,
+then the threshold rules) vs one EligibilityIndex lookup, plus the
+"maximum I can borrow" query, and how long an index rebuild takes after a
+reload that changed --changed-pct of the customers.
+
+    python benchmarks/bench_eligibility.py --customers 100000
+"""
+
+import argparse
+import contextlib
+import copy
+import os
+import random
+import time
+
+from synthetic_data import make_customers
+from customer_store import CustomerStore, CustomerSnapshot
+from credit_bureau import CreditBureau
+from offer_mart import OfferMart
+from eligibility import EligibilityIndex, get_eligibility_index
+
+
+def old_decide(offers, bureau, name, loan_amount):
+    # what perform_underwriting_gradio did on every request
+    offer = offers.get_offer(name)
+    score_info = bureau.get_credit_score(name)
+    if offer["status"] != "success" or score_info["status"] != "success":
+        return {"decision": "REJECT", "reason": "Customer data missing"}
+    limit, score = offer["limit"], score_info["score"]
+    if score < 700:
+        return {"decision": "REJECT", "reason": f"Low credit score: {score}"}
+    if loan_amount <= limit:
+        return {"decision": "APPROVE", "reason": "Within pre-approved limit"}
+    if loan_amount <= 2 * limit:
+        return {"decision": "PAYSALARY_REQUIRED", "reason": "Loan above pre-approved limit. Requires salary slip."}
+    return {"decision": "REJECT", "reason": "Loan exceeds 2× pre-approved limit"}
+
+
+def per_call_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(*item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--decisions", type=int, default=100000)
+    parser.add_argument("--changed-pct", type=float, default=1.0)
+    args = parser.parse_args()
+
+    customers = make_customers(args.customers)
+    store = CustomerStore(customers=customers)
+    offers, bureau = OfferMart(store), CreditBureau(store)
+    rng = random.Random(3)
+    sample = []
+    for _ in range(args.decisions):
+        c = customers[rng.randrange(len(customers))]
+        limit = c["financial_profile"]["pre_approved_limit"]
+        sample.append((c["full_name"], rng.uniform(0.2, 2.5) * limit))
+
+    start = time.perf_counter()
+    index = get_eligibility_index(store)
+    build_s = time.perf_counter() - start
+
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):  # the mock services print
+        old_us = per_call_us(lambda name, amount: old_decide(offers, bureau, name, amount), sample)
+        mismatches = sum(1 for name, amount in sample if index.decide(name, amount) != old_decide(offers, bureau, name, amount))
+    new_us = per_call_us(index.decide, sample)
+    max_us = per_call_us(lambda name, _: index.max_borrowable(name), sample)
+
+    print(f"{args.customers} customers, {args.decisions} decisions; index built in {build_s * 1000:.1f} ms")
+    print(f"decide via services + rules : {old_us:8.2f} µs")
+    print(f"decide via eligibility index: {new_us:8.2f} µs  ({old_us / new_us:.1f}x, {mismatches} mismatches)")
+    print(f"max_borrowable lookup       : {max_us:8.2f} µs")
+
+    # a reload where a few customers' profiles changed
+    changed = copy.copy(customers)
+    for i in rng.sample(range(len(customers)), int(len(customers) * args.changed_pct / 100)):
+        c = copy.deepcopy(customers[i])
+        c["financial_profile"]["monthly_salary"] += 1000
+        changed[i] = c
+    snapshot = CustomerSnapshot(changed)
+
+    start = time.perf_counter()
+    rebuilt = EligibilityIndex(snapshot)
+    rebuild_s = time.perf_counter() - start
+    print(f"rebuild after {args.changed_pct}% changed: {rebuild_s * 1000:.1f} ms "
+          f"({len(rebuilt)} customers, {rebuilt.salary_max.nbytes / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# file: benchmarks/bench_graph_sessions.py
+"""
+Per-session setup cost of the agent graph: compiling the workflow for every
+run (what master_agent used to do) vs the shared compiled graph from
+agent.get_graph(), then sessions/sec with many applications running through
+that one graph at once.
+
+Run from the repo root (sessions are scripted over customers.json). Set
+LLM_DEADLINE_SECONDS low so LLM time doesn't dominate.
+
+    python benchmarks/bench_graph_sessions.py --sessions 400 --workers 1,8,32
+"""
+
+import argparse
+import os
+import time
+
+from synthetic_data import REPO_ROOT, make_sessions
+from customer_store import load_customers
+from replay import replay, print_report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--workers", default="1,8,32")
+    parser.add_argument("--compiles", type=int, default=50)
+    args = parser.parse_args()
+
+    import agent
+
+    start = time.perf_counter()
+    for _ in range(args.compiles):
+        agent.build_graph()
+    compile_ms = (time.perf_counter() - start) / args.compiles * 1000
+
+    agent.get_graph()
+    start = time.perf_counter()
+    for _ in range(args.compiles * 100):
+        agent.get_graph()
+        agent.session_config(agent.new_thread_id())
+    shared_us = (time.perf_counter() - start) / (args.compiles * 100) * 1e6
+
+    print(f"per-session setup: compile per run {compile_ms:.2f} ms | shared graph + new thread id {shared_us:.2f} µs")
+
+    scripts = make_sessions(load_customers(), args.sessions,
+                            slip_path=os.path.join(REPO_ROOT, "dummy_salary_slip.pdf"))
+    for workers in [int(w) for w in args.workers.split(",")]:
+        print(f"\n=== {workers} concurrent sessions on one compiled graph ===")
+        _, report = replay(scripts, workers=workers, mode="thread")
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
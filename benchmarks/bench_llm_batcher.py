@@ -0,0 +1,126 @@
+# file: benchmarks/bench_llm_batcher.py
+"""
+Throughput of decision explanations: one LLM call per request (the old
+path, llm_guard.guarded_call) vs the llm_batcher micro-batcher, for
+concurrent callers (chat / agent sessions) and for a batch job
+(explain_many).
+
+The LLM is a local stub: every call costs --call-latency seconds plus
+--item-latency per item in the prompt, and batch prompts get a JSON array
+back. Every request has a distinct reason, so nothing is served from cache.
+
+    python benchmarks/bench_llm_batcher.py --requests 2000 --callers 64
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("TRACE_FILE", "")
+
+import synthetic_data  # noqa: F401  (puts the repo root on sys.path)
+import gemini_api
+import llm_guard
+from llm_batcher import ExplanationBatcher, build_explanation_prompt
+
+ITEM_LINE = re.compile(r"^\d+\. ", re.M)
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Fixed cost per call plus a small cost per item; answers batch prompts with a JSON array."""
+
+    def __init__(self, call_latency: float, item_latency: float):
+        self.call_latency = call_latency
+        self.item_latency = item_latency
+        self.calls = 0
+
+    def generate_content(self, prompt, request_options=None):
+        self.calls += 1
+        n = len(ITEM_LINE.findall(prompt))
+        time.sleep(self.call_latency + self.item_latency * max(1, n))
+        if n == 0:
+            return StubResponse("Thanks for applying — here is what we decided.")
+        return StubResponse(json.dumps([f"Explanation {i}." for i in range(1, n + 1)]))
+
+
+def make_requests(n: int, tag: str) -> list:
+    return [("REJECT" if i % 3 else "APPROVE", f"{tag} case {i}: EMI {10000 + i} vs salary {40000 + i}")
+            for i in range(n)]
+
+
+def run_concurrent(explain, requests: list, callers: int):
+    latencies = []
+
+    def one(item):
+        start = time.perf_counter()
+        explain(*item)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(one, requests))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def report(label, n, elapsed, calls, p50=None, p95=None, base=None):
+    line = f"{label:<28} | {n / elapsed:>9.1f} req/s | {calls:>6} LLM calls"
+    if p50 is not None:
+        line += f" | p50 {p50 * 1000:>7.1f} ms | p95 {p95 * 1000:>7.1f} ms"
+    if base:
+        line += f" | {n / elapsed / base:>5.1f}x"
+    print(line)
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--callers", type=int, default=64, help="concurrent chat/agent sessions")
+    parser.add_argument("--call-latency", type=float, default=0.2)
+    parser.add_argument("--item-latency", type=float, default=0.005)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--wait-ms", type=float, default=20)
+    parser.add_argument("--in-flight", type=int, default=4)
+    args = parser.parse_args()
+
+    model = StubModel(args.call_latency, args.item_latency)
+    gemini_api._models[gemini_api.DEFAULT_MODEL] = model
+    deadline = 30.0  # the stub never fails; don't let the deadline cut runs short
+    print(f"{args.requests} explanations, {args.callers} concurrent callers, stub LLM "
+          f"{args.call_latency * 1000:.0f} ms/call + {args.item_latency * 1000:.0f} ms/item, "
+          f"batches of ≤{args.batch_size}, {args.wait_ms:.0f} ms window, {args.in_flight} in flight\n")
+
+    def unbatched(decision, reason):
+        return llm_guard.guarded_call(build_explanation_prompt(decision, reason), fallback="", deadline=deadline)
+
+    model.calls = 0
+    elapsed, p50, p95 = run_concurrent(unbatched, make_requests(args.requests, "single"), args.callers)
+    base = report("one call per request", args.requests, elapsed, model.calls, p50, p95)
+
+    batcher = ExplanationBatcher(max_batch=args.batch_size, max_wait=args.wait_ms / 1000,
+                                 max_in_flight=args.in_flight, deadline=deadline)
+    model.calls = 0
+    elapsed, p50, p95 = run_concurrent(lambda d, r: batcher.explain(d, r, fallback=""),
+                                       make_requests(args.requests, "batched"), args.callers)
+    report("micro-batched (concurrent)", args.requests, elapsed, model.calls, p50, p95, base)
+
+    model.calls = 0
+    start = time.perf_counter()
+    batcher.explain_many(make_requests(args.requests, "bulk"))
+    report("explain_many (batch job)", args.requests, time.perf_counter() - start, model.calls, base=base)
+    print(f"\nbatcher stats: {batcher.summary()}")
+
+
+if __name__ == "__main__":
+    main()
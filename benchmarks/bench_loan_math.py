@@ -0,0 +1,91 @@
+# file: benchmarks/bench_loan_math.py
+"""
+loan_math (vectorized) vs the scalar formulas it replaced: EMIs for a batch
+of amounts, full amortization schedules, and a quote grid of amounts ×
+tenures for one salary.
+
+    python benchmarks/bench_loan_math.py --loans 200000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+import synthetic_data  # noqa: F401  (puts the repo root on sys.path)
+import loan_math
+
+
+def scalar_flat_emi(amount):
+    # the old tools.perform_underwriting estimate (14% flat over 2 years)
+    return (amount + amount * 0.14 * 2) / 24
+
+
+def scalar_emi(amount, annual_rate=0.14, months=24):
+    r = annual_rate / 12
+    growth = (1 + r) ** months
+    return amount * r * growth / (growth - 1)
+
+
+def scalar_schedule(amount, annual_rate=0.14, months=24):
+    r = annual_rate / 12
+    instalment = scalar_emi(amount, annual_rate, months)
+    balance = amount
+    rows = []
+    for month in range(1, months + 1):
+        interest = balance * r
+        balance -= instalment - interest
+        rows.append((month, instalment, interest, instalment - interest, max(balance, 0.0)))
+    return rows
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - start, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loans", type=int, default=200000)
+    parser.add_argument("--schedules", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    amounts = [rng.randrange(10000, 1000000, 1000) for _ in range(args.loans)]
+    tenures = [rng.choice(loan_math.QUOTE_TENURES) for _ in range(args.loans)]
+    amounts_np = np.array(amounts, dtype=np.float64)
+    tenures_np = np.array(tenures)
+
+    flat_s, _ = timed(lambda: [scalar_flat_emi(a) for a in amounts])
+    scalar_s, expected = timed(lambda: [scalar_emi(a, 0.14, n) for a, n in zip(amounts, tenures)])
+    vector_s, got = timed(lambda: loan_math.emi(amounts_np, 0.14, tenures_np))
+    assert np.allclose(expected, got)
+    print(f"EMI for {args.loans:,} loans (mixed tenures)")
+    print(f"  scalar flat formula   : {flat_s * 1000:9.1f} ms")
+    print(f"  scalar reducing EMI   : {scalar_s * 1000:9.1f} ms")
+    print(f"  loan_math.emi         : {vector_s * 1000:9.1f} ms  ({scalar_s / vector_s:.0f}x)")
+
+    n = args.schedules
+    scalar_s, expected = timed(lambda: [scalar_schedule(a, 0.14, t) for a, t in zip(amounts[:n], tenures[:n])])
+    vector_s, got = timed(lambda: loan_math.amortization(amounts_np[:n], 0.14, tenures_np[:n]))
+    assert np.allclose([row[-1][4] for row in expected], 0, atol=1e-4)
+    assert np.allclose(got["principal"].sum(axis=1), amounts_np[:n])
+    print(f"Amortization schedules for {n:,} loans")
+    print(f"  scalar loop           : {scalar_s * 1000:9.1f} ms")
+    print(f"  loan_math.amortization: {vector_s * 1000:9.1f} ms  ({scalar_s / vector_s:.0f}x)")
+
+    grid_amounts = np.arange(10000, 2000001, 10000)
+    scalar_s, _ = timed(lambda: [[scalar_emi(a, 0.14, t) <= 30000 for a in grid_amounts]
+                                 for t in loan_math.QUOTE_TENURES])
+    vector_s, _ = timed(lambda: loan_math.quote_grid(grid_amounts, salary=60000))
+    options_s, options = timed(lambda: loan_math.affordable_options(60000, cap=1500000))
+    print(f"Quote grid ({len(grid_amounts)} amounts × {len(loan_math.QUOTE_TENURES)} tenures)")
+    print(f"  scalar loop           : {scalar_s * 1000:9.3f} ms")
+    print(f"  loan_math.quote_grid  : {vector_s * 1000:9.3f} ms  ({scalar_s / vector_s:.0f}x)")
+    print(f"  affordable_options    : {options_s * 1000:9.3f} ms → {options}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# file: benchmarks/bench_name_index.py
+"""
+Fuzzy name lookup: NameIndex.search vs a linear difflib scan over every
+customer name. Queries are real names with one typo (dropped, inserted or
+swapped letter) plus random case and spacing; "hit@1" is how often the
+right customer comes first.
+
+    python benchmarks/bench_name_index.py --customers 1000000
+    python benchmarks/bench_name_index.py --customers 1000000 --names varied
+
+--names synthetic uses synthetic_data's names ("Priya Sharma 123": few
+distinct words, so every trigram is common — a hard case); --names varied
+builds two-word names from random syllables.
+"""
+
+import argparse
+import difflib
+import random
+import string
+import time
+
+from synthetic_data import make_customers
+from customer_store import CustomerStore, normalize_name
+from name_index import NameIndex
+
+SYLLABLES = ["ra", "vi", "an", "ka", "sh", "ma", "ni", "ta", "pr", "ya", "de", "su", "ro", "ha", "li",
+             "me", "jo", "ar", "el", "us", "ki", "no", "be", "ga", "to", "si", "la", "mu", "pa", "ve"]
+
+
+def varied_name(rng):
+    word = lambda: "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    return f"{word()} {word()}"
+
+
+def typo(rng, name):
+    i = rng.randrange(len(name))
+    kind = rng.randrange(3)
+    if kind == 0:
+        name = name[:i] + name[i + 1:]
+    elif kind == 1:
+        name = name[:i] + rng.choice(string.ascii_lowercase) + name[i:]
+    else:
+        name = name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+    name = name.replace(" ", "  ", 1) if rng.random() < 0.3 else name
+    return name.upper() if rng.random() < 0.2 else name
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--scan-queries", type=int, default=5, help="queries for the (slow) linear scan")
+    parser.add_argument("--names", choices=["synthetic", "varied"], default="synthetic")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    customers = make_customers(args.customers)
+    if args.names == "varied":
+        for c in customers:
+            c["full_name"] = varied_name(rng)
+    snapshot = CustomerStore(customers=customers).snapshot()
+
+    start = time.perf_counter()
+    index = NameIndex(snapshot)
+    build_s = time.perf_counter() - start
+    size_mb = index.nbytes / 1e6
+    print(f"{args.customers:,} customers ({args.names} names): index built in {build_s:.2f} s, {size_mb:.0f} MB")
+
+    sample = rng.sample(customers, args.queries)
+    queries = [(c["customer_id"], typo(rng, c["full_name"])) for c in sample]
+    latencies, top1, top5 = [], 0, 0
+    for customer_id, query in queries:
+        start = time.perf_counter()
+        matches = index.search(query)
+        latencies.append(time.perf_counter() - start)
+        ids = [m[0] for m in matches]
+        top1 += bool(ids) and ids[0] == customer_id
+        top5 += customer_id in ids
+    start = time.perf_counter()
+    for c in sample:
+        index.search(c["full_name"])
+    exact_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    print(f"NameIndex.search (typo)  : p50 {percentile(latencies, 50) * 1e6:8.0f} µs | "
+          f"p99 {percentile(latencies, 99) * 1e6:8.0f} µs | hit@1 {top1 / len(queries):.1%} | hit@5 {top5 / len(queries):.1%}")
+    print(f"NameIndex.search (exact) : {exact_us:8.1f} µs")
+
+    names = [normalize_name(c["full_name"]) for c in customers]
+    by_name = {}
+    for c, n in zip(customers, names):
+        by_name.setdefault(n, c["customer_id"])
+    scan, scan_top1 = [], 0
+    for customer_id, query in queries[:args.scan_queries]:
+        start = time.perf_counter()
+        best = difflib.get_close_matches(normalize_name(query), names, n=1, cutoff=0.6)
+        scan.append(time.perf_counter() - start)
+        scan_top1 += bool(best) and by_name[best[0]] == customer_id
+    if scan:
+        mean = sum(scan) / len(scan)
+        print(f"difflib linear scan      : mean {mean * 1e6:8.0f} µs | hit@1 {scan_top1}/{len(scan)} "
+              f"({mean / percentile(latencies, 50):.0f}x slower than the index p50)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# file: benchmarks/bench_salary_slips.py
+"""
+Salary slip parsing throughput: many PDF/CSV/XLSX slips parsed sequentially,
+in parallel across processes, and again from the content-hash cache.
+
+    python benchmarks/bench_salary_slips.py --slips 3000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import synthetic_data  # noqa: F401  (puts the repo root on sys.path)
+import salary_slip
+
+
+def write_pdf(path, salary):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("helvetica", size=12)
+    rows = [("Employee Name: Test", ""), ("Basic Salary", f"{salary + 5000:,.2f}"),
+            ("Tax", "5,000.00"), ("Net Salary", f"{salary:,.2f}")]
+    for label, amount in rows:
+        pdf.cell(100, 10, label)
+        pdf.cell(80, 10, amount, new_x="LMARGIN", new_y="NEXT")
+    pdf.output(path)
+
+
+def write_csv(path, salary):
+    with open(path, "w") as f:
+        f.write(f"Earnings,Amount\nBasic Salary,{salary + 5000}\nNet Pay,{salary}\n")
+
+
+def write_xlsx(path, salary):
+    ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("xl/sharedStrings.xml", f'<sst xmlns="{ns}"><si><t>Net Salary</t></si></sst>')
+        z.writestr("xl/worksheets/sheet1.xml",
+                   f'<worksheet xmlns="{ns}"><sheetData><row r="1"><c r="A1" t="s"><v>0</v></c>'
+                   f'<c r="B1"><v>{salary}</v></c></row></sheetData></worksheet>')
+
+
+WRITERS = [(".pdf", write_pdf), (".csv", write_csv), (".xlsx", write_xlsx)]
+
+
+def parse_one(path):
+    return salary_slip.extract_salary(path)["monthly_salary"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slips", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.slips):
+            ext, writer = WRITERS[i % len(WRITERS)]
+            path = os.path.join(tmp, f"slip_{i}{ext}")
+            writer(path, 30000 + i)
+            paths.append(path)
+
+        start = time.perf_counter()
+        for p in paths:
+            parse_one(p)
+        seq_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for p in paths:
+            parse_one(p)
+        cached_s = time.perf_counter() - start
+
+        # spawn so workers start with an empty cache rather than a forked warm one
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(os.path.basename, paths[:args.workers]))  # start the workers
+            start = time.perf_counter()
+            salaries = list(pool.map(parse_one, paths, chunksize=32))
+            par_s = time.perf_counter() - start
+
+    assert salaries == [30000 + i for i in range(args.slips)]
+    n = len(paths)
+    print(f"{n} slips (pdf/csv/xlsx mix)")
+    print(f"sequential, cold : {n / seq_s:>10,.0f} slips/s")
+    print(f"{args.workers} processes, cold: {n / par_s:>10,.0f} slips/s")
+    print(f"content-hash hits: {n / cached_s:>10,.0f} slips/s  {salary_slip.cache_stats}")
+
+
+if __name__ == "__main__":
+    main()
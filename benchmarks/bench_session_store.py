@@ -0,0 +1,155 @@
+# file: benchmarks/bench_session_store.py
+"""
+Multi-process chat throughput with externalized sessions: --workers
+processes serve one shared session store (SESSION_STORE, sqlite or file),
+and every turn of every conversation is sent to a different worker than the
+turn before, so each turn has to resume its session from the store.
+
+Conversations are the same scripted ones as bench_chat_interface.py (stub
+LLM, real underwriting, slips and letters). Throughput should grow close to
+linearly with the worker count up to the number of cores; beyond that the
+workers just share CPUs.
+
+    python benchmarks/bench_session_store.py --conversations 2000 --workers 1,2,4 --store sqlite
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from synthetic_data import make_customers
+from bench_chat_interface import StubModel, make_conversations
+
+
+def worker_main(tasks, results, customers_path: str, conversations: list, args: dict):
+    """Serve rounds of turns: receive [(conversation, session_id, step)], send back the new steps."""
+    import customer_store
+    customer_store.get_customer_store(customers_path)
+    import gemini_api
+    gemini_api._models[gemini_api.DEFAULT_MODEL] = StubModel(args["llm_latency"])
+    from gradio_app import chat_interface
+    from session_store import get_session_store
+
+    async def turn(sem, index, session_id, step):
+        script = conversations[index]
+        upload = script[step] if step == "upload_payslip" else None
+        message = "" if step == "upload_payslip" else script[step]
+        async with sem:
+            state = {"session_id": session_id} if session_id else None
+            async for _, state, *_ in chat_interface(message, state, upload):
+                pass
+        return index, state.session_id, state.step.value, step
+
+    async def run(batch):
+        sem = asyncio.Semaphore(args["concurrency"])
+        return await asyncio.gather(*(turn(sem, *item) for item in batch))
+
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        while True:
+            batch = tasks.get()
+            if batch is None:
+                break
+            results.put(asyncio.run(run(batch)))
+    results.put(get_session_store().stats)
+    from letter_service import letter_service
+    letter_service.shutdown()
+
+
+def run(workers: int, args, customers_path: str, conversations: list, store_spec: str) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    env = {"SESSION_STORE": store_spec, "LLM_CACHE_PATH": "", "TRACE_FILE": "",
+           "SANCTION_LETTER_DIR": os.path.join(os.path.dirname(customers_path), "letters"),
+           "UPLOAD_DIR": os.path.join(os.path.dirname(customers_path), "uploads"),
+           "AUDIT_LOG_DIR": os.path.join(os.path.dirname(customers_path), "audit_log")}
+    # set before spawning: the workers import this module (and with it gradio_app
+    # and session_store, which read their settings at import) before worker_main runs
+    os.environ.update(env)
+    queues = [ctx.Queue() for _ in range(workers)]
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker_main, args=(q, results, customers_path, conversations, vars(args)))
+             for q in queues]
+    for p in procs:
+        p.start()
+
+    # warm-up round so imports and pools are not timed: one throwaway conversation per worker
+    for q in queues:
+        q.put([(0, None, "start")])
+    for _ in queues:
+        results.get()
+
+    live = [(i, None, "start") for i in range(len(conversations))]
+    turns, hops = 0, 0
+    start = time.perf_counter()
+    rnd = 0
+    while live:
+        # conversation i's turn in round r goes to worker (i + r) % workers: a new worker every turn
+        chunks = [[] for _ in range(workers)]
+        for item in live:
+            chunks[(item[0] + rnd) % workers].append(item)
+        for queue, chunk in zip(queues, chunks):
+            if chunk:
+                queue.put(chunk)
+        replies = [item for chunk in chunks if chunk for item in results.get()]
+        turns += len(replies)
+        hops += len(replies) if workers > 1 and rnd else 0  # resumed from another worker's save
+        live = [(index, session_id, step) for index, session_id, step, handled in replies if handled != "done"]
+        rnd += 1
+    elapsed = time.perf_counter() - start
+
+    for q in queues:
+        q.put(None)
+    stats = [results.get() for _ in queues]
+    for p in procs:
+        p.join()
+    saves = sum(s["saves"] for s in stats)
+    return {"turns": turns, "seconds": elapsed, "hops": hops,
+            "record_bytes": sum(s["bytes_saved"] for s in stats) / max(saves, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts (default 1,2,4,... up to the CPUs)")
+    parser.add_argument("--store", choices=["sqlite", "file"], default="sqlite")
+    parser.add_argument("--concurrency", type=int, default=200, help="turns in flight per worker")
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(w) for w in args.workers.split(",")]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= cpus:
+            counts.append(counts[-1] * 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        customers_path = os.path.join(tmp, "customers.json")
+        customers = make_customers(args.customers)
+        with open(customers_path, "w") as f:
+            json.dump(customers, f)
+        slip_dir = os.path.join(tmp, "slips")
+        os.makedirs(slip_dir)
+        conversations = make_conversations(customers, args.conversations, slip_dir)
+
+        print(f"{args.conversations} conversations, {args.store} session store, {cpus} CPUs")
+        print(f"{'workers':>7} | {'turns':>6} | {'turns/s':>8} | {'speedup':>7} | {'resumed elsewhere':>17} | {'record B':>8}")
+        base = None
+        for workers in counts:
+            spec = f"sqlite:{os.path.join(tmp, f'sessions{workers}.sqlite')}" if args.store == "sqlite" \
+                else f"file:{os.path.join(tmp, f'sessions{workers}')}"
+            r = run(workers, args, customers_path, conversations, spec)
+            rate = r["turns"] / r["seconds"]
+            base = base or rate
+            print(f"{workers:>7} | {r['turns']:>6} | {rate:>8,.0f} | {rate / base:>6.2f}x | "
+                  f"{r['hops']:>17} | {r['record_bytes']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# file: benchmarks/bench_startup.py
+"""
+Cold-start cost of the app's entry modules, each measured in a fresh
+interpreter with `python -X importtime`: total import time, wall time of the
+whole process, and the heaviest imports underneath. Also times the first
+tool call, which is where the lazily-created services now pay for loading
+customers.json.
+
+    python benchmarks/bench_startup.py --modules tools,gradio_app,agent --repeat 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from synthetic_data import REPO_ROOT
+
+FIRST_CALL = "import time, tools; t = time.perf_counter(); tools.verify_kyc('Priya Sharma'); " \
+             "print('FIRST_CALL_MS', (time.perf_counter() - t) * 1000)"
+
+
+def import_profile(module: str):
+    """Run `import module` in a fresh interpreter; returns (wall s, {module: cumulative µs})."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line.split("|")
+        try:
+            cumulative[parts[2].strip()] = int(parts[1])
+        except ValueError:
+            continue  # header line
+    return wall, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", default="tools,gradio_app,agent")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<12} | {'import ms':>9} | {'process ms':>10} | heaviest imports (cumulative ms)")
+    for module in args.modules.split(","):
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        wall, cumulative = min(runs, key=lambda r: r[1].get(module, 0))
+        own = cumulative.get(module, 0) / 1000
+        heavy = sorted(((us, name) for name, us in cumulative.items()
+                        if name != module and "." not in name), reverse=True)[:args.top]
+        print(f"{module:<12} | {own:>9.1f} | {wall * 1000:>10.1f} | "
+              + ", ".join(f"{name} {us / 1000:.0f}" for us, name in heavy))
+
+    env = dict(os.environ, TRACE_FILE="")
+    proc = subprocess.run([sys.executable, "-c", FIRST_CALL], cwd=REPO_ROOT, capture_output=True, text=True, env=env)
+    for line in proc.stdout.splitlines():
+        if line.startswith("FIRST_CALL_MS"):
+            print(f"first tools.verify_kyc() call (creates the services): {float(line.split()[1]):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# file: benchmarks/bench_tracing.py
+"""
+Per-span overhead of tracing.py: histogram only, histogram + JSONL export,
+the @traced decorator, and the cost of rendering the Prometheus text.
+
+    python benchmarks/bench_tracing.py --spans 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import synthetic_data  # noqa: F401  (puts the repo root on sys.path)
+import tracing
+
+
+def time_spans(n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        with tracing.span("bench.outer"):
+            with tracing.span("bench.inner", i=i):
+                pass
+    return (time.perf_counter() - start) / (2 * n) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=200000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.spans):
+        pass
+    loop_us = (time.perf_counter() - start) / args.spans * 1e6
+
+    tracing.TRACE_FILE = ""
+    print(f"histogram only      : {time_spans(args.spans):6.2f} µs/span")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracing.TRACE_FILE = os.path.join(tmp, "traces.jsonl")
+        us = time_spans(args.spans)
+        tracing.flush()
+        writer = tracing._writer
+        print(f"histogram + JSONL   : {us:6.2f} µs/span "
+              f"({writer.written:,} written, {writer.dropped:,} dropped by the bounded queue)")
+
+        @tracing.traced("bench.decorated")
+        def work(x):
+            return x
+
+        start = time.perf_counter()
+        for i in range(args.spans):
+            work(i)
+        print(f"@traced call        : {(time.perf_counter() - start) / args.spans * 1e6 - loop_us:6.2f} µs/call")
+
+        start = time.perf_counter()
+        text = tracing.metrics_text()
+        print(f"metrics_text()      : {(time.perf_counter() - start) * 1000:6.2f} ms ({len(text.splitlines())} lines)")
+        snap = tracing.snapshot()[("bench.inner", "ok")]
+        print(f"bench.inner p50/p95/p99: {snap['p50'] * 1e6:.1f} / {snap['p95'] * 1e6:.1f} / {snap['p99'] * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
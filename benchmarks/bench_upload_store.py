@@ -0,0 +1,142 @@
+# file: benchmarks/bench_upload_store.py
+"""
+A burst of concurrent salary slip uploads, stored two ways:
+
+    legacy   the old path: parse the temp file, then shutil.copy it to
+             uploads/<original name> (same-named files overwrite each other)
+    copy     upload_store.py, streaming copy + hash into the store
+
+Every upload arrives as its own temp file (as Gradio hands them over), and
+--duplicates of them repeat a slip that was uploaded before (retries,
+re-submissions). Reports uploads/s, the files kept, the new disk space they
+take, and how many uploads were lost to a name clash; then the time for a
+retention GC pass over the store.
+
+    python benchmarks/bench_upload_store.py --uploads 5000 --concurrency 64 --slip-kb 200
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import synthetic_data  # noqa: F401  (puts the repo root on sys.path)
+import salary_slip
+from upload_store import UploadStore
+
+# most people upload whatever their payroll portal called the file
+COMMON_NAMES = ["payslip.csv", "salary_slip.csv", "Payslip.csv", "slip.csv"]
+
+
+def make_slip(path: str, salary: int, size_kb: int):
+    """A CSV slip padded with itemised rows to about size_kb."""
+    with open(path, "w") as f:
+        f.write(f"Earnings,Amount\nBasic Salary,{salary + 5000}\nNet Pay,{salary}\n")
+        row, written = 0, 0
+        while written < size_kb * 1024:
+            line = f"Allowance {row},{(salary * 7 + row) % 997}.00\n"
+            f.write(line)
+            written += len(line)
+            row += 1
+
+
+def make_uploads(directory: str, args) -> list:
+    """(temp path, client file name) per upload; the temp files are fresh copies."""
+    rng = random.Random(11)
+    originals_dir = os.path.join(directory, "originals")
+    os.makedirs(originals_dir)
+    originals = []
+    uploads = []
+    for i in range(args.uploads):
+        if originals and rng.random() < args.duplicates:
+            src, name = rng.choice(originals)
+        else:
+            src = os.path.join(originals_dir, f"{len(originals)}.csv")
+            make_slip(src, 30000 + 13 * len(originals), args.slip_kb)
+            name = rng.choice(COMMON_NAMES) if rng.random() < 0.5 else f"payslip_{len(originals)}.csv"
+            originals.append((src, name))
+        tmp_path = os.path.join(directory, "incoming", str(i), name)
+        os.makedirs(os.path.dirname(tmp_path))
+        shutil.copyfile(src, tmp_path)
+        uploads.append((tmp_path, name, src))
+    return uploads
+
+
+def legacy_put(dest_dir: str, tmp_path: str, name: str):
+    salary_slip.extract_salary(tmp_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    shutil.copy(tmp_path, os.path.join(dest_dir, name))
+
+
+def store_put(store: UploadStore, tmp_path: str, name: str):
+    stored = store.put(tmp_path, name)
+    salary_slip.extract_salary(stored.path, sha256=stored.sha256, file_type=stored.file_type)
+
+
+def new_disk_bytes(directory: str) -> tuple:
+    """(files, bytes) under directory, not counting inodes shared with files elsewhere (hardlinks)."""
+    files, size, seen = 0, 0, set()
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.startswith(".") or name.startswith("index.sqlite"):
+                continue  # the store's own index
+            st = os.stat(os.path.join(root, name))
+            files += 1
+            if st.st_nlink == 1 and st.st_ino not in seen:
+                seen.add(st.st_ino)
+                size += st.st_blocks * 512
+    return files, size
+
+
+def run(mode: str, uploads: list, work_dir: str, concurrency: int) -> dict:
+    dest_dir = os.path.join(work_dir, f"uploads-{mode}")
+    salary_slip._cache.clear()  # every mode parses from a cold cache
+    if mode == "legacy":
+        put = lambda tmp_path, name: legacy_put(dest_dir, tmp_path, name)  # noqa: E731
+    else:
+        store = UploadStore(dest_dir, gc_interval=0)
+        put = lambda tmp_path, name: store_put(store, tmp_path, name)  # noqa: E731
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda u: put(u[0], u[1]), uploads))
+    elapsed = time.perf_counter() - start
+
+    files, size = new_disk_bytes(dest_dir)
+    distinct = len({src for _, _, src in uploads})
+    result = {"mode": mode, "rate": len(uploads) / elapsed, "files": files, "bytes": size,
+              "lost": max(distinct - files, 0)}
+    if mode != "legacy":
+        start = time.perf_counter()
+        gc = store.gc(now=time.time() + store.retention_seconds + 1)
+        result["gc_ms"] = (time.perf_counter() - start) * 1000
+        result["gc_removed"] = gc["removed"]
+        store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--slip-kb", type=int, default=200)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of uploads repeating an earlier slip")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uploads = make_uploads(tmp, args)
+        distinct = len({src for _, _, src in uploads})
+        print(f"{args.uploads} uploads of ~{args.slip_kb} KB ({distinct} distinct slips), "
+              f"{args.concurrency} at a time")
+        print(f"{'mode':8} {'uploads/s':>10} {'files':>7} {'new disk MB':>12} {'lost':>6} {'GC ms':>8}")
+        for mode in ("legacy", "copy"):
+            r = run(mode, uploads, tmp, args.concurrency)
+            gc = f"{r['gc_ms']:8.1f}" if "gc_ms" in r else f"{'-':>8}"
+            print(f"{mode:8} {r['rate']:10,.0f} {r['files']:7} {r['bytes'] / 1e6:12.1f} {r['lost']:6} {gc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# file: benchmarks/synthetic_data.py
+"""
+Synthetic customer records shaped like customers.json, for benchmarks.
+"""
+
+import os
+import random
+import sys
+
+# make the repo root importable when running `python benchmarks/<script>.py`
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+FIRST_NAMES = ["Priya", "Rohan", "Anjali", "Sameer", "Neha", "Arjun", "Kavya", "Vikram",
+               "Isha", "Rahul", "Meera", "Aditya", "Pooja", "Karan", "Sneha", "Amit"]
+LAST_NAMES = ["Sharma", "Verma", "Mehta", "Khan", "Iyer", "Reddy", "Gupta", "Nair",
+              "Patel", "Singh", "Das", "Joshi", "Rao", "Kapoor", "Bose", "Malhotra"]
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Pune", "Chennai", "Hyderabad", "Kolkata", "Noida"]
+
+
+def make_customers(n: int, seed: int = 42) -> list:
+    """Return `n` customer dicts with unique names and ids."""
+    rng = random.Random(seed)
+    customers = []
+    for i in range(n):
+        first = FIRST_NAMES[i % len(FIRST_NAMES)]
+        last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        city = rng.choice(CITIES)
+        customers.append({
+            "customer_id": f"TC-{100000 + i}",
+            # numeric suffix keeps names unique at any size
+            "full_name": f"{first} {last} {i}",
+            "age": rng.randint(21, 60),
+            "city": city,
+            "kyc_details": {
+                "phone_number": f"+91{rng.randint(7000000000, 9999999999)}",
+                "address": f"{rng.randint(1, 999)} Main Road, {city}",
+            },
+            "financial_profile": {
+                "credit_score": rng.randint(550, 900),
+                "pre_approved_limit": rng.randrange(25000, 500000, 5000),
+                "monthly_salary": rng.randrange(20000, 250000, 1000),
+                "existing_loans": [],
+            },
+        })
+    return customers
+
+
+def make_sessions(customers: list, n: int, slip_path: str = None, seed: int = 42) -> list:
+    """
+    Return `n` scripted sessions (see replay.py) over `customers`: a mix of
+    in-limit approvals, salary-slip cases, over-limit rejects, wrong phone
+    digits and unknown customers.
+    """
+    rng = random.Random(seed)
+    sessions = []
+    for i in range(n):
+        c = rng.choice(customers)
+        name = c["full_name"]
+        limit = c["financial_profile"]["pre_approved_limit"]
+        last4 = c["kyc_details"]["phone_number"][-4:]
+        kind = rng.random()
+        if kind < 0.05:
+            name, inputs = f"Unknown Person {i}", ["Personal loan", "50000"]
+        elif kind < 0.10:
+            inputs = ["Personal loan", str(limit // 2), "0000" if last4 != "0000" else "1111"]
+        elif kind < 0.55:
+            inputs = ["Home renovation", str(rng.randrange(10000, limit + 1, 1000)), last4]
+        elif kind < 0.80 and slip_path:
+            inputs = ["Wedding", str(rng.randrange(limit + 1000, 2 * limit + 1, 1000)), last4, slip_path]
+        else:
+            inputs = ["Business", str(2 * limit + rng.randrange(1000, 100000, 1000)), last4]
+        sessions.append({"session_id": f"s-{i}", "customer_name": name, "inputs": inputs})
+    return sessions
@@ -0,0 +1,86 @@
+# file: chat_session.py
+"""
+One web chat conversation: where it is in the loan flow, what we know so
+far, and the recent chat history.
+
+- ChatSession is a slotted dataclass, so a session is a single small object
+  rather than a dict of loose keys. The flow position is a Step.
+- History is a window: trim_history() keeps the last CHAT_HISTORY_MAX
+  messages, so a conversation that goes on after its decision doesn't grow
+  without bound (or cost more to save every turn).
+- to_state() writes only the fields that differ from their defaults, which
+  is what session_store.py saves. from_record() reads that back (and the old
+  full dicts).
+- A finished session (Step.DONE) stays in the store like any other, so
+  later messages on the same page get DONE_MESSAGE and the letter again;
+  reloading the page starts a new application.
+"""
+
+import os
+import uuid
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from typing import Optional
+
+CHAT_HISTORY_MAX = int(os.getenv("CHAT_HISTORY_MAX", 40))
+
+
+class Step(str, Enum):
+    """Where a conversation is; the values are what older saved sessions use."""
+    START = "start"
+    GET_NAME = "get_name"
+    GET_AMOUNT = "get_amount"
+    VERIFY_PHONE = "verify_phone_digits"
+    UPLOAD_PAYSLIP = "upload_payslip"
+    DONE = "done"
+
+
+def _new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+@dataclass(slots=True)
+class ChatSession:
+    session_id: str = field(default_factory=_new_session_id)
+    step: Step = Step.START
+    customer_name: str = ""
+    customer_id: Optional[str] = None
+    loan_amount: float = 0.0
+    underwriting_result: Optional[dict] = None
+    sanction_file: Optional[str] = None
+    payslip_file: Optional[str] = None
+    monthly_salary: Optional[float] = None
+    pre_approved_limit: Optional[float] = None
+    history: list = field(default_factory=list)  # (user, bot) pairs, newest last
+
+    @property
+    def customer_key(self) -> str:
+        """customer_id once the name is resolved; the typed name otherwise (it won't be found)."""
+        return self.customer_id or self.customer_name
+
+    def trim_history(self, max_messages: int = CHAT_HISTORY_MAX):
+        """Keep only the newest `max_messages` entries."""
+        if len(self.history) > max_messages:
+            del self.history[:-max_messages]
+
+    def to_state(self) -> dict:
+        """The fields (minus history) that differ from a new session's; session_id always."""
+        state = {"session_id": self.session_id}
+        for f in _STATE_FIELDS:
+            value = getattr(self, f.name)
+            if value != _DEFAULTS[f.name]:
+                state[f.name] = value.value if isinstance(value, Step) else value
+        return state
+
+    @classmethod
+    def from_record(cls, state: dict, history: list = None) -> "ChatSession":
+        """Rebuild from to_state() output (or an older full state dict; unknown keys are ignored)."""
+        session = cls(session_id=state.get("session_id") or _new_session_id(),
+                      history=list(history) if history else [],
+                      **{key: value for key, value in state.items() if key in _DEFAULTS})
+        session.step = Step(session.step)
+        return session
+
+
+_STATE_FIELDS = [f for f in fields(ChatSession) if f.name not in ("session_id", "history")]
+_DEFAULTS = {f.name: f.default for f in _STATE_FIELDS}
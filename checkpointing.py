@@ -0,0 +1,254 @@
+# file: checkpointing.py
+"""
+Tuned SQLite checkpointer for the LangGraph workflow.
+
+SqliteSaver commits every node transition on one shared connection. This
+subclass keeps the same schema and API but:
+- runs the database in WAL mode with synchronous=NORMAL, so readers never
+  block the writer and commits don't fsync on every transaction,
+- funnels writes through one writer connection and commits them in batches
+  (every `commit_every` writes or `commit_interval` seconds, whichever comes
+  first; a background thread flushes idle batches),
+- serves reads from a per-thread reader connection, after flushing the
+  pending batch so a thread always sees its own checkpoints (a reader is
+  closed once its thread has exited),
+- prunes finished threads: `finish_thread()` drops every checkpoint but the
+  last one, and threads finished more than `retention_seconds` ago are
+  deleted entirely, so checkpoints.sqlite stops growing with traffic.
+
+A crash can lose at most the last `commit_interval` seconds of checkpoints;
+a lost checkpoint only means that conversation restarts from an earlier node.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from tracing import span
+
+DEFAULT_CHECKPOINT_PATH = os.getenv("CHECKPOINT_DB", "checkpoints.sqlite")
+COMMIT_EVERY = int(os.getenv("CHECKPOINT_COMMIT_EVERY", 64))
+COMMIT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_COMMIT_INTERVAL", 0.05))
+RETENTION_SECONDS = float(os.getenv("CHECKPOINT_RETENTION_SECONDS", 24 * 3600))
+PRUNE_INTERVAL_SECONDS = 60.0
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # keep the WAL file from growing past 64 MB between checkpoints
+    conn.execute("PRAGMA journal_size_limit=67108864")
+    return conn
+
+
+class TunedSqliteSaver(SqliteSaver):
+    """Drop-in SqliteSaver with WAL, batched commits, per-thread readers and pruning."""
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH, *, commit_every: int = COMMIT_EVERY,
+                 commit_interval: float = COMMIT_INTERVAL_SECONDS,
+                 retention_seconds: float = RETENTION_SECONDS, serde=None):
+        super().__init__(_connect(path), serde=serde)
+        self.path = path
+        self.commit_every = max(1, commit_every)
+        self.commit_interval = commit_interval
+        self.retention_seconds = retention_seconds
+        self.stats = {"writes": 0, "commits": 0, "reads": 0, "finished": 0, "pruned_threads": 0}
+
+        self._pending = 0
+        self._first_pending_at = 0.0
+        self._last_prune = time.monotonic()
+        # in-memory databases are private to one connection, so they can't have readers
+        self._use_readers = path not in ("", ":memory:") and not path.startswith("file::memory:")
+        self._readers = threading.local()
+        self._reader_conns = {}  # thread -> its reader connection, so close() can reach them all
+
+        self._closed = threading.Event()
+        self._flusher = None
+        if commit_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flusher", daemon=True)
+            self._flusher.start()
+
+    # ----------------------------
+    # Schema
+    # ----------------------------
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS finished_threads (
+                thread_id TEXT PRIMARY KEY,
+                finished_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS finished_threads_at ON finished_threads(finished_at);
+            """
+        )
+
+    # ----------------------------
+    # Connections
+    # ----------------------------
+    @contextmanager
+    def cursor(self, transaction: bool = True):
+        """
+        Writes go to the shared writer connection and are committed in batches.
+        Reads flush the pending batch, then use this thread's reader connection.
+        """
+        if transaction:
+            with span("checkpoint.write"), self.lock:
+                self.setup()
+                cur = self.conn.cursor()
+                try:
+                    yield cur
+                finally:
+                    cur.close()
+                    self._after_write()
+            return
+
+        with span("checkpoint.read"):
+            with self.lock:
+                self.setup()
+                self._commit()
+            self.stats["reads"] += 1
+            if not self._use_readers:
+                with self.lock:
+                    cur = self.conn.cursor()
+                    try:
+                        yield cur
+                    finally:
+                        cur.close()
+                return
+
+            cur = self._reader().cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = _connect(self.path)
+            self._readers.conn = conn
+            with self.lock:
+                # worker threads come and go (thread pools, one per request):
+                # don't keep the connections of the ones that are gone
+                for thread in [t for t in self._reader_conns if not t.is_alive()]:
+                    self._reader_conns.pop(thread).close()
+                self._reader_conns[threading.current_thread()] = conn
+        return conn
+
+    # ----------------------------
+    # Batched commits (call with self.lock held)
+    # ----------------------------
+    def _after_write(self):
+        self.stats["writes"] += 1
+        if self._pending == 0:
+            self._first_pending_at = time.monotonic()
+        self._pending += 1
+        if self._pending >= self.commit_every or time.monotonic() - self._first_pending_at >= self.commit_interval:
+            self._commit()
+
+    def _commit(self):
+        if self._pending:
+            self.conn.commit()
+            self._pending = 0
+            self.stats["commits"] += 1
+
+    def flush(self):
+        """Commit every pending checkpoint write now."""
+        with self.lock:
+            self._commit()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.commit_interval):
+            try:
+                with self.lock:
+                    if self._pending and time.monotonic() - self._first_pending_at >= self.commit_interval:
+                        self._commit()
+                if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                    self.prune()
+            except sqlite3.Error as e:
+                print(f"[Checkpoint] Background flush failed: {e}")
+
+    # ----------------------------
+    # Retention
+    # ----------------------------
+    def finish_thread(self, thread_id: str):
+        """
+        Mark a conversation as finished: keep only its final checkpoint (so its
+        end state can still be read) and schedule it for deletion after
+        `retention_seconds`.
+        """
+        thread_id = str(thread_id)
+        with self.cursor() as cur:
+            cur.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id NOT IN"
+                " (SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? GROUP BY checkpoint_ns)",
+                (thread_id, thread_id),
+            )
+            cur.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN"
+                " (SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?)",
+                (thread_id, thread_id),
+            )
+            cur.execute(
+                "INSERT OR REPLACE INTO finished_threads (thread_id, finished_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+        self.stats["finished"] += 1
+
+    def prune(self, older_than: float = None) -> int:
+        """Delete threads finished more than `older_than` seconds ago; returns how many."""
+        older_than = self.retention_seconds if older_than is None else older_than
+        cutoff = time.time() - older_than
+        with self.cursor() as cur:
+            cur.execute("SELECT thread_id FROM finished_threads WHERE finished_at <= ?", (cutoff,))
+            expired = [(row[0],) for row in cur.fetchall()]
+            if expired:
+                cur.executemany("DELETE FROM checkpoints WHERE thread_id = ?", expired)
+                cur.executemany("DELETE FROM writes WHERE thread_id = ?", expired)
+                cur.executemany("DELETE FROM finished_threads WHERE thread_id = ?", expired)
+        self._last_prune = time.monotonic()
+        if expired:
+            self.stats["pruned_threads"] += len(expired)
+            print(f"[Checkpoint] Pruned {len(expired)} finished thread(s)")
+        return len(expired)
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM finished_threads WHERE thread_id = ?", (str(thread_id),))
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self.lock:
+            self._commit()
+            for conn in self._reader_conns.values():
+                conn.close()
+            self._reader_conns.clear()
+            self.conn.close()
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer(path: str = DEFAULT_CHECKPOINT_PATH) -> TunedSqliteSaver:
+    """Return the process-wide checkpointer, opening the database on first use."""
+    global _checkpointer
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                _checkpointer = TunedSqliteSaver(path)
+    return _checkpointer
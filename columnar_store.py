@@ -0,0 +1,357 @@
+# file: columnar_store.py
+"""
+Memory-mapped, columnar customer file.
+
+json.load turns every customer into nested dicts: at millions of records
+that is gigabytes per process, paid again in every worker. A .col file holds
+the same data column by column and is opened with mmap, so it costs no
+parsing, and all processes reading it share the same page-cache pages:
+
+    python columnar_store.py customers.json customers.col   # convert (atomic)
+    CUSTOMERS_PATH=customers.col python gradio_app.py        # serve from it
+
+    snapshot = ColumnarSnapshot("customers.col")
+    snapshot.fields("TC-1001", "credit_score", "pre_approved_limit")  # (810, 150000)
+    snapshot.column("monthly_salary")                        # NumPy view, no copy
+
+Layout (little-endian, every section 8-byte aligned):
+    MAGIC | header length (uint64) | JSON header | sections
+The header lists each section's offset. Sections are:
+- numeric columns (age, credit_score, pre_approved_limit, monthly_salary):
+  one int64 or float64 array each;
+- string columns (ids, names, city, phone, address, existing_loans as JSON):
+  a uint64 offsets array (count + 1) and a UTF-8 blob;
+- lookup indexes for customer_id and normalized full name: a sorted array of
+  64-bit key hashes plus the matching rows, searched with searchsorted and
+  confirmed against the stored string;
+- the fuzzy name index (name_index.build_trigrams: posting lists per
+  trigram and trigrams per row), so each process maps it instead of
+  building it;
+- a per-row content hash, so reloads can count changed customers without
+  decoding them.
+
+ColumnarSnapshot has the CustomerSnapshot interface (row_of, get, fields,
+customers, ...), so customer_store.CustomerStore serves either one; records
+are only built when something asks for a whole record.
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+
+from customer_store import FIELD_PATHS, load_customers, normalize_name
+from name_index import build_trigrams, encode_names
+
+MAGIC = b"SLCOL001"
+NUMERIC_FIELDS = ("age", "credit_score", "pre_approved_limit", "monthly_salary")
+STRING_FIELDS = ("customer_id", "full_name", "city", "phone_number", "address")
+JSON_FIELDS = ("existing_loans",)  # stored as JSON text, decoded on access
+TRIGRAM_ARRAYS = ("keys", "starts", "postings", "counts", "row_trigrams")  # name_index.NameIndex, prebuilt
+RECORD_KEYS = {"customer_id", "full_name", "age", "city", "kyc_details", "financial_profile"}
+
+
+def key_hash(text: str) -> int:
+    """Stable 64-bit hash (the same in every process, unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def is_columnar_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+# ----------------------------
+# Writing
+# ----------------------------
+def _dig(record: dict, field: str):
+    value = record
+    for part in FIELD_PATHS[field]:
+        value = value[part]
+    return value
+
+
+def _numeric_column(values: list) -> np.ndarray:
+    # ints stay ints, so records read back exactly as they were written
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return np.array(values, dtype="<i8")
+    return np.array(values, dtype="<f8")
+
+
+def _string_column(values: list) -> tuple:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _hash_index(keys: list) -> tuple:
+    hashes = np.fromiter((key_hash(k) for k in keys), dtype="<u8", count=len(keys))
+    rows = np.argsort(hashes, kind="stable")  # equal hashes keep row order: first record wins
+    return hashes[rows], rows.astype("<u8")
+
+
+def write_columnar(customers: list, path: str, source_version=None) -> dict:
+    """Write `customers` (customers.json records) to a .col file, atomically."""
+    for c in customers:
+        unknown = set(c) - RECORD_KEYS
+        if unknown:
+            raise ValueError(f"{c.get('customer_id')}: unsupported fields {sorted(unknown)}")
+
+    sections = {}
+    for field in NUMERIC_FIELDS:
+        sections[f"num.{field}"] = _numeric_column([_dig(c, field) for c in customers])
+    for field in STRING_FIELDS + JSON_FIELDS:
+        values = [_dig(c, field) for c in customers]
+        if field in JSON_FIELDS:
+            values = [json.dumps(v, separators=(",", ":")) for v in values]
+        offsets, blob = _string_column(values)
+        sections[f"str.{field}.offsets"] = offsets
+        sections[f"str.{field}.data"] = np.frombuffer(blob, dtype=np.uint8)
+    sections["idx.id.hash"], sections["idx.id.rows"] = _hash_index([c["customer_id"] for c in customers])
+    sections["idx.name.hash"], sections["idx.name.rows"] = _hash_index(
+        [normalize_name(c["full_name"]) for c in customers])
+    trigrams = build_trigrams(*encode_names((c["full_name"] for c in customers), len(customers)))
+    for name in TRIGRAM_ARRAYS:
+        sections[f"tri.{name}"] = trigrams[name].ravel()  # row_trigrams is 2-D: stored row by row
+    sections["row_hash"] = np.fromiter(
+        (key_hash(json.dumps(c, sort_keys=True)) for c in customers), dtype="<u8", count=len(customers))
+
+    # header offsets are relative to the end of the header, so they don't depend on its length
+    layout, position = {}, 0
+    for name, array in sections.items():
+        layout[name] = {"dtype": array.dtype.str, "offset": position, "length": len(array)}
+        position += -(-array.nbytes // 8) * 8
+    header = json.dumps({
+        "count": len(customers),
+        "created_at": time.time(),
+        "source_version": source_version,
+        "sections": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for array in sections.values():
+            data = array.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)  # readers never see a half-written file
+    return {"count": len(customers), "bytes": os.path.getsize(path)}
+
+
+def convert(source: str, dest: str, verify: bool = False) -> dict:
+    """customers.json → .col; with `verify`, read every record back and compare."""
+    start = time.perf_counter()
+    customers = load_customers(source)
+    stats = write_columnar(customers, dest, source_version=list(os.stat(source)[8:10]))
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    if verify:
+        snapshot = ColumnarSnapshot(dest)
+        stats["mismatches"] = sum(1 for row, c in enumerate(customers) if snapshot.record(row) != c)
+    return stats
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+class _Records:
+    """Read-only sequence of a ColumnarSnapshot's records, each built when accessed."""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._snapshot.record(r) for r in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("customer row out of range")
+        return self._snapshot.record(row)
+
+    def __iter__(self):
+        return (self._snapshot.record(row) for row in range(len(self)))
+
+
+class ColumnarSnapshot:
+    """One .col file, memory-mapped read-only (same interface as CustomerSnapshot)."""
+
+    def __init__(self, path: str, version=None):
+        self.path = path
+        self.version = version
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a columnar customer file")
+        header_len = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 8], "little")
+        base = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[base:base + header_len])
+        base += header_len
+
+        # NumPy views for whole-column work; memoryviews for single values
+        # (indexing one returns a plain int/float, several times faster)
+        self._sections, self._scalars = {}, {}
+        raw = memoryview(self._mmap)
+        for name, s in self.header["sections"].items():
+            dtype = np.dtype(s["dtype"])
+            start = base + s["offset"]
+            self._sections[name] = np.frombuffer(self._mmap, dtype=dtype, count=s["length"], offset=start)
+            self._scalars[name] = raw[start:start + dtype.itemsize * s["length"]].cast(dtype.char)
+        self._count = self.header["count"]
+        self.row_hash = self._sections["row_hash"]
+        self.customers = _Records(self)
+
+    def __len__(self):
+        return self._count
+
+    # ----------------------------
+    # Columns
+    # ----------------------------
+    def column(self, field: str) -> np.ndarray:
+        """A numeric field for every customer, as a read-only view into the file."""
+        return self._sections[f"num.{field}"]
+
+    def text(self, field: str, row: int) -> str:
+        offsets = self._scalars[f"str.{field}.offsets"]
+        return str(self._scalars[f"str.{field}.data"][offsets[row]:offsets[row + 1]], "utf-8")
+
+    def name_trigrams(self):
+        """The stored name_index.build_trigrams() arrays, or None for a file written without them."""
+        if "tri.keys" not in self._sections:
+            return None
+        arrays = {name: self._sections[f"tri.{name}"] for name in TRIGRAM_ARRAYS}
+        width = len(arrays["row_trigrams"]) // self._count if self._count else 0
+        arrays["row_trigrams"] = arrays["row_trigrams"].reshape(self._count, width)
+        return arrays
+
+    def value(self, field: str, row: int):
+        if field in NUMERIC_FIELDS:
+            return self._scalars[f"num.{field}"][row]
+        text = self.text(field, row)
+        return json.loads(text) if field in JSON_FIELDS else text
+
+    def field_values(self, field: str):
+        """One field for every customer as a list of Python values (column() is the no-copy view)."""
+        if field in NUMERIC_FIELDS:
+            return self.column(field).tolist()
+        offsets = self._sections[f"str.{field}.offsets"].tolist()
+        data = self._sections[f"str.{field}.data"].tobytes()
+        values = [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+        return [json.loads(v) for v in values] if field in JSON_FIELDS else values
+
+    def record(self, row: int) -> dict:
+        """The full customers.json record for one row (only when a caller needs all of it)."""
+        v = lambda field: self.value(field, row)  # noqa: E731
+        return {
+            "customer_id": v("customer_id"),
+            "full_name": v("full_name"),
+            "age": v("age"),
+            "city": v("city"),
+            "kyc_details": {"phone_number": v("phone_number"), "address": v("address")},
+            "financial_profile": {
+                "credit_score": v("credit_score"),
+                "pre_approved_limit": v("pre_approved_limit"),
+                "monthly_salary": v("monthly_salary"),
+                "existing_loans": v("existing_loans"),
+            },
+        }
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def _find(self, index: str, key: str, field: str) -> int:
+        hashes = self._scalars[f"idx.{index}.hash"]
+        h = key_hash(key)
+        i = bisect.bisect_left(hashes, h)
+        while i < len(hashes) and hashes[i] == h:  # confirm: 64-bit hashes can collide
+            row = self._scalars[f"idx.{index}.rows"][i]
+            stored = self.text(field, row)
+            if (stored if index == "id" else normalize_name(stored)) == key:
+                return row
+            i += 1
+        return -1
+
+    def row_of(self, key: str) -> int:
+        """Row of a customer by customer_id or full name, or -1 if unknown."""
+        row = self._find("id", key, "customer_id")
+        if row < 0:
+            row = self._find("name", normalize_name(key), "full_name")
+        return row
+
+    def get_by_id(self, customer_id: str):
+        row = self._find("id", customer_id, "customer_id")
+        return None if row < 0 else self.record(row)
+
+    def row_of_name(self, name: str) -> int:
+        """Row of a customer by full name only, or -1 if unknown."""
+        return self._find("name", normalize_name(name), "full_name")
+
+    def get_by_name(self, name: str):
+        row = self.row_of_name(name)
+        return None if row < 0 else self.record(row)
+
+    def get(self, key: str):
+        """Look up a customer by customer_id first, then by full name."""
+        row = self.row_of(key)
+        return None if row < 0 else self.record(row)
+
+    def fields(self, key: str, *names: str):
+        """Tuple of the named fields for one customer, read without building the record."""
+        row = self.row_of(key)
+        if row < 0:
+            return None
+        return tuple(self.value(name, row) for name in names)
+
+    def diff(self, old) -> tuple:
+        """(added, removed, changed) customer counts going from `old` to this snapshot."""
+        if not isinstance(old, ColumnarSnapshot):
+            added, removed, changed = 0, 0, 0
+            old_rows = {c["customer_id"]: c for c in old.customers}
+            for row in range(len(self)):
+                previous = old_rows.pop(self.text("customer_id", row), None)
+                if previous is None:
+                    added += 1
+                elif previous != self.record(row):
+                    changed += 1
+            return added, len(old_rows), changed
+        new_ids, old_ids = self._sections["idx.id.hash"], old._sections["idx.id.hash"]
+        kept = np.isin(new_ids, old_ids, assume_unique=True)
+        kept_rows = self._sections["idx.id.rows"][kept]
+        old_rows = old._sections["idx.id.rows"][np.searchsorted(old_ids, new_ids[kept])]
+        changed = int(np.count_nonzero(self.row_hash[kept_rows] != old.row_hash[old_rows]))
+        return int(len(new_ids) - kept.sum()), int(len(old_ids) - kept.sum()), changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert customers.json to a memory-mapped .col file")
+    parser.add_argument("source", nargs="?", default="customers.json")
+    parser.add_argument("dest", nargs="?", default="customers.col")
+    parser.add_argument("--verify", action="store_true", help="read every record back and compare")
+    args = parser.parse_args()
+
+    stats = convert(args.source, args.dest, verify=args.verify)
+    print(f"[Columnar] Wrote {stats['count']} customers to {args.dest} "
+          f"({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']} s")
+    if args.verify:
+        print(f"[Columnar] Verified: {stats['mismatches']} mismatching records")
+
+
+if __name__ == "__main__":
+    main()
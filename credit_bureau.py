@@ -1,21 +1,16 @@
 # file: credit_bureau.py
-import json
-
-def load_customers():
-    with open("customers.json", "r") as f:
-        return json.load(f)
+from customer_store import get_customer_store
 
 class CreditBureau:
     """Mock credit bureau for returning a customer’s credit score."""
 
-    def __init__(self):
-        self.customers = load_customers()
+    def __init__(self, store=None):
+        self.store = store if store is not None else get_customer_store()
 
     def get_credit_score(self, name: str) -> dict:
         print(f"[Credit Bureau] Checking credit score for {name}...")
-        for c in self.customers:
-            if c["full_name"].lower() == name.lower():
-                score = c["financial_profile"]["credit_score"]
-                return {"status": "success", "score": score}
+        found = self.store.fields(name, "credit_score")
+        if found is not None:
+            return {"status": "success", "score": found[0]}
         print("[Credit Bureau] Customer not found.")
         return {"status": "error", "message": "Customer not found"}
@@ -1,31 +1,33 @@
-import json
-
-def load_customers():
-    with open("customers.json", "r") as f:
-        return json.load(f)
+from customer_store import get_customer_store
 
 class CRMServer:
     """Simulated CRM server that stores customer KYC details."""
 
-    def __init__(self):
-        self.customers = load_customers()
+    def __init__(self, store=None):
+        self.store = store if store is not None else get_customer_store()
 
     def get_kyc_details(self, name: str) -> dict:
         print(f"[CRM] Looking up KYC for {name}...")
-        for c in self.customers:
-            if c["full_name"].lower() == name.lower():
-                print("[CRM] KYC found.")
-                return {"status": "success", "kyc": c["kyc_details"]}
+        found = self.store.fields(name, "phone_number", "address", "full_name")
+        if found is not None:
+            print("[CRM] KYC found.")
+            return {"status": "success",
+                    "kyc": {"phone_number": found[0], "address": found[1], "full_name": found[2]}}
         print("[CRM] KYC not found.")
         return {"status": "error", "message": "Customer not found"}
 
     def verify_phone_last4(self, name: str, last4_digits: str) -> dict:
         """Verify if last 4 digits match customer's phone number."""
-        for c in self.customers:
-            if c["full_name"].lower() == name.lower():
-                phone = c["kyc_details"]["phone_number"]
-                if phone[-4:] == last4_digits:
-                    return {"status": "success", "message": "Phone verification successful"}
-                else:
-                    return {"status": "error", "message": "Phone number mismatch"}
-        return {"status": "error", "message": "Customer not found"}
+        found = self.store.fields(name, "phone_number")
+        if found is None:
+            return {"status": "error", "message": "Customer not found"}
+        return self.match_phone_last4({"phone_number": found[0]}, last4_digits)
+
+    @staticmethod
+    def match_phone_last4(kyc: dict, last4_digits: str) -> dict:
+        """verify_phone_last4 against KYC details already fetched (no lookup)."""
+        phone = kyc["phone_number"]
+        if phone[-4:] == last4_digits:
+            return {"status": "success", "message": "Phone verification successful"}
+        else:
+            return {"status": "error", "message": "Phone number mismatch"}
@@ -0,0 +1,303 @@
+# file: customer_store.py
+"""
+Shared, indexed customer repository.
+
+customers.json is loaded once per process and kept behind hash indexes on the
+normalized full name and on customer_id, so CRMServer, CreditBureau and
+OfferMart all share one copy of the data and every lookup is O(1).
+
+The data lives in an immutable CustomerSnapshot. When customers.json changes
+on disk, a background watcher builds a new snapshot and swaps it in with one
+reference assignment: lookups already running keep the snapshot they started
+with, new lookups see the new data, and nobody has to restart.
+
+The store can also serve a memory-mapped columnar file built from
+customers.json (see columnar_store.py): point CUSTOMERS_PATH at the .col
+file and the same lookups read fields straight from shared pages.
+Services that only need a few fields should use fields(), which never
+builds a whole record on the columnar path.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CUSTOMERS_PATH = os.getenv("CUSTOMERS_PATH", "customers.json")
+# how often the shared store checks customers.json for changes (0 = never)
+RELOAD_INTERVAL_SECONDS = float(os.getenv("CUSTOMERS_RELOAD_SECONDS", 5))
+
+
+# where each addressable field lives in a customer record
+FIELD_PATHS = {
+    "customer_id": ("customer_id",),
+    "full_name": ("full_name",),
+    "age": ("age",),
+    "city": ("city",),
+    "phone_number": ("kyc_details", "phone_number"),
+    "address": ("kyc_details", "address"),
+    "credit_score": ("financial_profile", "credit_score"),
+    "pre_approved_limit": ("financial_profile", "pre_approved_limit"),
+    "monthly_salary": ("financial_profile", "monthly_salary"),
+    "existing_loans": ("financial_profile", "existing_loans"),
+}
+
+
+def normalize_name(name: str) -> str:
+    """Case-fold and collapse whitespace so ' priya  SHARMA ' == 'Priya Sharma'."""
+    return " ".join(str(name).split()).casefold()
+
+
+def load_customers(path: str = DEFAULT_CUSTOMERS_PATH) -> list:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_snapshot(path: str = DEFAULT_CUSTOMERS_PATH, version=None):
+    """A snapshot of `path`: columnar (memory-mapped) for a .col file, else parsed JSON."""
+    from columnar_store import ColumnarSnapshot, is_columnar_file
+    if is_columnar_file(path):
+        return ColumnarSnapshot(path, version)
+    return CustomerSnapshot(load_customers(path), version)
+
+
+def file_version(path: str):
+    """Cheap change stamp for a data file: (mtime_ns, size), or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class CustomerSnapshot:
+    """One immutable version of the customer data plus its indexes."""
+
+    def __init__(self, customers: list, version=None):
+        self.customers = customers
+        self.version = version
+        # both indexes map a key to the record's row in self.customers
+        self._by_id = {}
+        self._by_name = {}
+        for row, c in enumerate(customers):
+            self._by_id[c["customer_id"]] = row
+            # first record wins on duplicate names, same as the old linear scan
+            self._by_name.setdefault(normalize_name(c["full_name"]), row)
+
+    def __len__(self):
+        return len(self.customers)
+
+    def row_of(self, key: str) -> int:
+        """Row of a customer by customer_id or full name, or -1 if unknown."""
+        row = self._by_id.get(key)
+        if row is None:
+            row = self._by_name.get(normalize_name(key), -1)
+        return row
+
+    def get_by_id(self, customer_id: str):
+        row = self._by_id.get(customer_id)
+        return None if row is None else self.customers[row]
+
+    def row_of_name(self, name: str) -> int:
+        """Row of a customer by full name only, or -1 if unknown."""
+        return self._by_name.get(normalize_name(name), -1)
+
+    def get_by_name(self, name: str):
+        row = self.row_of_name(name)
+        return None if row < 0 else self.customers[row]
+
+    def get(self, key: str):
+        """Look up a customer by customer_id first, then by full name."""
+        row = self.row_of(key)
+        return None if row < 0 else self.customers[row]
+
+    def fields(self, key: str, *names: str):
+        """Tuple of the named FIELD_PATHS values for one customer, or None if unknown."""
+        c = self.get(key)
+        if c is None:
+            return None
+        values = []
+        for name in names:
+            value = c
+            for part in FIELD_PATHS[name]:
+                value = value[part]
+            values.append(value)
+        return tuple(values)
+
+    def value(self, field: str, row: int):
+        """One FIELD_PATHS field of the customer at `row`."""
+        value = self.customers[row]
+        for part in FIELD_PATHS[field]:
+            value = value[part]
+        return value
+
+    def column(self, field: str) -> np.ndarray:
+        """A numeric field for every customer as a NumPy array (a copy; ColumnarSnapshot's is a view)."""
+        return np.asarray(self.field_values(field))
+
+    def field_values(self, field: str) -> list:
+        """One FIELD_PATHS field for every customer, in row order."""
+        path = FIELD_PATHS[field]
+        values = []
+        for c in self.customers:
+            for part in path:
+                c = c[part]
+            values.append(c)
+        return values
+
+    def diff(self, old) -> tuple:
+        """(added, removed, changed) customer counts going from `old` to this snapshot."""
+        ids = self._by_id
+        old_ids = old._by_id if isinstance(old, CustomerSnapshot) else {
+            c["customer_id"]: row for row, c in enumerate(old.customers)}
+        changed = sum(
+            1 for cid, row in ids.items()
+            if cid in old_ids and old.customers[old_ids[cid]] != self.customers[row]
+        )
+        added = sum(1 for cid in ids if cid not in old_ids)
+        removed = sum(1 for cid in old_ids if cid not in ids)
+        return added, removed, changed
+
+
+class CustomerStore:
+    """
+    In-memory customer repository with name and customer_id indexes.
+    Every lookup method reads the current snapshot once, so it always sees
+    one consistent version of the data; use snapshot() to pin a version
+    across several lookups.
+    """
+
+    def __init__(self, path: str = DEFAULT_CUSTOMERS_PATH, customers: list = None):
+        self.path = path
+        if customers is not None:
+            self._snapshot = CustomerSnapshot(customers)
+        else:
+            self._snapshot = load_snapshot(path, file_version(path))
+        self.last_reload = None
+        self._failed_version = None
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    # ----------------------------
+    # Lookups (delegate to the current snapshot)
+    # ----------------------------
+    def snapshot(self) -> CustomerSnapshot:
+        return self._snapshot
+
+    @property
+    def customers(self) -> list:
+        return self._snapshot.customers
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def row_of(self, key: str) -> int:
+        return self._snapshot.row_of(key)
+
+    def get_by_id(self, customer_id: str):
+        return self._snapshot.get_by_id(customer_id)
+
+    def get_by_name(self, name: str):
+        return self._snapshot.get_by_name(name)
+
+    def get(self, key: str):
+        """Look up a customer by customer_id first, then by full name."""
+        return self._snapshot.get(key)
+
+    def fields(self, key: str, *names: str):
+        """Just the named fields of one customer (see CustomerSnapshot.fields)."""
+        return self._snapshot.fields(key, *names)
+
+    # ----------------------------
+    # Hot reload
+    # ----------------------------
+    def add_reload_listener(self, fn):
+        """Call fn(old_snapshot, new_snapshot, stats) after every successful reload."""
+        self._listeners.append(fn)
+
+    def refresh(self, force: bool = False):
+        """
+        Reload customers.json if it changed on disk (or if `force`).
+        Returns the reload stats dict, or None if nothing was reloaded.
+        """
+        with self._reload_lock:
+            old = self._snapshot
+            version = file_version(self.path)
+            if version is None or (version in (old.version, self._failed_version) and not force):
+                return None
+
+            start = time.perf_counter()
+            try:
+                new = load_snapshot(self.path, version)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # e.g. the file is mid-write: keep serving the old snapshot and
+                # try again once the file changes
+                self._failed_version = version
+                print(f"[CustomerStore] Reload of {self.path} failed, keeping previous data: {e}")
+                return None
+            self._snapshot = new  # atomic swap
+            stats = self._reload_stats(old, new, time.perf_counter() - start)
+            self.last_reload = stats
+
+        print(f"[CustomerStore] Reloaded {self.path}: {stats['old_count']} → {stats['new_count']} records "
+              f"(+{stats['added']} / -{stats['removed']} / ~{stats['changed']}) in {stats['duration_ms']} ms")
+        for fn in list(self._listeners):
+            try:
+                fn(old, new, stats)
+            except Exception as e:
+                print(f"[CustomerStore] Reload listener failed: {e}")
+        return stats
+
+    @staticmethod
+    def _reload_stats(old, new, duration_s):
+        added, removed, changed = new.diff(old)
+        return {
+            "reloaded_at": time.time(),
+            "duration_ms": round(duration_s * 1000, 2),
+            "old_count": len(old),
+            "new_count": len(new),
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+        }
+
+    def start_watching(self, interval: float = RELOAD_INTERVAL_SECONDS):
+        """Poll customers.json in a daemon thread and reload it when it changes."""
+        if self._watcher is not None or interval <= 0:
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=watch, name="customer-store-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_customer_store(path: str = DEFAULT_CUSTOMERS_PATH) -> CustomerStore:
+    """Return the process-wide store, loading customers.json on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CustomerStore(path)
+                _store.start_watching()
+    return _store
@@ -0,0 +1,142 @@
+# file: eligibility.py
+"""
+Precomputed per-customer eligibility, so an underwriting decision (or "how
+much can I borrow?") is one lookup instead of re-deriving the thresholds
+from the raw record on every request.
+
+For each customer the index holds:
+- reject_reason     : set when the customer can't borrow at all (score < 700)
+- instant_ceiling   : largest amount approved without a salary slip (the
+                      pre-approved limit)
+- slip_ceiling      : largest amount considered with a salary slip (2× limit)
+- salary_max        : largest principal whose EMI (loan_math, default terms)
+                      stays within 50% of the salary on file
+
+    index = get_eligibility_index()
+    index.decide("Priya Sharma", 150000)   # {"decision": ..., "reason": ...}
+    index.max_borrowable("CUST1001")       # {"instant": ..., "with_salary_slip": ...}
+
+The index is tied to one customer_store snapshot. When the store hot-reloads
+customers.json, its reload listener builds the new snapshot's index (one
+vectorized pass over the salary column) and swaps it in; requests keep
+using the previous index until then, and never build one themselves.
+"""
+
+import threading
+import weakref
+from typing import NamedTuple
+
+import numpy as np
+
+from customer_store import get_customer_store
+from loan_math import SALARY_EMI_RATIO, max_principal
+
+MIN_CREDIT_SCORE = 700
+
+
+class Eligibility(NamedTuple):
+    customer_id: str
+    credit_score: float
+    pre_approved_limit: float
+    monthly_salary: float
+    reject_reason: str
+    instant_ceiling: float
+    slip_ceiling: float
+    salary_max: float
+
+    def decide(self, loan_amount: float) -> dict:
+        """Same outcome as tools.perform_underwriting_gradio, from the precomputed thresholds."""
+        if self.reject_reason:
+            return {"decision": "REJECT", "reason": self.reject_reason}
+        if loan_amount <= self.instant_ceiling:
+            return {"decision": "APPROVE", "reason": "Within pre-approved limit"}
+        if loan_amount <= self.slip_ceiling:
+            return {"decision": "PAYSALARY_REQUIRED", "reason": "Loan above pre-approved limit. Requires salary slip."}
+        return {"decision": "REJECT", "reason": "Loan exceeds 2× pre-approved limit"}
+
+    def max_borrowable(self) -> dict:
+        """Largest amount approved instantly, and with a salary slip (at the salary on file)."""
+        if self.reject_reason:
+            return {"instant": 0.0, "with_salary_slip": 0.0, "reason": self.reject_reason}
+        with_slip = max(self.instant_ceiling, min(self.slip_ceiling, self.salary_max))
+        return {"instant": self.instant_ceiling, "with_salary_slip": round(with_slip, 2), "reason": None}
+
+
+def evaluate(customer_id: str, credit_score: float, limit: float, salary: float,
+             salary_max: float = None) -> Eligibility:
+    """Work out one customer's thresholds from their score, pre-approved limit and salary."""
+    reject_reason = f"Low credit score: {credit_score}" if credit_score < MIN_CREDIT_SCORE else None
+    if salary_max is None:
+        salary_max = max_principal(SALARY_EMI_RATIO * salary)
+    # instant_ceiling, slip_ceiling, salary_max (positional: this runs on every lookup)
+    return Eligibility(customer_id, credit_score, limit, salary, reject_reason, limit, 2 * limit, salary_max)
+
+
+MISSING = {"decision": "REJECT", "reason": "Customer data missing"}
+
+
+class EligibilityIndex:
+    """
+    Eligibility for every customer of one snapshot, by snapshot row. The
+    only thing that needs computing, salary_max, is one float64 array worked
+    out for the whole salary column at once; the score, limit and salary are
+    read from the snapshot (mapped, not copied, on a .col file) and an
+    Eligibility is put together when a customer is looked up.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        salaries = snapshot.column("monthly_salary")
+        self.salary_max = np.asarray(max_principal(SALARY_EMI_RATIO * salaries), dtype=np.float64)
+        self._salary_max = memoryview(self.salary_max)  # indexing gives a plain float, faster than NumPy
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def at(self, row: int) -> Eligibility:
+        value = self.snapshot.value
+        return evaluate(value("customer_id", row), value("credit_score", row), value("pre_approved_limit", row),
+                        value("monthly_salary", row), self._salary_max[row])
+
+    def get(self, key: str):
+        """Eligibility by customer_id or full name, or None if unknown."""
+        row = self.snapshot.row_of(key)
+        return self.at(row) if row >= 0 else None
+
+    def decide(self, key: str, loan_amount: float) -> dict:
+        e = self.get(key)
+        return dict(MISSING) if e is None else e.decide(loan_amount)
+
+    def max_borrowable(self, key: str):
+        e = self.get(key)
+        return None if e is None else e.max_borrowable()
+
+
+# ----------------------------
+# Shared instance (follows the customer store)
+# ----------------------------
+_indexes = weakref.WeakKeyDictionary()  # store -> its current index
+_index_lock = threading.Lock()
+
+
+def get_eligibility_index(store=None) -> EligibilityIndex:
+    """The store's index: built on first use, then replaced by the reload listener."""
+    store = store if store is not None else get_customer_store()
+    index = _indexes.get(store)
+    if index is not None:
+        return index
+    with _index_lock:
+        index = _indexes.get(store)
+        if index is None:
+            store.add_reload_listener(lambda old, new, stats: _rebuild(store, new))
+            index = _indexes[store] = EligibilityIndex(store.snapshot())
+    return index
+
+
+def _rebuild(store, snapshot):
+    index = EligibilityIndex(snapshot)  # outside the lock: lookups go on against the old index
+    with _index_lock:
+        if store.snapshot() is not snapshot:
+            return  # reloaded again meanwhile; that reload's listener installs its own
+        _indexes[store] = index
+    print(f"[Eligibility] Rebuilt index for {len(index)} customers")
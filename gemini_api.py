@@ -1,21 +1,285 @@
 # file: gemini_api.py
+import asyncio
+import atexit
 import os
-import google.generativeai as genai
+import threading
+import weakref
+
+from llm_cache import LLMCache, DEFAULT_CACHE_PATH, cache_key
 
 # Load Gemini API Key from environment or fallback (for demo)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your api")
+DEFAULT_MODEL = "gemini-2.5-flash"
+# hard cap on one upstream request; the SDK's own retries are off (see request_options)
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 30.0))
+
+# ----------------------------
+# Shared model objects + response cache
+# ----------------------------
+# The Gemini SDK takes about a second to import, so it is imported and
+# configured on the first model request instead of at import time.
+_genai = None
+_models = {}
+_models_lock = threading.Lock()
 
-# Configure Gemini SDK
-genai.configure(api_key=GEMINI_API_KEY)
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
 
-def call_gemini(prompt: str) -> str:
+
+def get_llm_cache() -> LLMCache:
+    """
+    The process-wide response cache, opened on first use (importing this
+    module touches no files). Set LLM_CACHE_PATH="" to keep it in memory only.
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(
+                    path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+                )
+                atexit.register(_llm_cache.close)  # commit queued cache writes
+    return _llm_cache
+
+
+def _get_genai():
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
+
+def get_model(model_name: str = DEFAULT_MODEL):
+    """Return a GenerativeModel, built once per model name and reused."""
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = _models[model_name] = _get_genai().GenerativeModel(model_name)
+    return model
+
+
+def request_options(timeout: float = None) -> dict:
+    """
+    SDK options for one request: give up after `timeout` seconds and don't
+    retry. The SDK's default retry policy keeps a call to an unreachable
+    Gemini going for minutes, long after our callers have fallen back, and
+    holds the calling thread (and interpreter exit) for all of it.
+    """
+    return {"timeout": timeout or GEMINI_TIMEOUT_SECONDS, "retry": None}
+
+
+def generate_text(prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True,
+                  timeout: float = None) -> str:
+    """
+    Returns the model's reply to `prompt`, raising on any Gemini error
+    (including no reply within `timeout` seconds, GEMINI_TIMEOUT_SECONDS by
+    default). Responses are served from get_llm_cache() when the same prompt was
+    seen before; errors are never cached.
+    """
+    if use_cache:
+        cached = get_llm_cache().get(model_name, prompt)
+        if cached is not None:
+            return cached
+    response = get_model(model_name).generate_content(prompt, request_options=request_options(timeout))
+    text = response.text.strip()
+    if use_cache:
+        get_llm_cache().put(model_name, prompt, text)
+    return text
+
+
+def stream_text(prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True,
+                timeout: float = None):
+    """
+    Streaming generate_text: yields the reply in chunks as Gemini produces
+    them (a cached reply comes back as one chunk). The full reply is cached
+    once the stream completes; raises on any Gemini error.
+    """
+    if use_cache:
+        cached = get_llm_cache().get(model_name, prompt)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    for chunk in get_model(model_name).generate_content(prompt, stream=True,
+                                                        request_options=request_options(timeout)):
+        if chunk.text:
+            parts.append(chunk.text)
+            yield chunk.text
+    if use_cache:
+        get_llm_cache().put(model_name, prompt, "".join(parts).strip())
+
+
+def call_gemini(prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True) -> str:
     """
     Calls the Gemini API with a text prompt and returns the response.
     Keeps it simple for clarity and debugging.
     """
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return generate_text(prompt, model_name=model_name, use_cache=use_cache)
+    except Exception as e:
+        return f"[Gemini Error] {e}"
+
+
+# ----------------------------
+# Async client (for the Gradio app)
+# ----------------------------
+class AsyncGeminiClient:
+    """
+    asyncio version of call_gemini.
+    - At most `max_concurrency` requests are in flight to Gemini at once.
+    - Identical prompts that arrive while one is already in flight share that
+      single upstream call instead of making their own.
+    - Replies are cached in `cache`: an LLMCache, or a function returning
+      one (called when needed, so the cache is only opened on first use).
+    """
+
+    def __init__(self, max_concurrency: int = 8, cache=None):
+        self.max_concurrency = max_concurrency
+        self._cache = cache
+        # asyncio primitives belong to one event loop, so keep them per loop
+        self._loops = weakref.WeakKeyDictionary()
+        self.stats = {"requests": 0, "upstream_calls": 0, "coalesced": 0}
+
+    @property
+    def cache(self) -> LLMCache:
+        return self._cache() if callable(self._cache) else self._cache
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = (asyncio.Semaphore(self.max_concurrency), {}, {})
+            self._loops[loop] = state
+        return state
+
+    async def generate(self, prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True,
+                       coalesce: bool = True, timeout: float = None) -> str:
+        """Return the model's reply, raising on any Gemini error (like generate_text)."""
+        self.stats["requests"] += 1
+        if use_cache and self.cache is not None:
+            cached = await self.cache.get_async(model_name, prompt)
+            if cached is not None:
+                return cached
+
+        semaphore, in_flight, _ = self._loop_state()
+        if not coalesce:
+            # e.g. a hedged retry, which must be a genuinely separate request
+            return await self._fetch(semaphore, prompt, model_name, use_cache, timeout)
+
+        key = cache_key(model_name, prompt)
+        task = in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(semaphore, prompt, model_name, use_cache, timeout))
+            in_flight[key] = task
+            task.add_done_callback(lambda _t: in_flight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one waiter giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, semaphore, prompt, model_name, use_cache, timeout):
+        async with semaphore:
+            self.stats["upstream_calls"] += 1
+            response = await get_model(model_name).generate_content_async(
+                prompt, request_options=request_options(timeout))
+            text = response.text.strip()
+        if use_cache and self.cache is not None:
+            self.cache.put(model_name, prompt, text)
+        return text
+
+    async def stream(self, prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True,
+                     timeout: float = None):
+        """
+        Async generator over the reply's chunks (like stream_text). Identical
+        prompts streamed at the same time share one upstream stream: later
+        callers get the chunks seen so far, then follow along.
+        """
+        self.stats["requests"] += 1
+        if use_cache and self.cache is not None:
+            cached = await self.cache.get_async(model_name, prompt)
+            if cached is not None:
+                yield cached
+                return
+
+        semaphore, _, streams = self._loop_state()
+        key = cache_key(model_name, prompt)
+        shared = streams.get(key)
+        if shared is None:
+            shared = streams[key] = _SharedStream()
+            # a task of its own, so one reader going away doesn't stop the others
+            task = asyncio.ensure_future(self._pump(shared, semaphore, prompt, model_name, use_cache, timeout))
+            task.add_done_callback(lambda _t: streams.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        async for chunk in shared.follow():
+            yield chunk
+
+    async def _pump(self, shared, semaphore, prompt, model_name, use_cache, timeout):
+        try:
+            async with semaphore:
+                self.stats["upstream_calls"] += 1
+                response = await get_model(model_name).generate_content_async(
+                    prompt, stream=True, request_options=request_options(timeout))
+                async for chunk in response:
+                    if chunk.text:
+                        await shared.add(chunk.text)
+            if use_cache and self.cache is not None:
+                self.cache.put(model_name, prompt, "".join(shared.parts).strip())
+        except Exception as e:
+            shared.error = e
+        finally:
+            await shared.close()
+
+
+class _SharedStream:
+    """Chunks of one upstream stream, replayable by any number of readers."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+
+    async def add(self, text: str):
+        async with self._changed:
+            self.parts.append(text)
+            self._changed.notify_all()
+
+    async def close(self):
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def follow(self):
+        seen = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or len(self.parts) > seen)
+                new = self.parts[seen:]
+                finished = self.done
+            for text in new:
+                yield text
+            seen += len(new)
+            if finished and seen == len(self.parts):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+async_client = AsyncGeminiClient(
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)),
+    cache=get_llm_cache,
+)
+
+
+async def call_gemini_async(prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True) -> str:
+    """Awaitable call_gemini with bounded concurrency and in-flight coalescing."""
+    try:
+        return await async_client.generate(prompt, model_name=model_name, use_cache=use_cache)
     except Exception as e:
         return f"[Gemini Error] {e}"
@@ -1,202 +1,408 @@
 # gradio_app.py
-import gradio as gr
+"""
+Gradio chat front end. Importing this module is cheap: gradio itself is only
+imported by build_demo(), so chat_interface can be used (and load-tested)
+without starting a server. Run `python gradio_app.py` to launch the app.
+"""
+import asyncio
+import os
 import re
+import threading
+import time
 from tools import (
-    verify_kyc,
+    resolve_customer,
     verify_phone,
     perform_underwriting_gradio as perform_underwriting,
-    generate_sanction_letter,
+    submit_sanction_letter,
     process_uploaded_salary_slip,
-    perform_final_underwriting_with_salary
+    perform_final_underwriting_with_salary,
 )
-from gemini_api import call_gemini
-
-# --- State Management ---
-def create_initial_state():
-    return {
-        "step": "start",
-        "customer_name": "",
-        "loan_amount": 0.0,
-        "kyc_verified": False,
-        "underwriting_result": None,
-        "sanction_file": None,
-        "payslip_file": None,
-        "monthly_salary": None,
-    }
+from llm_guard import guarded_stream_async, template_explanation
+from llm_batcher import explainer
+from prefetch import prefetcher
+from session_store import get_session_store
+from chat_session import ChatSession, Step
+from loan_math import affordable_options
+from tracing import observe, span, start_metrics_server
+
+def _ui_update(**kwargs):
+    """Same payload as gr.update(**kwargs), without importing gradio."""
+    return {"__type__": "update", **kwargs}
+
+DONE_MESSAGE = "✅ Loan process complete. Refresh to start a new application."
+
+
+def _quote_table(salary, cap) -> str:
+    """Markdown grid of the largest affordable loan per tenure (loan_math.affordable_options)."""
+    options = affordable_options(salary, cap=cap)
+    if not options:
+        return ""
+    rows = "\n".join(f"| {o['tenure_months']} months | ₹{o['amount']:,.0f} | ₹{o['emi']:,.0f} |" for o in options)
+    return f"\n\n📊 Loans that fit a monthly salary of ₹{salary:,.0f}:\n| Tenure | Up to | EMI |\n|---|---|---|\n{rows}"
+
+
+def _load_session(session_id):
+    """The stored ChatSession for `session_id`, or None."""
+    record = get_session_store().load(session_id) if session_id else None
+    return ChatSession.from_record(record["state"], record["history"]) if record is not None else None
+
+
+def _resume(state) -> ChatSession:
+    """
+    The session for this turn. The session store is authoritative, so a turn
+    can land on any worker: the incoming state only has to carry the
+    session_id (a ChatSession, {"session_id": ...} or a bare id string).
+    """
+    if isinstance(state, ChatSession):
+        session_id = state.session_id
+    else:
+        session_id = state.get("session_id") if isinstance(state, dict) else state
+    session = _load_session(session_id)
+    if session is not None:
+        return session
+    if isinstance(state, ChatSession):
+        return state
+    if isinstance(state, dict) and state.get("step"):
+        return ChatSession.from_record(state)  # a full state dict from an older client
+    return ChatSession()
+
+
+def _save(session: ChatSession):
+    session.trim_history()
+    get_session_store().save(session.session_id, session.to_state(), session.history)
+
 
 # --- Main Chat Function ---
-def chat_interface(message, history, state, uploaded_file):
-    if state is None:
-        state = create_initial_state()
-    if history is None:
-        history = []
+async def chat_interface(message, state, uploaded_file):
+    """
+    One chat turn, as an async generator: it yields (history, session,
+    textbox, upload box, pdf) every time the bot's message grows, so the
+    fixed parts of a reply show up at once and LLM text streams in after
+    them. The session (chat_session.ChatSession, history included) is loaded
+    from and saved to the session store (session_store.py).
+    """
+    session = _resume(state)
+    session.trim_history()
+    # the turn's latency and the time until the user sees its first update
+    # go to the chat.<step> histograms. A span can't stay open across a yield
+    # (see tracing.py), so each stretch of work up to the next update is its
+    # own chat.<step>.update span, with the tool and LLM spans inside it.
+    step = session.step.value
+    start = time.perf_counter()
+    status = "ok"
+    first = True
+    updates = _chat_step(message, session, uploaded_file)
+    try:
+        while True:
+            with span(f"chat.{step}.update", session=session.session_id):
+                try:
+                    update = await updates.__anext__()
+                except StopAsyncIteration:
+                    break
+            if first:
+                observe(f"chat.{step}.first_update", time.perf_counter() - start)
+                first = False
+            yield update
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        observe(f"chat.{step}", time.perf_counter() - start, status)
+        # also when the client goes away mid-turn: the next turn starts from here
+        _save(session)
+        await updates.aclose()
 
-    if message:
-        history.append((message, None))
 
-    step = state.get("step")
+async def _browser_turn(message, session, uploaded_file):
+    """
+    chat_interface for the UI: the browser keeps only {"session_id"} and
+    doesn't send the chat history back; both stay in the store.
+    """
+    async for history, state, *outputs in chat_interface(message, session, uploaded_file):
+        yield (history, {"session_id": state.session_id}, *outputs)
+
+
+async def _browser_load(message, session, uploaded_file):
+    """Page load: show a conversation still in progress as it was; otherwise start a new one."""
+    session_id = session.get("session_id") if isinstance(session, dict) else None
+    state = _load_session(session_id)
+    if state is not None and state.step not in (Step.START, Step.DONE):
+        yield (state.history, {"session_id": state.session_id}, _ui_update(value=None),
+               _ui_update(visible=state.step is Step.UPLOAD_PAYSLIP), None)
+        return
+    async for update in _browser_turn(message, None, uploaded_file):
+        yield update
+
+
+async def _chat_step(message, state: ChatSession, uploaded_file):
+    history = state.history
+    step = state.step
+    if message and step is not Step.DONE:
+        history.append((message, None))
 
     # Step 1: Welcome
-    if step == "start":
+    if step is Step.START:
         bot_message = "Hello! I’m Riya from LoanMart. To begin, could you please tell me your full name?"
-        state["step"] = "get_name"
+        state.step = Step.GET_NAME
         history.append((None, bot_message))
-        return history, state, gr.update(value=None), gr.update(visible=False), None
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), None
 
     # Step 2: Get Name
-    elif step == "get_name":
+    elif step is Step.GET_NAME:
         clean_name = message.lower()
         for phrase in ["my name is", "i am", "it's"]:
             clean_name = clean_name.replace(phrase, "")
-        state["customer_name"] = clean_name.strip().title()
-        bot_message = f"Thanks, {state['customer_name']}! How much would you like to borrow?"
-        state["step"] = "get_amount"
+        state.customer_name = clean_name.strip().title()
+        # typos are fine: everything after this step looks the customer up by id.
+        # The matched record's name is only shown once the phone check passes,
+        # so a near-miss never reveals another customer's name.
+        match = resolve_customer(state.customer_name)
+        if match.get("status") == "success":
+            state.customer_id = match["customer_id"]
+        # KYC, credit score and offer load in the background while the customer types the amount
+        prefetcher.start(state.session_id, state.customer_key)
+        bot_message = f"Thanks, {state.customer_name}! How much would you like to borrow?"
+        state.step = Step.GET_AMOUNT
         history.append((None, bot_message))
-        return history, state, gr.update(value=None), gr.update(visible=False), None
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), None
 
     # Step 3: Get Loan Amount
-    elif step == "get_amount":
+    elif step is Step.GET_AMOUNT:
         try:
             amount_str = re.sub(r'[^\d.]', '', message)
-            state["loan_amount"] = float(amount_str)
-            prompt = (
-                f"User {state['customer_name']} wants a loan of ₹{state['loan_amount']}. "
-                "Respond as a friendly Sales Agent guiding them to the verification step. Make it brief."
-            )
-            llm_reply = call_gemini(prompt)
-            bot_message = (
-                f"{llm_reply}\n\n"
-                "To proceed, I need to verify your identity. "
-                "Please enter the **last 4 digits** of your registered mobile number."
-            )
-            state["step"] = "verify_phone_digits"
-            history.append((None, bot_message))
-        except:
+            state.loan_amount = float(amount_str)
+        except ValueError:
             bot_message = "Invalid amount. Please enter a numeric value (e.g., 50000)."
             history.append((None, bot_message))
-        return history, state, gr.update(value=None), gr.update(visible=False), None
+            yield history, state, _ui_update(value=None), _ui_update(visible=False), None
+            return
+
+        # the fixed lines (amount + verification instructions) go out now; the
+        # sales agent's sentence streams in between them
+        head = f"Thanks, {state.customer_name}! ₹{state.loan_amount:,.0f} noted.\n\n"
+        tail = (
+            "\n\nTo proceed, I need to verify your identity. "
+            "Please enter the **last 4 digits** of your registered mobile number."
+        )
+        state.step = Step.VERIFY_PHONE
+        history.append((None, head + "…" + tail))
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), None
+
+        # no name/amount in the prompt, so every customer shares one cached reply
+        prompt = (
+            "A customer has told us how much they want to borrow for a personal loan. "
+            "Respond as a friendly Sales Agent guiding them to the verification step. Make it brief."
+        )
+        llm_reply = ""
+        async for chunk in guarded_stream_async(prompt, fallback="Great, let's get your application moving!"):
+            llm_reply += chunk
+            history[-1] = (None, head + llm_reply.strip() + tail)
+            yield history, state, _ui_update(value=None), _ui_update(visible=False), None
 
     # Step 4: Verify Phone & Run Underwriting
-    elif step == "verify_phone_digits":
+    elif step is Step.VERIFY_PHONE:
         last4 = message.strip()
-        kyc_result = verify_kyc(state["customer_name"])
+        # normally prefetched at get_name, so this turn is pure computation
+        session_id = state.session_id
+        profile = await prefetcher.get_async(session_id, state.customer_key)
+        prefetcher.discard(session_id)
+        kyc_result = profile["kyc"]
         if kyc_result.get("status") != "success":
             bot_message = "❌ KYC not found."
-            state["step"] = "done"
+            state.step = Step.DONE
             history.append((None, bot_message))
-            return history, state, gr.update(value=None), gr.update(visible=False), None
+            yield history, state, _ui_update(value=None), _ui_update(visible=False), None
+            return
 
-        phone_result = verify_phone(state["customer_name"], last4)
+        phone_result = verify_phone(state.customer_key, last4, kyc_result=kyc_result)
         if phone_result.get("status") != "success":
             bot_message = f"❌ Phone verification failed: {phone_result.get('message','')}"
-            state["step"] = "done"
+            state.step = Step.DONE
             history.append((None, bot_message))
-            return history, state, gr.update(value=None), gr.update(visible=False), None
+            yield history, state, _ui_update(value=None), _ui_update(visible=False), None
+            return
 
-        history.append((None, "✅ KYC and Phone Verified! Running underwriting..."))
+        state.customer_name = kyc_result["kyc"]["full_name"]
+        history.append((None, f"✅ KYC and Phone Verified, {state.customer_name}! Running underwriting..."))
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), None
 
         # Run underwriting
-        underwriting_result = perform_underwriting(state["customer_name"], state["loan_amount"])
-        state["underwriting_result"] = underwriting_result
+        underwriting_result = perform_underwriting(state.customer_key, state.loan_amount, profile=profile,
+                                                   session_id=session_id)
+        offer = profile["offer"]
+        quotes = ""
+        if offer.get("status") == "success":
+            state.pre_approved_limit = offer["limit"]
+            quotes = _quote_table(offer["salary"], cap=2 * offer["limit"])
+        state.underwriting_result = underwriting_result
         decision = underwriting_result.get("decision", "REJECT").upper()
 
         if decision == "PAYSALARY_REQUIRED":
-            state["step"] = "upload_payslip"
-            bot_message = "💼 Loan above pre-approved limit. Please upload your salary slip to continue."
+            state.step = Step.UPLOAD_PAYSLIP
+            bot_message = "💼 Loan above pre-approved limit. Please upload your salary slip to continue." + quotes
             history.append((None, bot_message))
             # Show file upload box
-            return history, state, gr.update(value=None), gr.update(visible=True), None
+            yield history, state, _ui_update(value=None), _ui_update(visible=True), None
+            return
 
-        # Approved or rejected
-        prompt = f"Customer {state['customer_name']}'s loan for ₹{state['loan_amount']} was {decision} because: {underwriting_result.get('reason','')}. Provide a friendly one-sentence explanation."
-        llm_explanation = call_gemini(prompt)
-
-        pdf_file = None
+        # Approved or rejected: the decision banner goes out straight away and
+        # the sanction letter renders in the letter worker pool meanwhile; the
+        # LLM only gets a bounded slot for the friendly sentence after it
+        letter = None
         if decision in ["APPROVE", "APPROVED"]:
-            pdf_file = generate_sanction_letter(state["customer_name"], state["loan_amount"])
-            state["sanction_file"] = pdf_file
-            bot_message = f"🎉 Approved! {llm_explanation}\n📄 Sanction letter generated."
+            letter = submit_sanction_letter(state.customer_name, state.loan_amount,
+                                            underwriting_result.get("reason"))
+            state.sanction_file = letter.path
+            banner = "🎉 Approved!"
         else:
-            bot_message = f"❌ Loan not approved. {llm_explanation}"
+            banner = "❌ Loan not approved."
+        tip = ""
+        limits = underwriting_result.get("max_borrowable")
+        if limits:
+            tip = (f"\n💡 You can borrow up to ₹{limits['instant']:,.0f} instantly, "
+                   f"or up to ₹{limits['with_salary_slip']:,.0f} with a salary slip." + quotes)
+        state.step = Step.DONE
+        history.append((None, banner + tip))
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), None
 
-        state["step"] = "done"
-        history.append((None, bot_message))
-        return history, state, gr.update(value=None), gr.update(visible=False), pdf_file
+        # micro-batched with other sessions' explanations (llm_batcher), so it
+        # arrives as one sentence rather than a token stream
+        llm_explanation = await explainer.explain_async(decision, underwriting_result.get('reason', ''),
+                                                        fallback=template_explanation(underwriting_result))
+        bot_message = f"{banner} {llm_explanation}{tip}"
+        history[-1] = (None, bot_message)
+
+        pdf_file = None
+        if letter:
+            yield history, state, _ui_update(value=None), _ui_update(visible=False), None
+            with span("letter.wait"):
+                pdf_file = await asyncio.wrap_future(letter.future)
+            history[-1] = (None, f"{bot_message}\n📄 Sanction letter generated.")
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), pdf_file
 
     # Step 5: Upload Payslip for Final Underwriting
-    elif step == "upload_payslip":
+    elif step is Step.UPLOAD_PAYSLIP:
         if uploaded_file is None:
             bot_message = "💼 Please upload your salary slip to continue."
             history.append((None, bot_message))
-            return history, state, gr.update(value=None), gr.update(visible=True), None
+            yield history, state, _ui_update(value=None), _ui_update(visible=True), None
+            return
 
         # Process uploaded file
         payslip_result = process_uploaded_salary_slip(uploaded_file)
         if payslip_result["status"] != "success":
             bot_message = f"❌ Error uploading payslip: {payslip_result.get('message')}"
             history.append((None, bot_message))
-            return history, state, gr.update(value=None), gr.update(visible=True), None
+            yield history, state, _ui_update(value=None), _ui_update(visible=True), None
+            return
 
-        state["payslip_file"] = payslip_result["file_name"]
-        state["monthly_salary"] = payslip_result["salary_info"]["monthly_salary"]
+        state.payslip_file = payslip_result["file_name"]
+        state.monthly_salary = payslip_result["salary_info"]["monthly_salary"]
 
         # Final underwriting
-        loan_amount = state["loan_amount"]
-        salary = state["monthly_salary"]
-        final_result = perform_final_underwriting_with_salary(loan_amount, salary)
-        state["underwriting_result"] = {
+        loan_amount = state.loan_amount
+        salary = state.monthly_salary
+        final_result = perform_final_underwriting_with_salary(loan_amount, salary, name=state.customer_key,
+                                                              session_id=state.session_id)
+        state.underwriting_result = {
             "decision": final_result["loan_status"],
             "reason": final_result["reason"]
         }
 
         decision = final_result["loan_status"].upper()
         bot_message = f"💼 Underwriting Result: {decision} | {final_result['reason']}"
+        if decision not in ["APPROVED", "APPROVE"]:
+            limit = state.pre_approved_limit
+            bot_message += _quote_table(salary, cap=2 * limit if limit else None)
+        state.step = Step.DONE
+        history.append((None, bot_message))
         pdf_file = None
         if decision in ["APPROVED", "APPROVE"]:
-            pdf_file = generate_sanction_letter(state["customer_name"], state["loan_amount"])
-            state["sanction_file"] = pdf_file
-            bot_message += f"\n📄 Sanction letter generated."
+            letter = submit_sanction_letter(state.customer_name, state.loan_amount, final_result["reason"])
+            state.sanction_file = letter.path
+            # show the decision while the letter renders
+            yield history, state, _ui_update(value=None), _ui_update(visible=False), None
+            with span("letter.wait"):
+                pdf_file = await asyncio.wrap_future(letter.future)
+            history[-1] = (None, bot_message + "\n📄 Sanction letter generated.")
 
-        state["step"] = "done"
-        history.append((None, bot_message))
         # Hide upload box after processing
-        return history, state, gr.update(value=None), gr.update(visible=False), pdf_file
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), pdf_file
 
     # Done
-    elif step == "done":
-        bot_message = "✅ Loan process complete. Refresh to start a new application."
-        history.append((None, bot_message))
-        pdf_file = state.get("sanction_file")
-        return history, state, gr.update(value=None), gr.update(visible=False), pdf_file
+    elif step is Step.DONE:
+        # say it once: more messages after the decision don't grow the history
+        if not history or history[-1] != (None, DONE_MESSAGE):
+            history.append((None, DONE_MESSAGE))
+        pdf_file = state.sanction_file
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), pdf_file
 
-    return history, state, gr.update(value=None), gr.update(visible=False), None
+    else:
+        yield history, state, _ui_update(value=None), _ui_update(visible=False), None
 
 # --- Gradio UI ---
-with gr.Blocks(theme=gr.themes.Soft(), title="SmartLoan Agent") as demo:
-    state = gr.State()
-    gr.Markdown("## 🏦 SmartLoan Automation Chat Agent")
-    chatbot = gr.Chatbot(label="Conversation", height=500)
-    msg = gr.Textbox(label="Message", placeholder="Type your response...")
-    payslip_upload = gr.File(label="Upload Salary Slip", file_types=[".pdf", ".xlsx", ".csv"], visible=False)
-    pdf_download = gr.File(label="📄 Download Sanction Letter", interactive=False)
-
-    # Load initial chat
-    demo.load(
-        fn=chat_interface,
-        inputs=[msg, chatbot, state, payslip_upload],
-        outputs=[chatbot, state, msg, payslip_upload, pdf_download]
-    )
-
-    # Submit messages
-    msg.submit(
-        fn=chat_interface,
-        inputs=[msg, chatbot, state, payslip_upload],
-        outputs=[chatbot, state, msg, payslip_upload, pdf_download]
-    )
-    payslip_upload.upload(
-        fn=chat_interface,
-        inputs=[msg, chatbot, state, payslip_upload],
-        outputs=[chatbot, state, msg, payslip_upload, pdf_download]
-    )
-
-demo.launch()
+# chat_interface is an async generator, so one process can serve many chats at
+# once while they wait on Gemini (and stream replies as they arrive); raise the
+# per-event limit to match.
+CHAT_CONCURRENCY = int(os.getenv("GRADIO_CHAT_CONCURRENCY", 64))
+# Prometheus-style span metrics (tracing.py) on http://METRICS_HOST:METRICS_PORT/metrics;
+# METRICS_HOST=0.0.0.0 exposes them beyond this machine
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+
+def build_demo():
+    import gradio as gr
+
+    with gr.Blocks(theme=gr.themes.Soft(), title="SmartLoan Agent") as demo:
+        # the session_id lives in the browser, so any worker can serve the next turn
+        state = gr.BrowserState(None, storage_key="smartloan_session")
+        gr.Markdown("## 🏦 SmartLoan Automation Chat Agent")
+        chatbot = gr.Chatbot(label="Conversation", height=500)
+        msg = gr.Textbox(label="Message", placeholder="Type your response...")
+        payslip_upload = gr.File(label="Upload Salary Slip", file_types=[".pdf", ".xlsx", ".csv"], visible=False)
+        pdf_download = gr.File(label="📄 Download Sanction Letter", interactive=False)
+
+        # Load initial chat
+        demo.load(
+            fn=_browser_load,
+            inputs=[msg, state, payslip_upload],
+            outputs=[chatbot, state, msg, payslip_upload, pdf_download]
+        )
+
+        # Submit messages
+        msg.submit(
+            fn=_browser_turn,
+            inputs=[msg, state, payslip_upload],
+            outputs=[chatbot, state, msg, payslip_upload, pdf_download]
+        )
+        payslip_upload.upload(
+            fn=_browser_turn,
+            inputs=[msg, state, payslip_upload],
+            outputs=[chatbot, state, msg, payslip_upload, pdf_download]
+        )
+
+    demo.queue(default_concurrency_limit=CHAT_CONCURRENCY)
+    return demo
+
+
+def __getattr__(name):
+    # `gradio gradio_app.py` (reload mode) looks for a module-level `demo`
+    if name == "demo":
+        globals()["demo"] = demo = build_demo()
+        return demo
+    raise AttributeError(f"module 'gradio_app' has no attribute '{name}'")
+
+
+def main():
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT, METRICS_HOST)
+    # import the Gemini SDK in the background while the UI starts, so the first
+    # chat turn doesn't pay for it
+    from gemini_api import get_model
+    threading.Thread(target=get_model, name="gemini-warmup", daemon=True).start()
+    build_demo().launch()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# file: letter_service.py
+"""
+Sanction letter rendering off the request path.
+
+- The letter layout is built once per worker process as an uncompressed PDF
+  with fixed-width placeholder slots; each letter only overwrites those slots
+  with the customer-specific fields (same byte length, so the PDF's xref
+  offsets stay valid). Values that don't fit a slot fall back to a full
+  FPDF render of the same layout.
+- Letters are rendered in a process pool; `submit()` returns a LetterHandle
+  right away, with the final file path already known.
+- Paths are content-addressed (hash of the letter fields), so two customers
+  with the same name never overwrite each other and re-rendering an
+  identical letter is a no-op.
+- `render_many()` renders thousands of letters for batch approvals.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+
+LETTER_DIR = os.getenv("SANCTION_LETTER_DIR", "sanction_letters")
+
+DEFAULT_REASON = "Meets credit and income criteria"
+BODY_TEXT = "Your loan application has been approved based on your credit and income profile."
+
+# customer-specific fields and the width (in characters) of their slot
+FIELD_WIDTHS = {"date": 10, "customer": 60, "amount": 24, "reason": 80}
+
+
+# ----------------------------
+# Rendering (runs inside worker processes)
+# ----------------------------
+def _build_pdf(fields: dict, compress: bool = True) -> bytes:
+    """The letter layout, drawn with FPDF."""
+    from fpdf import FPDF  # imported in the worker, not at app start
+
+    pdf = FPDF()
+    pdf.set_compression(compress)
+    pdf.add_page()
+    pdf.set_font("helvetica", "B", 14)
+    pdf.cell(0, 10, "Loan Sanction Letter", new_x="LMARGIN", new_y="NEXT", align="C")
+    pdf.set_font("helvetica", size=12)
+    pdf.cell(0, 10, f"Date: {fields['date']}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 10, f"Customer: {fields['customer']}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 10, f"Approved Amount: INR{fields['amount']}", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("helvetica", size=10)
+    pdf.cell(0, 10, f"Reason: {fields['reason']}", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("helvetica", size=12)
+    pdf.multi_cell(0, 10, BODY_TEXT)
+    return bytes(pdf.output())
+
+
+def _placeholder(key: str) -> str:
+    return ("{" + key + "}").ljust(FIELD_WIDTHS[key], "#")
+
+
+def _pdf_literal(value: str) -> bytes:
+    """Encode a value the way it appears inside a PDF (...) string."""
+    escaped = value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("latin-1")
+
+
+class LetterTemplate:
+    """The pre-built letter: static bytes with one placeholder slot per field."""
+
+    def __init__(self):
+        self.pdf_bytes = _build_pdf({key: _placeholder(key) for key in FIELD_WIDTHS}, compress=False)
+        self.slots = {key: _pdf_literal(_placeholder(key)) for key in FIELD_WIDTHS}
+
+    def fill(self, fields: dict):
+        """Letter bytes with `fields` stamped in, or None if a value doesn't fit its slot."""
+        out = self.pdf_bytes
+        for key, slot in self.slots.items():
+            value = _pdf_literal(fields[key])
+            if len(value) > len(slot):
+                return None
+            out = out.replace(slot, value.ljust(len(slot)), 1)
+        return out
+
+
+_template = None
+
+
+def _get_template() -> LetterTemplate:
+    global _template
+    if _template is None:
+        _template = LetterTemplate()
+    return _template
+
+
+# the PDF uses core fonts (latin-1 only), so spell out the symbols our reasons use
+_TEXT_REPLACEMENTS = {"₹": "INR ", "≤": "<=", "≥": ">=", "×": "x"}
+
+
+def _latin1_text(value: str) -> str:
+    for symbol, text in _TEXT_REPLACEMENTS.items():
+        value = value.replace(symbol, text)
+    return value.encode("latin-1", "replace").decode("latin-1")
+
+
+def letter_fields(name: str, amount: float, reason: str = None, date: str = None) -> dict:
+    return {
+        "date": date or datetime.now().strftime("%Y-%m-%d"),
+        "customer": _latin1_text(name),
+        "amount": f"{amount:,.2f}",
+        "reason": _latin1_text(reason or DEFAULT_REASON),
+    }
+
+
+def letter_path(name: str, fields: dict, out_dir: str = LETTER_DIR) -> str:
+    """Collision-free path: readable name prefix + hash of the letter contents."""
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    safe_name = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "Customer"
+    return os.path.join(out_dir, f"Sanction_Letter_{safe_name}_{digest}.pdf")
+
+
+def render_letter(fields: dict, path: str) -> str:
+    """Render one letter to `path` (atomically); skips work if it already exists."""
+    if os.path.exists(path):
+        return path
+    data = _get_template().fill(fields)
+    if data is None:
+        try:
+            data = _build_pdf(fields)
+        except Exception as e:
+            # fpdf's exceptions don't always pickle; keep the worker pool alive
+            raise RuntimeError(f"Sanction letter rendering failed: {e}") from None
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _render_job(job):
+    fields, path = job
+    return render_letter(fields, path)
+
+
+def _init_worker():
+    # build the static layout once per worker, before the first letter arrives
+    _get_template()
+
+
+# ----------------------------
+# Service
+# ----------------------------
+class LetterHandle:
+    """Returned by LetterService.submit: the path is known now, the file shortly after."""
+
+    def __init__(self, path: str, future):
+        self.path = path
+        self.future = future
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: float = None) -> str:
+        return self.future.result(timeout)
+
+
+class LetterService:
+    """
+    Renders sanction letters in a process pool. With `inline=True` letters are
+    rendered in the calling thread instead (for code that already runs inside
+    a worker process and shouldn't start a nested pool).
+    """
+
+    def __init__(self, max_workers: int = None, out_dir: str = LETTER_DIR, inline: bool = False):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.out_dir = out_dir
+        self.inline = inline
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: never fork a process that is running an event loop and threads
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+        return self._pool
+
+    def submit(self, name: str, amount: float, reason: str = None) -> LetterHandle:
+        fields = letter_fields(name, amount, reason)
+        path = letter_path(name, fields, self.out_dir)
+        if self.inline:
+            future = Future()
+            try:
+                future.set_result(render_letter(fields, path))
+            except Exception as e:
+                future.set_exception(e)
+            return LetterHandle(path, future)
+        return LetterHandle(path, self._executor().submit(render_letter, fields, path))
+
+    def render_many(self, letters: list, chunksize: int = 64) -> list:
+        """
+        Bulk mode: `letters` is a list of (name, amount) or (name, amount, reason)
+        tuples. Returns the file paths in the same order.
+        """
+        jobs = []
+        for letter in letters:
+            name, amount = letter[0], letter[1]
+            fields = letter_fields(name, amount, letter[2] if len(letter) > 2 else None)
+            jobs.append((fields, letter_path(name, fields, self.out_dir)))
+        if self.inline:
+            return [_render_job(job) for job in jobs]
+        return list(self._executor().map(_render_job, jobs, chunksize=chunksize))
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+
+letter_service = LetterService(max_workers=int(os.getenv("LETTER_WORKERS", 0)) or None)
@@ -0,0 +1,284 @@
+# file: llm_batcher.py
+"""
+Micro-batching for the one-sentence decision explanations.
+
+Every approval or rejection used to make its own Gemini round trip. Here,
+explanation requests that arrive within `max_wait` seconds of each other (or
+that a batch job submits together) are sent as one numbered multi-item
+prompt; the model answers with a JSON array and each caller gets its own
+sentence back:
+
+    text = explainer.explain("REJECT", "Credit score below 700", fallback=...)
+    text = await explainer.explain_async(decision, reason, fallback=...)
+    texts = explainer.explain_many([(decision, reason), ...])   # batch jobs
+
+- A batch is sent as soon as it has `max_batch` items or its first item has
+  waited `max_wait` seconds; up to `max_in_flight` batches run at once.
+- Answers are cached per item under the single-item prompt, so cached
+  outcomes never wait for a batch and batched answers serve later single
+  calls (and vice versa).
+- Identical requests waiting for the same batch share one slot.
+- Upstream calls go through llm_guard.guarded_call (deadline, hedging,
+  circuit breaker). A multi-item batch gets `deadline` plus `item_deadline`
+  per extra item, and its own latency window and breaker: a slow 16-item
+  reply says nothing about single-sentence latency. A failed call, an
+  unparsable reply or a missing item gives that caller `fallback`.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from gemini_api import get_llm_cache, DEFAULT_MODEL
+from llm_guard import guarded_call, CircuitBreaker, LatencyTracker, DEFAULT_DEADLINE_SECONDS
+from tracing import span
+
+BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX", 16))
+BATCH_MAX_WAIT_SECONDS = float(os.getenv("LLM_BATCH_WAIT_MS", 20)) / 1000
+BATCH_IN_FLIGHT = int(os.getenv("LLM_BATCH_IN_FLIGHT", 4))
+# extra deadline per item after the first: a batch reply is N sentences long
+BATCH_ITEM_DEADLINE_SECONDS = float(os.getenv("LLM_BATCH_ITEM_DEADLINE_MS", 250)) / 1000
+
+
+# ----------------------------
+# Prompts
+# ----------------------------
+def build_explanation_prompt(decision: str, reason: str) -> str:
+    """
+    Prompt for the one-sentence decision explanation. It carries only the
+    decision and reason (no name or amount), so identical outcomes share one
+    cached LLM response.
+    """
+    return (
+        f"A personal loan application was {decision} because: {reason}. "
+        "Provide a friendly one-sentence explanation addressed to the customer."
+    )
+
+
+def build_batch_prompt(items: list) -> str:
+    """One prompt for several (decision, reason) pairs; the reply must be a JSON array."""
+    lines = [
+        f"Below are {len(items)} numbered personal loan decisions with their reasons. "
+        "For each one, write a friendly one-sentence explanation addressed to the customer.",
+        f"Reply with only a JSON array of exactly {len(items)} strings, in the same order, and nothing else.",
+        "",
+    ]
+    for i, (decision, reason) in enumerate(items, 1):
+        lines.append(f"{i}. {decision} because: {reason}")
+    return "\n".join(lines)
+
+
+def parse_batch_reply(text: str, n: int) -> list:
+    """
+    Split a batch reply into n sentences (None where an item is missing).
+    Tolerates a ```json fence or chatter around the array.
+    """
+    answers = [None] * n
+    start, end = (text or "").find("["), (text or "").rfind("]")
+    if start < 0 or end <= start:
+        return answers
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return answers
+    if not isinstance(items, list):
+        return answers
+    for i, item in enumerate(items[:n]):
+        if isinstance(item, dict):
+            item = item.get("text")
+        if isinstance(item, str) and item.strip():
+            answers[i] = item.strip()
+    return answers
+
+
+# ----------------------------
+# Batcher
+# ----------------------------
+class _Pending:
+    __slots__ = ("decision", "reason", "prompt", "future")
+
+    def __init__(self, decision, reason, prompt):
+        self.decision = decision
+        self.reason = reason
+        self.prompt = prompt
+        self.future = Future()
+
+
+class ExplanationBatcher:
+    """Gathers explanation requests into multi-item LLM calls (see module docstring)."""
+
+    def __init__(self, max_batch: int = BATCH_MAX_ITEMS, max_wait: float = BATCH_MAX_WAIT_SECONDS,
+                 max_in_flight: int = BATCH_IN_FLIGHT, deadline: float = None,
+                 item_deadline: float = BATCH_ITEM_DEADLINE_SECONDS, model_name: str = DEFAULT_MODEL):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.max_in_flight = max(1, max_in_flight)
+        self.deadline = DEFAULT_DEADLINE_SECONDS if deadline is None else deadline
+        self.item_deadline = item_deadline
+        self.model_name = model_name
+        # multi-item calls get their own guard (see module docstring)
+        self.latency = LatencyTracker(default_delay=self._deadline(self.max_batch) / 2)
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30.0)),
+        )
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "upstream_calls": 0,
+                      "batched_items": 0, "answered": 0, "missing": 0}
+
+        self._queue = []
+        self._waiting = {}  # prompt -> _Pending, for requests not yet sent
+        self._first_at = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+        # a new batch is only cut once a slot is free, so a backlog builds bigger batches
+        self._slots = threading.Semaphore(self.max_in_flight)
+
+    # ----------------------------
+    # Submitting
+    # ----------------------------
+    def submit(self, decision: str, reason: str) -> Future:
+        """Queue one explanation; the Future resolves to the sentence, or None if the LLM gave none."""
+        self.stats["requests"] += 1
+        prompt = build_explanation_prompt(decision, reason)
+        cached = get_llm_cache().get(self.model_name, prompt)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            future = Future()
+            future.set_result(cached)
+            return future
+        return self._enqueue(decision, reason, prompt)
+
+    def _enqueue(self, decision: str, reason: str, prompt: str) -> Future:
+        with self._cond:
+            pending = self._waiting.get(prompt)
+            if pending is not None:
+                self.stats["coalesced"] += 1
+                return pending.future
+            pending = self._waiting[prompt] = _Pending(decision, reason, prompt)
+            if not self._queue:
+                self._first_at = time.monotonic()
+            self._queue.append(pending)
+            self._cond.notify()
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="llm-batch")
+                self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+                self._thread.start()
+        return pending.future
+
+    def _deadline(self, size: int) -> float:
+        return self.deadline + (size - 1) * self.item_deadline
+
+    def _timeout(self) -> float:
+        # window + a full guarded call of the largest batch + a little slack for the hand-offs
+        return self.max_wait + self._deadline(self.max_batch) + 0.25
+
+    def explain(self, decision: str, reason: str, fallback: str) -> str:
+        """Blocking: the batched LLM sentence, or `fallback`."""
+        try:
+            text = self.submit(decision, reason).result(timeout=self._timeout())
+        except FutureTimeout:
+            text = None
+        return text or fallback
+
+    async def explain_async(self, decision: str, reason: str, fallback: str) -> str:
+        """asyncio version of explain(); the event loop is never blocked."""
+        self.stats["requests"] += 1
+        prompt = build_explanation_prompt(decision, reason)
+        cached = await get_llm_cache().get_async(self.model_name, prompt)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+        future = asyncio.wrap_future(self._enqueue(decision, reason, prompt))
+        try:
+            # shield: one waiter timing out must not cancel the shared future
+            text = await asyncio.wait_for(asyncio.shield(future), self._timeout())
+        except asyncio.TimeoutError:
+            text = None
+        return text or fallback
+
+    def explain_many(self, items: list, fallbacks: list = None) -> list:
+        """
+        Explanations for a list of (decision, reason) pairs, e.g. from a batch
+        job: everything is queued at once, so full batches go out immediately.
+        Missing answers are `fallbacks[i]` (or None).
+        """
+        futures = [self.submit(decision, reason) for decision, reason in items]
+        # the batches go out max_in_flight at a time, so the budget grows with the queue
+        rounds = 1 + len(items) // (self.max_batch * self.max_in_flight)
+        end = time.monotonic() + rounds * self._timeout()
+        out = []
+        for i, future in enumerate(futures):
+            try:
+                text = future.result(timeout=max(0.0, end - time.monotonic()))
+            except FutureTimeout:
+                text = None
+            out.append(text or (fallbacks[i] if fallbacks else None))
+        return out
+
+    # ----------------------------
+    # Dispatching
+    # ----------------------------
+    def _run(self):
+        while True:
+            self._slots.acquire()
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                while len(self._queue) < self.max_batch:
+                    remaining = self._first_at + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+                for pending in batch:
+                    del self._waiting[pending.prompt]
+                if self._queue:
+                    self._first_at = time.monotonic()
+            self._pool.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: list):
+        try:
+            with span("llm.batch", size=len(batch)):
+                answers = self._call(batch)
+        except Exception as e:
+            print(f"[LLM Batch] Batch of {len(batch)} failed: {e}")
+            answers = [None] * len(batch)
+        finally:
+            self._slots.release()
+        for pending, text in zip(batch, answers):
+            if text is None:
+                self.stats["missing"] += 1
+            else:
+                self.stats["answered"] += 1
+            pending.future.set_result(text)
+
+    def _call(self, batch: list) -> list:
+        self.stats["upstream_calls"] += 1
+        self.stats["batched_items"] += len(batch)
+        if len(batch) == 1:
+            # a lone request keeps the plain single-item prompt (and its cache entry)
+            return [guarded_call(batch[0].prompt, fallback="", deadline=self.deadline,
+                                 model_name=self.model_name) or None]
+
+        reply = guarded_call(build_batch_prompt([(p.decision, p.reason) for p in batch]),
+                             fallback="", deadline=self._deadline(len(batch)), model_name=self.model_name,
+                             tracker=self.latency, circuit=self.breaker)
+        answers = parse_batch_reply(reply, len(batch))
+        for pending, text in zip(batch, answers):
+            if text is not None:
+                get_llm_cache().put(self.model_name, pending.prompt, text)
+        return answers
+
+    def summary(self) -> dict:
+        """stats plus items per upstream call (the round trips saved by batching)."""
+        calls = self.stats["upstream_calls"]
+        return {**self.stats,
+                "items_per_call": round(self.stats["batched_items"] / calls, 2) if calls else 0.0}
+
+
+explainer = ExplanationBatcher()
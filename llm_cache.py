@@ -0,0 +1,251 @@
+# file: llm_cache.py
+"""
+Two-tier cache for LLM responses.
+
+- Tier 1: in-memory LRU (OrderedDict), per process.
+- Tier 2: SQLite file shared by every process on the machine.
+
+Entries are keyed on model name + normalized prompt, expire after a TTL and
+are evicted least-recently-used once a tier is full.
+
+Only lookups touch SQLite in the caller's thread (a disk hit is copied into
+the memory tier). Every write (new entries, last-used times, expiry) goes
+through a background writer thread that commits in batches, so put() never
+waits for the disk. Code on an event loop uses get_async(), which runs the
+disk lookup in a worker thread.
+"""
+
+import asyncio
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = "llm_cache.sqlite"
+WRITE_BATCH = 512
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so re-indented or re-wrapped prompts share a key."""
+    return " ".join(prompt.split())
+
+
+def cache_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU in front of an on-disk SQLite table, with TTL and size limits."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_memory_entries: int = 1024,
+                 max_disk_entries: int = 50000, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()  # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+
+        self._conn = None  # lookups only, under _read_lock; the writer thread has its own connection
+        self._read_lock = threading.Lock()
+        self._writes = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT,"
+                " expires_at REAL, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache(last_used)")
+            self._conn.commit()
+            self._disk_count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            self._writes = queue.Queue()
+            self._writer = threading.Thread(target=self._run_writer, name="llm-cache-writer", daemon=True)
+            self._writer.start()
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def get(self, model: str, prompt: str):
+        """Return the cached response, or None on a miss."""
+        key = cache_key(model, prompt)
+        text = self._get_memory(key)
+        if text is None:
+            text = self._get_disk(key)
+        return text
+
+    async def get_async(self, model: str, prompt: str):
+        """get() for code on an event loop: a memory miss is looked up on disk in a worker thread."""
+        key = cache_key(model, prompt)
+        text = self._get_memory(key)
+        if text is not None:
+            return text
+        if self._conn is None:
+            return self._get_disk(key)  # only counts the miss
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def put(self, model: str, prompt: str, text: str):
+        key = cache_key(model, prompt)
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, text)
+            self._stats["writes"] += 1
+        self._queue_write(("put", key, model, text, expires_at, now))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every write queued so far is committed; False on timeout."""
+        if self._writes is None:
+            return True
+        done = threading.Event()
+        self._writes.put(done)
+        return done.wait(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            return {
+                **self._stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_count if self._conn is not None else 0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._writes is not None:
+            self._writes.put(("clear",))
+            self.flush()
+
+    def close(self):
+        if self._writes is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writes = None
+        with self._read_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    def _get_memory(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[1]
+            del self._memory[key]
+            self._stats["expired"] += 1
+            return None
+
+    def _get_disk(self, key):
+        """Disk lookup after a memory miss; a hit is remembered and its last_used refreshed by the writer."""
+        now = time.time()
+        row = None
+        with self._read_lock:
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+        with self._lock:
+            if row is not None:
+                text, expires_at = row
+                if expires_at > now:
+                    self._remember(key, expires_at, text)
+                    self._stats["disk_hits"] += 1
+                    self._queue_write(("touch", key, now))
+                    return text
+                self._queue_write(("delete", key))
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def _queue_write(self, op):
+        writes = self._writes
+        if writes is not None:
+            writes.put(op)
+
+    def _remember(self, key, expires_at, text):
+        """Call with self._lock held."""
+        self._memory[key] = (expires_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _run_writer(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        stop = False
+        while not stop:
+            batch = [self._writes.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            waiters = []
+            try:
+                for op in batch:
+                    if op is None:
+                        stop = True
+                    elif isinstance(op, threading.Event):
+                        waiters.append(op)
+                    else:
+                        self._apply(conn, op)
+                conn.commit()
+                # evict in chunks (10% headroom) so we don't run a DELETE on every put
+                if self._disk_count > self.max_disk_entries * 1.1:
+                    self._evict_disk(conn)
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"[LLMCache] Dropped {len(batch)} cache writes: {e}")  # only a cache
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+    def _apply(self, conn, op):
+        kind = op[0]
+        if kind == "put":
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, expires_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                op[1:],
+            )
+            # upper bound (a replace also counts); _evict_disk recounts exactly
+            self._disk_count += 1
+        elif kind == "touch":
+            conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (op[2], op[1]))
+        elif kind == "delete":
+            self._disk_count -= conn.execute("DELETE FROM llm_cache WHERE key = ?", (op[1],)).rowcount
+        elif kind == "clear":
+            conn.execute("DELETE FROM llm_cache")
+            self._disk_count = 0
+
+    def _evict_disk(self, conn):
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        self._disk_count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = self._disk_count - self.max_disk_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN"
+                " (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            self._disk_count -= overflow
+            with self._lock:
+                self._stats["evictions"] += overflow
+        conn.commit()
@@ -0,0 +1,364 @@
+# file: llm_guard.py
+"""
+Latency budget for LLM calls.
+
+Every guarded call has a deadline. If Gemini has not answered by then (or is
+failing), the caller gets a deterministic fallback text straight away:
+- a hedged second request is sent once the first one is slower than the
+  recent p95 latency,
+- a circuit breaker skips Gemini entirely after repeated failures and probes
+  it again after a cool-down.
+guarded_stream_async() is the streaming version for the chat UI.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+from gemini_api import generate_text, async_client, get_llm_cache, DEFAULT_MODEL
+from tracing import observe, traced
+
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", 3.0))
+HEDGE_PERCENTILE = 95
+
+
+# ----------------------------
+# Templated fallbacks
+# ----------------------------
+def template_explanation(result: dict) -> str:
+    """Deterministic one-sentence explanation built from an underwriting result."""
+    decision = str((result or {}).get("decision", "")).upper()
+    reason = (result or {}).get("reason") or "see the details above"
+    if decision in ("APPROVE", "APPROVED"):
+        return f"Good news: your loan has been approved ({reason})."
+    if decision == "PAYSALARY_REQUIRED":
+        return f"We just need your salary slip to finish reviewing your application ({reason})."
+    return f"We're sorry, we couldn't approve your loan this time ({reason})."
+
+
+# ----------------------------
+# Latency tracking + circuit breaker
+# ----------------------------
+class LatencyTracker:
+    """Sliding window of recent upstream latencies, used to pick the hedge delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 10, default_delay: float = 1.0):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def hedge_delay(self, deadline: float) -> float:
+        delay = self.percentile(HEDGE_PERCENTILE)
+        if delay is None:
+            delay = self.default_delay
+        return max(0.05, min(delay, deadline))
+
+
+class CircuitBreaker:
+    """
+    closed    → calls go through; `failure_threshold` failures in a row open it.
+    open      → calls are skipped for `reset_timeout` seconds.
+    half-open → one probe call is let through; success closes, failure re-opens.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+latency = LatencyTracker()
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", 5)),
+    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30.0)),
+)
+stats = {"calls": 0, "llm_answers": 0, "fallbacks": 0, "truncated": 0, "hedges": 0, "short_circuited": 0}
+
+
+class _DaemonPool:
+    """
+    The submit() half of a ThreadPoolExecutor, on daemon threads. A call the
+    guard has given up on still holds its worker until Gemini answers or the
+    request times out; ThreadPoolExecutor joins its workers at interpreter
+    exit, so one doomed call would hold up the exit of agent.py, replay.py
+    or batch_underwriting.py. Daemon workers are simply dropped at exit.
+    """
+
+    def __init__(self, max_workers: int, name: str):
+        self.max_workers = max_workers
+        self.name = name
+        self._work = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        self._work.put((future, fn, args))
+        if not self._idle.acquire(blocking=False):
+            with self._lock:
+                if len(self._threads) < self.max_workers:
+                    t = threading.Thread(target=self._worker, daemon=True,
+                                         name=f"{self.name}_{len(self._threads)}")
+                    self._threads.append(t)
+                    t.start()
+        return future
+
+    def _worker(self):
+        while True:
+            future, fn, args = self._work.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            self._idle.release()
+
+
+# worker threads for the sync path; a late reply keeps its thread until Gemini
+# returns or the request times out (the deadline it was sent with)
+_executor = _DaemonPool(max_workers=int(os.getenv("LLM_GUARD_WORKERS", 16)), name="llm-guard")
+
+
+# ----------------------------
+# Guarded calls
+# ----------------------------
+# Cache hits are served before any of this, so the latency window only sees
+# real upstream round trips.
+def _timed_generate(prompt: str, model_name: str, deadline: float, tracker: LatencyTracker) -> str:
+    start = time.perf_counter()
+    text = generate_text(prompt, model_name=model_name, use_cache=False, timeout=deadline)
+    tracker.record(time.perf_counter() - start)
+    get_llm_cache().put(model_name, prompt, text)
+    return text
+
+
+@traced("llm.guarded_call")
+def guarded_call(prompt: str, fallback: str, deadline: float = None, model_name: str = DEFAULT_MODEL,
+                 tracker: LatencyTracker = None, circuit: CircuitBreaker = None) -> str:
+    """
+    Sync LLM call that returns within `deadline` seconds: the model's reply if
+    it arrives in time, otherwise `fallback`. Callers whose requests are much
+    slower than a single sentence (llm_batcher's multi-item prompts) pass
+    their own `tracker` and `circuit`, so they neither skew the shared hedge
+    delay nor trip the shared breaker.
+    """
+    deadline = DEFAULT_DEADLINE_SECONDS if deadline is None else deadline
+    tracker = latency if tracker is None else tracker
+    circuit = breaker if circuit is None else circuit
+    stats["calls"] += 1
+    cached = get_llm_cache().get(model_name, prompt)
+    if cached is not None:
+        return cached
+    if not circuit.allow():
+        stats["short_circuited"] += 1
+        return fallback
+
+    start = time.monotonic()
+    pending = {_executor.submit(_timed_generate, prompt, model_name, deadline, tracker)}
+    hedge_at = start + tracker.hedge_delay(deadline)
+    hedged = False
+
+    while pending:
+        now = time.monotonic()
+        remaining = start + deadline - now
+        if remaining <= 0:
+            break
+        timeout = min(remaining, hedge_at - now) if not hedged else remaining
+        done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None:
+                circuit.record_success()
+                stats["llm_answers"] += 1
+                return f.result()
+        if not hedged and time.monotonic() >= hedge_at and time.monotonic() < start + deadline:
+            # the first request is slower than usual: race a second one
+            hedged = True
+            stats["hedges"] += 1
+            pending.add(_executor.submit(_timed_generate, prompt, model_name, deadline, tracker))
+
+    circuit.record_failure()
+    stats["fallbacks"] += 1
+    return fallback
+
+
+async def _timed_generate_async(prompt: str, model_name: str, coalesce: bool, deadline: float) -> str:
+    start = time.perf_counter()
+    try:
+        text = await async_client.generate(prompt, model_name=model_name, use_cache=False, coalesce=coalesce,
+                                           timeout=deadline)
+    except asyncio.CancelledError:
+        # abandoned at the deadline: still count how long we waited, so slow
+        # periods push the hedge delay up instead of vanishing from the window
+        latency.record(time.perf_counter() - start)
+        raise
+    latency.record(time.perf_counter() - start)
+    get_llm_cache().put(model_name, prompt, text)
+    return text
+
+
+@traced("llm.guarded_call")
+async def guarded_call_async(prompt: str, fallback: str, deadline: float = None,
+                             model_name: str = DEFAULT_MODEL) -> str:
+    """asyncio version of guarded_call, on top of gemini_api.async_client."""
+    deadline = DEFAULT_DEADLINE_SECONDS if deadline is None else deadline
+    stats["calls"] += 1
+    cached = await get_llm_cache().get_async(model_name, prompt)
+    if cached is not None:
+        return cached
+    if not breaker.allow():
+        stats["short_circuited"] += 1
+        return fallback
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    pending = {asyncio.ensure_future(_timed_generate_async(prompt, model_name, True, deadline))}
+    hedge_at = start + latency.hedge_delay(deadline)
+    hedged = False
+
+    try:
+        while pending:
+            now = loop.time()
+            remaining = start + deadline - now
+            if remaining <= 0:
+                break
+            timeout = min(remaining, hedge_at - now) if not hedged else remaining
+            done, pending = await asyncio.wait(pending, timeout=max(timeout, 0),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    breaker.record_success()
+                    stats["llm_answers"] += 1
+                    return t.result()
+            if not hedged and hedge_at <= loop.time() < start + deadline:
+                hedged = True
+                stats["hedges"] += 1
+                pending.add(asyncio.ensure_future(_timed_generate_async(prompt, model_name, False, deadline)))
+    finally:
+        for t in pending:
+            t.cancel()
+
+    breaker.record_failure()
+    stats["fallbacks"] += 1
+    return fallback
+
+
+async def guarded_stream_async(prompt: str, fallback: str, deadline: float = None,
+                               model_name: str = DEFAULT_MODEL):
+    """
+    Streaming guarded_call_async: yields the reply in chunks as they arrive.
+    If nothing has arrived by the deadline (or Gemini fails first, or the
+    breaker is open) it yields `fallback` instead. A stream that stops
+    part-way (deadline or error) ends with an ellipsis, so the user never
+    sees a sentence just stop; it isn't cached, and since Gemini did answer
+    it doesn't count against the breaker. No hedging: a second stream can't
+    replace text the user has already seen.
+
+    Time to first chunk and total stream time are recorded as the
+    "llm.first_token" and "llm.stream" latency histograms.
+    """
+    deadline = DEFAULT_DEADLINE_SECONDS if deadline is None else deadline
+    stats["calls"] += 1
+    cached = await get_llm_cache().get_async(model_name, prompt)
+    if cached is not None:
+        yield cached
+        return
+    if not breaker.allow():
+        stats["short_circuited"] += 1
+        yield fallback
+        return
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    stream = async_client.stream(prompt, model_name=model_name, use_cache=False, timeout=deadline)
+    parts = []
+    outcome = "ok"
+    try:
+        while True:
+            remaining = start + deadline - loop.time()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                break
+            except Exception:
+                outcome = "error"
+                break
+            if not parts:
+                observe("llm.first_token", loop.time() - start)
+            parts.append(chunk)
+            yield chunk
+    finally:
+        await stream.aclose()
+
+    elapsed = loop.time() - start
+    observe("llm.stream", elapsed, outcome)
+    if outcome != "ok" and not parts:
+        breaker.record_failure()
+        stats["fallbacks"] += 1
+        yield fallback
+        return
+    breaker.record_success()
+    text = "".join(parts).strip()
+    if outcome != "ok":
+        stats["truncated"] += 1
+        if not text.endswith((".", "!", "?", "…")):
+            yield "…"
+        return
+    stats["llm_answers"] += 1
+    latency.record(elapsed)
+    get_llm_cache().put(model_name, prompt, text)
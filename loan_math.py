@@ -0,0 +1,124 @@
+# file: loan_math.py
+"""
+Loan arithmetic shared by underwriting, batch runs and the chat.
+
+Every function takes scalars or NumPy arrays for amounts, annual rates and
+tenures and broadcasts them against each other, so a whole batch (or a grid
+of tenures) is one call:
+
+    emi(150000)                                   # one EMI at the default terms
+    emi(amounts, tenure_months=[[12], [24], [36]])  # 3 × len(amounts) EMIs
+    amortization(amounts, 0.14, 24)               # full schedules, one row per loan
+    affordable_options(salary=60000, cap=300000)  # largest loan per tenure
+
+EMIs are reducing-balance: EMI = P·r·(1+r)^n / ((1+r)^n − 1), with r the
+monthly rate and n the tenure in months. The default terms are the ones
+underwriting quotes: LOAN_ANNUAL_RATE (14%) over LOAN_TENURE_MONTHS (24).
+"""
+
+import os
+
+import numpy as np
+
+ANNUAL_RATE = float(os.getenv("LOAN_ANNUAL_RATE", 0.14))
+TENURE_MONTHS = int(os.getenv("LOAN_TENURE_MONTHS", 24))
+QUOTE_TENURES = (12, 24, 36, 48, 60)
+SALARY_EMI_RATIO = 0.5  # EMI may take at most half the monthly salary
+
+
+def _scalar_or_array(result, *inputs):
+    """Plain float when every input was a scalar, so scalar callers get scalars back."""
+    if all(np.ndim(x) == 0 for x in inputs):
+        return float(result)
+    return result
+
+
+def _annuity_factor(annual_rate, tenure_months):
+    """EMI per unit of principal."""
+    r = np.asarray(annual_rate, dtype=np.float64) / 12
+    n = np.asarray(tenure_months, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + r) ** n
+        factor = r * growth / (growth - 1)
+    return np.where(r == 0, 1 / n, factor)
+
+
+def emi(principal, annual_rate=ANNUAL_RATE, tenure_months=TENURE_MONTHS):
+    """Monthly instalment for each principal / rate / tenure (broadcast)."""
+    p = np.asarray(principal, dtype=np.float64)
+    return _scalar_or_array(p * _annuity_factor(annual_rate, tenure_months),
+                            principal, annual_rate, tenure_months)
+
+
+def max_principal(monthly_emi, annual_rate=ANNUAL_RATE, tenure_months=TENURE_MONTHS):
+    """Inverse of emi(): the largest principal whose instalment is `monthly_emi`."""
+    e = np.asarray(monthly_emi, dtype=np.float64)
+    return _scalar_or_array(e / _annuity_factor(annual_rate, tenure_months),
+                            monthly_emi, annual_rate, tenure_months)
+
+
+def amortization(principal, annual_rate=ANNUAL_RATE, tenure_months=TENURE_MONTHS) -> dict:
+    """
+    Month-by-month schedules for every loan at once. Returns arrays of shape
+    (loans, months), months running to the longest tenure (shorter loans are
+    zero-padded after their last instalment):
+        "month", "payment", "interest", "principal", "balance"
+    """
+    p, rate, n = np.broadcast_arrays(np.atleast_1d(np.asarray(principal, dtype=np.float64)),
+                                     np.asarray(annual_rate, dtype=np.float64),
+                                     np.asarray(tenure_months, dtype=np.int64))
+    p, rate, n = p.ravel(), rate.ravel(), n.ravel()
+    r = (rate / 12)[:, None]
+    instalment = (p * _annuity_factor(rate, n))[:, None]
+    months = np.arange(1, int(n.max()) + 1)
+    active = months[None, :] <= n[:, None]
+
+    # closed-form balance after k payments: P(1+r)^k − E((1+r)^k − 1)/r
+    growth = (1 + r) ** months[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        paid_down = np.where(r == 0, instalment * months[None, :], instalment * (growth - 1) / r)
+    balance = p[:, None] * np.where(r == 0, 1.0, growth) - paid_down
+    balance = np.where(active, np.maximum(balance, 0.0), 0.0)
+    previous = np.concatenate([p[:, None], balance[:, :-1]], axis=1)
+    interest = np.where(active, previous * r, 0.0)
+    payment = np.where(active, instalment, 0.0)
+    return {
+        "month": np.broadcast_to(months, balance.shape),
+        "payment": payment,
+        "interest": interest,
+        "principal": payment - interest,
+        "balance": balance,
+    }
+
+
+def quote_grid(amounts, salary, tenures=QUOTE_TENURES, annual_rate=ANNUAL_RATE,
+               emi_ratio=SALARY_EMI_RATIO) -> dict:
+    """
+    EMI for every (tenure, amount) pair and whether it fits the salary:
+    {"tenures", "amounts", "emi": (tenures × amounts), "affordable": same shape}.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    tenures = np.asarray(tenures, dtype=np.int64)
+    grid = np.asarray(emi(amounts[None, :], annual_rate, tenures[:, None]))
+    return {"tenures": tenures, "amounts": amounts, "emi": grid, "affordable": grid <= emi_ratio * salary}
+
+
+def affordable_options(salary: float, cap: float = None, tenures=QUOTE_TENURES,
+                       annual_rate: float = ANNUAL_RATE, emi_ratio: float = SALARY_EMI_RATIO,
+                       round_to: float = 1000) -> list:
+    """
+    For each tenure, the largest loan (rounded down to `round_to`, at most
+    `cap`) whose EMI stays within `emi_ratio` of `salary`, with that EMI:
+    [{"tenure_months", "amount", "emi"}, ...].
+    """
+    tenures = np.asarray(tenures, dtype=np.int64)
+    best = np.asarray(max_principal(emi_ratio * salary, annual_rate, tenures))
+    if cap is not None:
+        best = np.minimum(best, cap)
+    best = np.floor(best / round_to) * round_to
+    instalments = np.asarray(emi(best, annual_rate, tenures))
+    return [
+        {"tenure_months": int(n), "amount": float(a), "emi": round(float(e), 2)}
+        for n, a, e in zip(tenures, best, instalments)
+        if a > 0
+    ]
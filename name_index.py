@@ -0,0 +1,247 @@
+# file: name_index.py
+"""
+Fuzzy customer-name resolution.
+
+The chat and CLI take whatever the customer typed as their name; an exact
+match needs every character right. This index maps a typed name to ranked
+candidate customer_ids with a similarity score, so typos, missing or extra
+letters and odd spacing still find the customer:
+
+    index = get_name_index()
+    index.search("priya  shrma")   # [("TC-1001", "Priya Sharma", 0.783), ...]
+    index.resolve("priya  shrma")  # "TC-1001" (or None if nothing is close enough)
+
+How it works:
+- every normalized name (customer_store.normalize_name, padded with a space
+  on each side) is cut into byte trigrams; the index is an inverted list
+  trigram -> sorted customer rows, built with NumPy in one pass. A .col
+  customer file stores these arrays (columnar_store.py), so processes
+  serving it map them rather than each building a private copy;
+- an exact match is answered from the store's hash index straight away;
+- otherwise candidates come from the query's rarest trigrams (the fewest
+  rows to look at; when even those are common, only the names sharing the
+  most of them), and each candidate is scored by Dice similarity,
+  2·shared / (query trigrams + name trigrams), against the candidate's own
+  trigrams.
+A lookup touches a few posting lists and scores at most ~max_candidates
+names, so it stays under a millisecond at a million customers (see
+benchmarks/bench_name_index.py); names made only of very common trigrams
+are the slow case.
+
+Like the eligibility index, it follows the customer store: on a hot reload
+the store's reload listener builds the new snapshot's index and swaps it in,
+while lookups keep using the previous one.
+"""
+
+import math
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from customer_store import get_customer_store, normalize_name
+
+MIN_SCORE = float(os.getenv("NAME_MATCH_MIN_SCORE", 0.6))
+MAX_CANDIDATES = 2000
+PROBE_LISTS = 5  # at most this many of the rarest query trigrams find candidates
+
+
+def _padded(name: str) -> bytes:
+    return f" {normalize_name(name)} ".encode("utf-8")
+
+
+def trigrams(name: str) -> set:
+    """Distinct byte trigrams of a name, as 24-bit ints."""
+    b = _padded(name)
+    return {(b[i] << 16) | (b[i + 1] << 8) | b[i + 2] for i in range(len(b) - 2)}
+
+
+def encode_names(names, count: int) -> tuple:
+    """
+    (blob, offsets) of the padded, normalized names: one bytes object and an
+    int64 offsets array (count + 1), rather than a Python object per name.
+    """
+    blob = bytearray()
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    for row, name in enumerate(names):
+        blob += _padded(name)
+        offsets[row + 1] = len(blob)
+    return np.frombuffer(bytes(blob), dtype=np.uint8), offsets
+
+
+def build_trigrams(blob: np.ndarray, offsets: np.ndarray) -> dict:
+    """
+    The NameIndex arrays for names encoded by encode_names():
+        keys     every distinct trigram, sorted (int32)
+        starts   CSR offsets into postings, len(keys) + 1 (int64)
+        postings customer rows per trigram, ascending (int32)
+        counts   distinct trigrams per customer row (int32)
+        row_trigrams
+                 each row's distinct trigrams, left-aligned and -1 padded
+                 (rows × most trigrams in a name, int32), for scoring
+    columnar_store.write_columnar() stores these in the .col file, so
+    workers serving it map them instead of building them.
+    """
+    n = len(offsets) - 1
+    lengths = np.diff(offsets)
+    width = int(lengths.max()) if n else 3
+
+    # (rows × width) byte matrix → (rows × positions) trigram codes
+    at = np.minimum(offsets[:-1, None] + np.arange(width)[None, :], len(blob) - 1)
+    chars = np.where(np.arange(width)[None, :] < lengths[:, None], blob[at], 0).astype(np.int32)
+    del at
+    codes = (chars[:, :-2] << 16) | (chars[:, 1:-1] << 8) | chars[:, 2:]
+    del chars
+    valid = np.arange(width - 2)[None, :] < (lengths - 2)[:, None]
+
+    # distinct trigrams per name: sort each row, drop repeats
+    codes = np.where(valid, codes, -1)
+    codes.sort(axis=1)
+    valid = codes >= 0
+    valid[:, 1:] &= codes[:, 1:] != codes[:, :-1]
+    counts = valid.sum(axis=1).astype(np.int32)
+
+    # per-name trigrams, left-aligned and -1 padded, for scoring candidates
+    codes = np.where(valid, codes, -1)
+    codes = -np.sort(-codes, axis=1)
+    row_trigrams = np.ascontiguousarray(codes[:, :int(counts.max()) if n else 0], dtype=np.int32)
+    del codes, valid
+
+    rows, cols = np.nonzero(row_trigrams >= 0)
+    flat = row_trigrams[rows, cols]
+    order = np.argsort(flat, kind="stable")  # rows stay ascending within a trigram
+    keys, starts = np.unique(flat[order], return_index=True)
+    return {
+        "keys": keys.astype(np.int32),
+        "starts": np.append(starts, len(order)).astype(np.int64),
+        "postings": rows[order].astype(np.int32),
+        "counts": counts,
+        "row_trigrams": row_trigrams,
+    }
+
+
+class NameIndex:
+    """Trigram index over one customer snapshot's names (see module docstring)."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        # a .col file carries the arrays already (read-only views into the mapping)
+        arrays = snapshot.name_trigrams() if hasattr(snapshot, "name_trigrams") else None
+        if arrays is None:
+            names = (snapshot.value("full_name", row) for row in range(len(snapshot)))
+            arrays = build_trigrams(*encode_names(names, len(snapshot)))
+        self.keys = arrays["keys"]
+        self.starts = arrays["starts"]
+        self.postings = arrays["postings"]
+        self.trigram_counts = arrays["counts"]
+        self.row_trigrams = arrays["row_trigrams"]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.keys, self.starts, self.postings, self.trigram_counts,
+                                      self.row_trigrams))
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def _posting(self, code: int):
+        i = np.searchsorted(self.keys, code)
+        if i < len(self.keys) and self.keys[i] == code:
+            return self.postings[self.starts[i]:self.starts[i + 1]]
+        return self.postings[:0]
+
+    def search(self, name: str, limit: int = 5, min_score: float = MIN_SCORE,
+               max_candidates: int = MAX_CANDIDATES) -> list:
+        """Up to `limit` (customer_id, full_name, score) tuples, best first, score in [0, 1]."""
+        snapshot = self.snapshot
+        exact = snapshot.row_of_name(name)
+        if exact >= 0:
+            return [(snapshot.value("customer_id", exact), snapshot.value("full_name", exact), 1.0)]
+
+        query = trigrams(name)
+        if not query or not len(snapshot):
+            return []
+        lists = sorted((rows for rows in map(self._posting, query) if len(rows)), key=len)
+        if not lists:
+            return []
+
+        # candidates: rows of the rarest lists (three, and up to PROBE_LISTS while
+        # the pool stays small); when there are more than max_candidates, keep
+        # only the rows found in the most of those lists
+        probe, pool_size = 0, 0
+        while probe < min(PROBE_LISTS, len(lists)) and (
+                probe < 3 or pool_size + len(lists[probe]) <= 8 * max_candidates):
+            pool_size += len(lists[probe])
+            probe += 1
+        pool = np.sort(np.concatenate(lists[:probe]))
+        starts = np.flatnonzero(np.append(True, pool[1:] != pool[:-1]))
+        candidates = pool[starts]
+        if len(candidates) > max_candidates:
+            hits = np.diff(np.append(starts, len(pool)))
+            at_least = np.cumsum(np.bincount(hits)[::-1])[::-1]  # at_least[h]: rows in >= h lists
+            small_enough = at_least <= max_candidates
+            need = int(np.argmax(small_enough)) if small_enough[-1] else len(at_least) - 1
+            candidates = candidates[hits >= max(need, 2)]
+
+        # names too short or too long to reach min_score can be dropped unscored
+        q = len(query)
+        counts = self.trigram_counts[candidates]
+        fits = (counts * (2 - min_score) >= q * min_score) & (counts * min_score <= q * (2 - min_score))
+        candidates, counts = candidates[fits], counts[fits]
+
+        # shared trigrams per candidate (padding is -1, never a query trigram)
+        shared = np.isin(self.row_trigrams[candidates], np.fromiter(query, dtype=np.int32)).sum(axis=1)
+        scores = 2 * shared / (q + counts)
+        keep = np.flatnonzero(scores >= min_score)
+        if len(keep) > limit:
+            keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+        return [
+            (snapshot.value("customer_id", row), snapshot.value("full_name", row), round(float(scores[i]), 3))
+            for i, row in ((i, int(candidates[i])) for i in keep)
+        ]
+
+    def match(self, name: str, min_score: float = MIN_SCORE):
+        """The single best (customer_id, full_name, score), or None if nothing is close enough."""
+        matches = self.search(name, limit=2, min_score=min_score)
+        if not matches:
+            return None
+        if len(matches) == 2 and math.isclose(matches[0][2], matches[1][2]):
+            return None  # two equally good names: don't guess
+        return matches[0]
+
+    def resolve(self, name: str, min_score: float = MIN_SCORE):
+        """customer_id of match(), or None."""
+        best = self.match(name, min_score)
+        return best[0] if best else None
+
+
+# ----------------------------
+# Shared instance (follows the customer store)
+# ----------------------------
+_indexes = weakref.WeakKeyDictionary()  # store -> its current index
+_index_lock = threading.Lock()
+
+
+def get_name_index(store=None) -> NameIndex:
+    """The store's index: built on first use, then replaced by the reload listener."""
+    store = store if store is not None else get_customer_store()
+    index = _indexes.get(store)
+    if index is not None:
+        return index
+    with _index_lock:
+        index = _indexes.get(store)
+        if index is None:
+            store.add_reload_listener(lambda old, new, stats: _rebuild(store, new))
+            index = _indexes[store] = NameIndex(store.snapshot())
+    return index
+
+
+def _rebuild(store, snapshot):
+    index = NameIndex(snapshot)  # outside the lock: searches go on against the old index
+    with _index_lock:
+        if store.snapshot() is not snapshot:
+            return  # reloaded again meanwhile; that reload's listener installs its own
+        _indexes[store] = index
+    print(f"[NameIndex] Rebuilt for {len(index)} customers")
@@ -0,0 +1,148 @@
+# file: prefetch.py
+"""
+Speculative prefetch of a customer's KYC, credit score and offer.
+
+As soon as the chat knows the customer's name, `prefetcher.start()` runs the
+three lookups side by side on a small thread pool and keeps the result
+under the chat session's id. The verify-and-underwrite turn then picks up
+the finished profile (`get_async()`) instead of making its round trips one
+after another. `name` is whatever the services accept: the customer_id
+(what the chat resolves the typed name to) or the full name.
+
+    prefetcher.start(session_id, customer_id)                  # at get_name
+    profile = await prefetcher.get_async(session_id, customer_id)
+    # {"kyc": {...}, "score": {...}, "offer": {...}} — the services' own replies
+
+Entries expire after PREFETCH_TTL_SECONDS (abandoned chats don't pile up),
+and a request for a different name, or one that finds nothing prefetched,
+fetches on the spot (still in parallel).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from tools import verify_kyc, fetch_credit_score, get_offer_details
+from tracing import span
+
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", 300))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 32))
+SWEEP_INTERVAL_SECONDS = 30.0
+
+# profile key -> lookup (each returns the service's {"status": ...} reply)
+FETCHERS = {"kyc": verify_kyc, "score": fetch_credit_score, "offer": get_offer_details}
+
+
+def _safe(fetch, name: str) -> dict:
+    try:
+        return fetch(name)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+class _Entry:
+    __slots__ = ("name", "future", "expires_at")
+
+    def __init__(self, name, future, expires_at):
+        self.name = name
+        self.future = future
+        self.expires_at = expires_at
+
+
+class ProfilePrefetcher:
+    """Per-session cache of in-flight / finished profile lookups (see module docstring)."""
+
+    def __init__(self, ttl_seconds: float = PREFETCH_TTL_SECONDS, max_workers: int = PREFETCH_WORKERS):
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "expired": 0}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._last_sweep = time.monotonic()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+        return self._pool
+
+    def _fetch(self, name: str) -> Future:
+        """Run every lookup in parallel; the Future resolves to the combined profile."""
+        pool = self._executor()
+        parts = {key: pool.submit(_safe, fetch, name) for key, fetch in FETCHERS.items()}
+        profile = Future()
+        remaining = [len(parts)]
+        lock = threading.Lock()
+
+        def _done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                profile.set_result({key: f.result() for key, f in parts.items()})
+
+        for f in parts.values():
+            f.add_done_callback(_done)
+        return profile
+
+    def start(self, session_id: str, name: str) -> Future:
+        """Begin fetching `name`'s profile for this session (replaces any earlier one)."""
+        self.stats["started"] += 1
+        entry = _Entry(name, self._fetch(name), time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[session_id] = entry
+        self._sweep()
+        return entry.future
+
+    def _take(self, session_id: str, name: str) -> Future:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[session_id]
+                self.stats["expired"] += 1
+                entry = None
+        if entry is not None and entry.name == name:
+            self.stats["hits"] += 1
+            return entry.future
+        self.stats["misses"] += 1
+        return self.start(session_id, name)
+
+    def get(self, session_id: str, name: str) -> dict:
+        """The session's profile for `name`, waiting for the prefetch if it is still running."""
+        with span("prefetch.wait"):
+            return self._take(session_id, name).result()
+
+    async def get_async(self, session_id: str, name: str) -> dict:
+        """asyncio version of get(); waits without blocking the event loop."""
+        future = self._take(session_id, name)
+        if future.done():
+            return future.result()
+        with span("prefetch.wait"):
+            return await asyncio.wrap_future(future)
+
+    def discard(self, session_id: str):
+        """Forget a session's profile (e.g. once its decision is made)."""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            self._last_sweep = now
+            expired = [sid for sid, e in self._entries.items() if e.expires_at <= now]
+            for sid in expired:
+                del self._entries[sid]
+        self.stats["expired"] += len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+prefetcher = ProfilePrefetcher()
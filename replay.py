@@ -0,0 +1,157 @@
+# file: replay.py
+"""
+Headless replay of scripted sessions through the agent graph.
+
+Each line of the input file is one session:
+    {"session_id": "s-1", "customer_name": "Priya Sharma",
+     "inputs": ["Home renovation", "120000", "3210"]}
+
+`inputs` are the answers to the graph's prompts in order (loan reason, loan
+amount, last 4 phone digits, and a salary slip path if the amount needs
+one). Sessions run in parallel on a thread pool (one shared compiled graph)
+or a process pool (one compiled graph per worker), and the run reports sessions/sec
+and per-node latency.
+
+Usage:
+    python replay.py sessions.jsonl --workers 8
+    python replay.py sessions.jsonl --workers 4 --mode process --output results.jsonl
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def read_sessions(path: str) -> list:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ----------------------------
+# Workers
+# ----------------------------
+def _get_graph():
+    from agent import get_graph  # compiled once per process, shared by every session
+    return get_graph()
+
+
+def _init_process_worker(quiet: bool):
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    # this process is already one of the pool's workers: render letters here
+    # rather than starting a nested letter pool per worker
+    from letter_service import letter_service, _init_worker
+    letter_service.inline = True
+    _init_worker()
+    _get_graph()
+
+
+def _ready(_):
+    time.sleep(0.1)  # long enough that every worker picks one up
+    return os.getpid()
+
+
+def _run_one(script: dict) -> dict:
+    from agent import run_scripted_session
+    return run_scripted_session(_get_graph(), script)
+
+
+# ----------------------------
+# Report
+# ----------------------------
+def _percentile(ordered: list, p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def summarize(results: list, elapsed_s: float) -> dict:
+    per_node = defaultdict(list)
+    for r in results:
+        for node, seconds in r["node_timings"]:
+            per_node[node].append(seconds)
+    nodes = {}
+    for node, samples in per_node.items():
+        samples.sort()
+        nodes[node] = {
+            "count": len(samples),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(_percentile(samples, 95) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+    durations = sorted(r["duration_s"] for r in results) or [0.0]
+    return {
+        "sessions": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "elapsed_s": round(elapsed_s, 3),
+        "sessions_per_s": round(len(results) / elapsed_s, 2) if elapsed_s else 0.0,
+        "session_p50_ms": round(_percentile(durations, 50) * 1000, 3),
+        "session_p95_ms": round(_percentile(durations, 95) * 1000, 3),
+        "decisions": dict(Counter(str(r["decision"]) for r in results)),
+        "nodes": nodes,
+    }
+
+
+def print_report(report: dict):
+    print(f"[Replay] {report['sessions']} sessions in {report['elapsed_s']}s "
+          f"→ {report['sessions_per_s']} sessions/s ({report['errors']} errors)")
+    print(f"[Replay] session latency p50 {report['session_p50_ms']} ms | p95 {report['session_p95_ms']} ms")
+    print(f"[Replay] decisions: {report['decisions']}")
+    print(f"{'node':<16} | {'count':>6} | {'mean ms':>9} | {'p50 ms':>9} | {'p95 ms':>9} | {'max ms':>9}")
+    for node, s in report["nodes"].items():
+        print(f"{node:<16} | {s['count']:>6} | {s['mean_ms']:>9} | {s['p50_ms']:>9} | {s['p95_ms']:>9} | {s['max_ms']:>9}")
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+def replay(scripts: list, workers: int = 8, mode: str = "thread", quiet: bool = True) -> tuple:
+    """
+    Run every scripted session; returns (results, report). Worker start-up
+    (imports, graph compile) is excluded from the timing.
+    """
+    if mode == "process":
+        # spawn: the parent may already be running the store watcher / checkpoint flusher threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_process_worker, initargs=(quiet,)) as pool:
+            list(pool.map(_ready, range(workers)))
+            start = time.perf_counter()
+            results = list(pool.map(_run_one, scripts, chunksize=max(1, len(scripts) // (workers * 4))))
+            elapsed = time.perf_counter() - start
+    else:
+        out = open(os.devnull, "w") if quiet else sys.stdout
+        with contextlib.redirect_stdout(out):
+            _get_graph()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_run_one, scripts))
+            elapsed = time.perf_counter() - start
+        if quiet:
+            out.close()
+    return results, summarize(results, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay scripted loan sessions through the agent graph.")
+    parser.add_argument("sessions", help="JSONL file of scripted sessions")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--output", help="write per-session results (JSONL) here")
+    parser.add_argument("--verbose", action="store_true", help="show the agents' console output")
+    args = parser.parse_args()
+
+    results, report = replay(read_sessions(args.sessions), args.workers, args.mode, quiet=not args.verbose)
+    if args.output:
+        with open(args.output, "w") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+# file: salary_slip.py
+"""
+Salary slip parser for PDF, CSV and XLSX uploads.
+
+- Size and type are checked from file metadata before any content is read.
+- PDFs are read through mmap; content streams are inflated with a capped
+  output size. CSVs are streamed row by row; XLSX sheets are streamed out of
+  the zip with iterparse. Memory stays bounded by the size limits below.
+- Results are cached by the SHA-256 of the file content, so re-uploads and
+  retries of the same slip skip parsing entirely.
+
+The monthly salary is taken from the first label found in this order:
+net salary / net pay / take home, then gross salary / total earnings, then
+basic salary.
+"""
+
+import csv
+import hashlib
+import mmap
+import os
+import re
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+from xml.etree.ElementTree import ParseError, iterparse
+
+MAX_SLIP_BYTES = int(os.getenv("SALARY_SLIP_MAX_BYTES", 5 * 1024 * 1024))
+MAX_INFLATED_BYTES = 8 * MAX_SLIP_BYTES  # guards against zip/deflate bombs
+SUPPORTED_EXTENSIONS = (".pdf", ".csv", ".xlsx")
+CACHE_SIZE = int(os.getenv("SALARY_SLIP_CACHE_SIZE", 4096))
+
+# label groups, most trusted first
+SALARY_LABELS = [
+    ("net", ("net salary", "net pay", "take home", "net amount")),
+    ("gross", ("gross salary", "gross earnings", "total earnings", "gross pay")),
+    ("basic", ("basic salary", "basic pay", "basic")),
+]
+_AMOUNT_RE = re.compile(r"(?:₹|inr|rs\.?)?\s*(\d[\d,]*(?:\.\d+)?)", re.IGNORECASE)
+
+
+class SalarySlipError(ValueError):
+    """The upload is not a salary slip we can read (too big, wrong type, no salary)."""
+
+
+# ----------------------------
+# Hashing + cache
+# ----------------------------
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_cache = OrderedDict()  # sha256 -> result dict
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def _cache_get(key):
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            cache_stats["hits"] += 1
+        else:
+            cache_stats["misses"] += 1
+        return result
+
+
+def _cache_put(key, result):
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+def check_slip_file(path: str, file_type: str = None) -> str:
+    """Reject missing, oversized or unsupported files before reading them; returns the type."""
+    file_type = (file_type or os.path.splitext(path)[1]).lower()
+    if not file_type.startswith("."):
+        file_type = "." + file_type
+    if file_type not in SUPPORTED_EXTENSIONS:
+        raise SalarySlipError(f"Unsupported file type '{file_type}'. Please upload a PDF, CSV or XLSX file.")
+    try:
+        size = os.stat(path).st_size
+    except OSError:
+        raise SalarySlipError("Uploaded file not found.")
+    if size == 0:
+        raise SalarySlipError("Uploaded file is empty.")
+    if size > MAX_SLIP_BYTES:
+        raise SalarySlipError(f"File is too large ({size // 1024} KB); the limit is {MAX_SLIP_BYTES // 1024} KB.")
+    return file_type
+
+
+def extract_salary(path: str, sha256: str = None, file_type: str = None) -> dict:
+    """
+    Parse a salary slip and return {"monthly_salary", "salary_label", "sha256"}.
+    Pass `sha256` if the caller already hashed the file. Raises SalarySlipError.
+    """
+    file_type = check_slip_file(path, file_type)
+    sha256 = sha256 or file_sha256(path)
+    cached = _cache_get(sha256)
+    if cached is not None:
+        return dict(cached)
+
+    try:
+        if file_type == ".pdf":
+            rows = _pdf_rows(path)
+        elif file_type == ".csv":
+            rows = _csv_rows(path)
+        else:
+            rows = _xlsx_rows(path)
+        found = find_salary(rows)  # the CSV and XLSX readers are lazy: they fail here
+    except SalarySlipError:
+        raise
+    except (ValueError, IndexError, KeyError, ParseError, csv.Error, zipfile.BadZipFile, zlib.error,
+            EOFError, OSError) as e:
+        # malformed content (bad numbers, truncated XML or zip members, ...)
+        raise SalarySlipError(f"Could not read salary slip: the {file_type[1:].upper()} file is damaged "
+                              f"or not in a supported layout.") from e
+    if found is None:
+        raise SalarySlipError("Could not find a salary amount in the uploaded slip.")
+    label, amount = found
+    result = {"monthly_salary": amount, "salary_label": label, "sha256": sha256}
+    _cache_put(sha256, result)
+    return dict(result)
+
+
+# ----------------------------
+# Label matching (shared by every format)
+# ----------------------------
+def _parse_amount(text):
+    m = _AMOUNT_RE.search(str(text))
+    if not m:
+        return None
+    try:
+        value = float(m.group(1).replace(",", ""))
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def _label_rank(cell: str):
+    text = cell.strip().lower()
+    for rank, (label, names) in enumerate(SALARY_LABELS):
+        if any(text.startswith(n) for n in names):
+            return rank, label
+    return None
+
+
+def find_salary(rows):
+    """
+    Scan rows of cells for a salary label. The amount may be in the same cell
+    ("Net Salary: 70,000"), the next cell of the row, or the same column of
+    the next row (header-style sheets). Returns (label, amount) or None.
+    """
+    best = None  # (rank, label, amount)
+    prev_labels = {}  # column -> (rank, label) from the previous row
+    for row in rows:
+        labels = {}
+        for col, cell in enumerate(row):
+            if cell is None or cell == "":
+                continue
+            if col in prev_labels:
+                amount = _parse_amount(cell)
+                rank, label = prev_labels[col]
+                if amount is not None and (best is None or rank < best[0]):
+                    best = (rank, label, amount)
+            if not isinstance(cell, str):
+                continue
+            hit = _label_rank(cell)
+            if hit is None:
+                continue
+            rank, label = hit
+            amount = _parse_amount(cell[len(cell.split(":")[0]):]) if ":" in cell else None
+            if amount is None and col + 1 < len(row):
+                amount = _parse_amount(row[col + 1])
+            if amount is not None:
+                if best is None or rank < best[0]:
+                    best = (rank, label, amount)
+            else:
+                labels[col] = hit
+        if best is not None and best[0] == 0:
+            break  # net salary is the best answer there is
+        prev_labels = labels
+    return None if best is None else (best[1], best[2])
+
+
+# ----------------------------
+# PDF
+# ----------------------------
+_STREAM_RE = re.compile(rb"<<(.{0,400}?)>>\s*stream\r?\n", re.S)
+_TEXT_OPS_RE = re.compile(
+    rb"(?P<bt>\bBT\b)"
+    rb"|(?P<tx>-?[\d.]+)\s+(?P<ty>-?[\d.]+)\s+Td"
+    rb"|(?:-?[\d.]+\s+){4}(?P<mx>-?[\d.]+)\s+(?P<my>-?[\d.]+)\s+Tm"
+    rb"|\((?P<tj>(?:[^()\\]|\\.)*)\)\s*Tj"
+    rb"|\[(?P<TJ>(?:[^\]\\]|\\.)*)\]\s*TJ",
+    re.S,
+)
+_TJ_PARTS_RE = re.compile(rb"\(((?:[^()\\]|\\.)*)\)", re.S)
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def _unescape_pdf_string(raw: bytes) -> str:
+    def repl(m):
+        s = m.group(1)
+        if s[:1].isdigit():
+            return bytes([int(s, 8) & 0xFF])
+        return _ESCAPES.get(s, s)
+    return re.sub(rb"\\([0-7]{1,3}|.)", repl, raw, flags=re.S).decode("latin-1")
+
+
+def _inflate(data: bytes, budget: int) -> bytes:
+    d = zlib.decompressobj()
+    out = d.decompress(data, budget)
+    if d.unconsumed_tail:
+        raise SalarySlipError("Salary slip PDF content is too large.")
+    return out
+
+
+def _pdf_rows(path: str):
+    """Text of the PDF's content streams, grouped into rows by y position."""
+    budget = MAX_INFLATED_BYTES
+    cells = []  # (y, x, text)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if not mm[:5] == b"%PDF-":
+            raise SalarySlipError("Uploaded file is not a valid PDF.")
+        for m in _STREAM_RE.finditer(mm):
+            header = m.group(1)
+            start = m.end()
+            end = mm.find(b"endstream", start)
+            if end < 0:
+                break
+            data = mm[start:end]
+            if b"/FlateDecode" in header:
+                try:
+                    data = _inflate(data, budget)
+                except zlib.error:
+                    continue
+            elif b"/Filter" in header:
+                continue  # images and other encodings carry no text we can read
+            budget -= len(data)
+            if budget < 0:
+                raise SalarySlipError("Salary slip PDF content is too large.")
+            x = y = 0.0
+            for op in _TEXT_OPS_RE.finditer(data):
+                if op.group("bt"):
+                    x = y = 0.0
+                elif op.group("tx") is not None:
+                    x += float(op.group("tx"))
+                    y += float(op.group("ty"))
+                elif op.group("mx") is not None:
+                    x, y = float(op.group("mx")), float(op.group("my"))
+                elif op.group("tj") is not None:
+                    cells.append((y, x, _unescape_pdf_string(op.group("tj"))))
+                else:
+                    text = "".join(_unescape_pdf_string(p) for p in _TJ_PARTS_RE.findall(op.group("TJ")))
+                    cells.append((y, x, text))
+
+    # same baseline (to the nearest point) → same row; rows top to bottom
+    rows = OrderedDict()
+    for y, x, text in sorted(cells, key=lambda c: (-round(c[0]), c[1])):
+        rows.setdefault(round(y), []).append(text)
+    return list(rows.values())
+
+
+# ----------------------------
+# CSV
+# ----------------------------
+def _csv_rows(path: str):
+    with open(path, "r", newline="", encoding="utf-8-sig", errors="replace") as f:
+        for row in csv.reader(f):
+            yield row
+
+
+# ----------------------------
+# XLSX
+# ----------------------------
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def _col_index(ref: str) -> int:
+    col = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        col = col * 26 + (ord(ch.upper()) - 64)
+    return col - 1
+
+
+def _xlsx_rows(path: str):
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise SalarySlipError("Uploaded file is not a valid XLSX workbook.")
+    with zf:
+        if sum(info.file_size for info in zf.infolist()) > MAX_INFLATED_BYTES:
+            raise SalarySlipError("Salary slip workbook is too large.")
+        names = zf.namelist()
+        shared = []
+        if "xl/sharedStrings.xml" in names:
+            with zf.open("xl/sharedStrings.xml") as f:
+                for _, el in iterparse(f):
+                    if el.tag == _NS + "si":
+                        shared.append("".join(t.text or "" for t in el.iter(_NS + "t")))
+                        el.clear()
+        sheets = sorted(n for n in names if n.startswith("xl/worksheets/sheet") and n.endswith(".xml"))
+        if not sheets:
+            raise SalarySlipError("Salary slip workbook has no worksheets.")
+        with zf.open(sheets[0]) as f:
+            for _, el in iterparse(f):
+                if el.tag != _NS + "row":
+                    continue
+                row = []
+                for c in el.iter(_NS + "c"):
+                    col = _col_index(c.get("r", ""))
+                    if col >= 0:
+                        row.extend([None] * (col - len(row)))
+                    kind = c.get("t")
+                    v = c.find(_NS + "v")
+                    if kind == "s" and v is not None:
+                        value = shared[int(v.text)]
+                    elif kind == "inlineStr":
+                        value = "".join(t.text or "" for t in c.iter(_NS + "t"))
+                    elif v is not None and kind != "str":
+                        value = float(v.text)
+                    else:
+                        value = v.text if v is not None else None
+                    row.append(value)
+                el.clear()
+                yield row
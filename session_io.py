@@ -0,0 +1,79 @@
+# file: session_io.py
+"""
+Where a conversation's input comes from and where its replies go.
+
+The agent nodes and CLI tools call `ask()` / `say()` instead of input() /
+print(). By default that is the console; a driver can install any other
+provider for the current context with `use_io()`, e.g. a ScriptedIO that
+feeds pre-recorded answers, so the same graph runs headless and many
+sessions can run side by side (the provider lives in a contextvar, so each
+thread or asyncio task sees its own).
+"""
+
+import contextvars
+from contextlib import contextmanager
+
+
+class ScriptExhausted(EOFError):
+    """A scripted session asked for more input than its script has."""
+
+
+class ConsoleIO:
+    """Interactive terminal session (the default)."""
+
+    def ask(self, prompt: str = "You: ") -> str:
+        return input(prompt)
+
+    def say(self, text: str):
+        print(text)
+
+
+class ScriptedIO:
+    """Replays a fixed list of answers and records everything said, for headless runs."""
+
+    def __init__(self, answers, echo: bool = False):
+        self.answers = list(answers)
+        self.echo = echo
+        self.position = 0
+        self.transcript = []  # ("ask" | "user" | "say", text)
+
+    def ask(self, prompt: str = "You: ") -> str:
+        self.transcript.append(("ask", prompt))
+        if self.position >= len(self.answers):
+            raise ScriptExhausted(f"script ran out of answers at prompt {prompt!r}")
+        answer = str(self.answers[self.position])
+        self.position += 1
+        self.transcript.append(("user", answer))
+        if self.echo:
+            print(f"{prompt}{answer}")
+        return answer
+
+    def say(self, text: str):
+        self.transcript.append(("say", text))
+        if self.echo:
+            print(text)
+
+
+_current = contextvars.ContextVar("session_io", default=ConsoleIO())
+
+
+def get_io():
+    return _current.get()
+
+
+@contextmanager
+def use_io(io):
+    """Route ask()/say() in the current context (thread / task) to `io`."""
+    token = _current.set(io)
+    try:
+        yield io
+    finally:
+        _current.reset(token)
+
+
+def ask(prompt: str = "You: ") -> str:
+    return _current.get().ask(prompt)
+
+
+def say(text: str):
+    _current.get().say(text)
@@ -0,0 +1,284 @@
+# file: session_store.py
+"""
+Chat session state outside the worker process.
+
+gradio_app keeps a conversation's progress (the state dict and the chat
+history) in a SessionStore keyed by session_id, so any worker process can
+pick up the next turn of any conversation, and a restarted worker loses
+nothing. The browser only has to carry the session_id.
+
+    store = get_session_store()       # from SESSION_STORE
+    store.save(session_id, state, history)
+    record = store.load(session_id)   # {"state": {...}, "history": [...]} or None
+
+SESSION_STORE selects the backend:
+    memory              per-process dict (the default; one worker only)
+    sqlite:<path>       one SQLite file (WAL) shared by every worker on the host
+    file:<directory>    one small file per session, replaced atomically
+Records are compact JSON, zlib-compressed once they pass
+SESSION_COMPRESS_BYTES, and expire SESSION_TTL_SECONDS after their last save
+(or after the ttl_seconds given to that save).
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", 24 * 3600))
+COMPRESS_BYTES = int(os.getenv("SESSION_COMPRESS_BYTES", 512))
+MEMORY_MAX_SESSIONS = int(os.getenv("SESSION_MEMORY_MAX", 100000))
+PRUNE_INTERVAL_SECONDS = 60.0
+
+# session ids arrive from the browser: only plain tokens (uuid4().hex) are accepted
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+_RAW, _ZLIB = b"j", b"z"  # first byte of every record
+
+
+def valid_session_id(session_id) -> bool:
+    return isinstance(session_id, str) and bool(_SESSION_ID.match(session_id))
+
+
+def _json_default(value):
+    # NumPy scalars (loan_math results) and similar
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in a session")
+
+
+def encode_record(state: dict, history: list) -> bytes:
+    data = json.dumps({"s": state, "h": history}, separators=(",", ":"),
+                      ensure_ascii=False, default=_json_default).encode("utf-8")
+    if len(data) >= COMPRESS_BYTES:
+        return _ZLIB + zlib.compress(data, 1)
+    return _RAW + data
+
+
+def decode_record(blob: bytes) -> dict:
+    kind, data = blob[:1], blob[1:]
+    if kind == _ZLIB:
+        data = zlib.decompress(data)
+    record = json.loads(data)
+    # JSON turns the (user, bot) pairs into lists; Gradio wants them back as pairs
+    return {"state": record["s"], "history": [tuple(turn) if isinstance(turn, list) else turn
+                                              for turn in record["h"]]}
+
+
+class SessionStore:
+    """Interface: load / save / delete by session_id, plus usage counters."""
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"loads": 0, "hits": 0, "saves": 0, "bytes_saved": 0, "pruned": 0}
+        self._last_prune = time.monotonic()
+
+    def load(self, session_id: str):
+        """{"state", "history"} for the session, or None if unknown or expired."""
+        self.stats["loads"] += 1
+        blob = self._read(session_id) if valid_session_id(session_id) else None
+        if blob is None:
+            return None
+        self.stats["hits"] += 1
+        return decode_record(blob)
+
+    def save(self, session_id: str, state: dict, history: list, ttl_seconds: float = None):
+        """Store the session until `ttl_seconds` (default: the store's ttl_seconds) from now."""
+        if not valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        blob = encode_record(state, history)
+        self._write(session_id, blob, time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds))
+        self.stats["saves"] += 1
+        self.stats["bytes_saved"] += len(blob)
+        if time.monotonic() - self._last_prune > PRUNE_INTERVAL_SECONDS:
+            self._last_prune = time.monotonic()
+            self.stats["pruned"] += self.prune()
+
+    def delete(self, session_id: str):
+        if valid_session_id(session_id):
+            self._delete(session_id)
+
+    def prune(self) -> int:
+        """Drop expired sessions; returns how many."""
+        return 0
+
+    def _read(self, session_id):
+        raise NotImplementedError
+
+    def _write(self, session_id, blob, expires_at):
+        raise NotImplementedError
+
+    def _delete(self, session_id):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in this process only, oldest save first; past max_sessions the oldest are dropped."""
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_sessions: int = MEMORY_MAX_SESSIONS):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        self._records = OrderedDict()  # session_id -> (expires_at, blob)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def _read(self, session_id):
+        with self._lock:
+            entry = self._records.get(session_id)
+        if entry is None or time.time() > entry[0]:
+            return None
+        return entry[1]
+
+    def _write(self, session_id, blob, expires_at):
+        with self._lock:
+            self._records[session_id] = (expires_at, blob)
+            self._records.move_to_end(session_id)
+            while len(self._records) > self.max_sessions:
+                self._records.popitem(last=False)
+
+    def _delete(self, session_id):
+        with self._lock:
+            self._records.pop(session_id, None)
+
+    def prune(self) -> int:
+        now = time.time()
+        with self._lock:
+            # expiry times aren't in save order (a save can pass its own ttl_seconds)
+            expired = [sid for sid, (expires_at, _) in self._records.items() if expires_at < now]
+            for sid in expired:
+                del self._records[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in one SQLite file that every worker process on the host opens."""
+
+    def __init__(self, path: str = "sessions.sqlite", ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "session_id TEXT PRIMARY KEY, expires_at REAL NOT NULL, data BLOB NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; every save commits at once, so the next
+        # turn can land on any other worker
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _read(self, session_id):
+        row = self._conn().execute("SELECT expires_at, data FROM sessions WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+        if row is None or time.time() > row[0]:
+            return None
+        return row[1]
+
+    def _write(self, session_id, blob, expires_at):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, expires_at, data) VALUES (?, ?, ?)",
+                         (session_id, expires_at, blob))
+
+    def _delete(self, session_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def prune(self) -> int:
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+class FileSessionStore(SessionStore):
+    """
+    One file per session under `directory` (e.g. a shared volume); writes are
+    atomic renames, and a file's mtime is set to its expiry time.
+    """
+
+    def __init__(self, directory: str = "sessions", ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, session_id[:2], session_id)
+
+    def _read(self, session_id):
+        path = self._path(session_id)
+        try:
+            if time.time() > os.path.getmtime(path):
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, session_id, blob, expires_at):
+        path = self._path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.utime(tmp_path, (expires_at, expires_at))
+        os.replace(tmp_path, path)
+
+    def _delete(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def prune(self) -> int:
+        cutoff = time.time()
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+def create_session_store(spec: str = SESSION_STORE) -> SessionStore:
+    """Build a store from a SESSION_STORE spec ("memory", "sqlite:<path>", "file:<dir>")."""
+    kind, _, target = spec.partition(":")
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(target or "sessions.sqlite")
+    if kind == "file":
+        return FileSessionStore(target or "sessions")
+    raise ValueError(f"Unknown SESSION_STORE {spec!r} (expected memory, sqlite:<path> or file:<dir>)")
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """The process-wide store, built from SESSION_STORE on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_session_store()
+                print(f"[Sessions] Using {type(_store).__name__} ({SESSION_STORE})")
+    return _store
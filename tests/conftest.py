@@ -0,0 +1,39 @@
+# file: tests/conftest.py
+"""
+Shared test setup. Most modules read their configuration at import time,
+so the environment is pointed at a scratch directory here, before any test
+module imports them: nothing is written into the checkout and no test
+talks to Gemini.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# subprocesses started by the tests import this too; they share the parent's
+# scratch directory instead of leaving one of their own behind
+SCRATCH = os.environ.get("SMARTLOAN_TEST_SCRATCH") or tempfile.mkdtemp(prefix="smartloan-tests-")
+OWNS_SCRATCH = "SMARTLOAN_TEST_SCRATCH" not in os.environ
+os.environ["SMARTLOAN_TEST_SCRATCH"] = SCRATCH
+for key in ("SANCTION_LETTER_DIR", "UPLOAD_DIR", "AUDIT_LOG_DIR"):
+    os.environ.setdefault(key, os.path.join(SCRATCH, key.lower()))
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(SCRATCH, "checkpoints.sqlite"))
+os.environ.setdefault("SESSION_STORE", "memory")
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("TRACE_FILE", "")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not OWNS_SCRATCH:
+        return
+    # the audit log seals its open segment at exit; do that before its directory goes
+    import audit_log
+    if audit_log._log is not None:
+        audit_log._log.close()
+    shutil.rmtree(SCRATCH, ignore_errors=True)
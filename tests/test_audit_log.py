@@ -0,0 +1,119 @@
+# file: tests/test_audit_log.py
+import errno
+import glob
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import audit_log
+from audit_log import AuditLog, query
+
+
+def make_record(i: int, ts: float = None) -> dict:
+    return {"ts": 1_700_000_000.0 + i if ts is None else ts, "tool": "perform_underwriting_gradio",
+            "customer": f"TC-{100000 + i % 5}", "session": None, "amount": 1000.0 * i,
+            "decision": ("APPROVED", "REJECTED", "PAYSALARY_REQUIRED")[i % 3], "reason": "test"}
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(audit_log, "RETRY_DELAY_SECONDS", 0.0)
+
+
+def test_write_query_and_seal(tmp_path):
+    log = AuditLog(str(tmp_path), segment_bytes=2000)
+    for i in range(60):
+        log.record(make_record(i))
+        if i % 10 == 9:
+            assert log.flush()  # separate batches, so the small segments rotate
+    log.close()
+
+    segments = sorted(glob.glob(str(tmp_path / "decisions-*.jsonl")))
+    assert len(segments) == log.stats["segments"] > 1
+    summaries = []
+    for segment in segments:
+        with open(segment[:-len(".jsonl")] + ".idx") as f:
+            summaries.append(json.load(f))
+    assert sum(s["count"] for s in summaries) == 60 == log.stats["records"]
+
+    assert [r["amount"] for r in query(str(tmp_path))] == [1000.0 * i for i in range(60)]
+    assert {r["customer"] for r in query(str(tmp_path), customer="TC-100003")} == {"TC-100003"}
+    assert len(list(query(str(tmp_path), customer="TC-100003"))) == 12
+    assert len(list(query(str(tmp_path), decision="REJECT"))) == 20
+    assert len(list(query(str(tmp_path), decision="PAY", customer="TC-100002"))) == 4
+    window = list(query(str(tmp_path), since=1_700_000_010.0, until=1_700_000_020.0))
+    assert [r["ts"] for r in window] == [1_700_000_000.0 + i for i in range(10, 20)]
+
+
+def test_failed_write_is_retried_in_a_new_segment(tmp_path, monkeypatch):
+    log = AuditLog(str(tmp_path))
+    log.record(make_record(0))
+    assert log.flush()
+    failures = []
+
+    def torn_write(data):
+        if not failures:
+            failures.append(1)
+            log._file.write(data[:len(data) // 2])  # half a batch reaches the file, then the disk fills
+            log._file.flush()
+            raise OSError(errno.ENOSPC, "No space left on device")
+        AuditLog._append(log, data)
+
+    monkeypatch.setattr(log, "_append", torn_write)
+    for i in range(1, 4):
+        log.record(make_record(i))
+    assert log.flush()
+    log.close()
+
+    assert failures and log.failed is None
+    assert log.stats["segments"] == 2
+    assert [r["amount"] for r in query(str(tmp_path))] == [0.0, 1000.0, 2000.0, 3000.0]
+    first = sorted(glob.glob(str(tmp_path / "decisions-*.idx")))[0]
+    with open(first) as f:
+        assert json.load(f)["count"] == 1  # cut back to its last good batch
+
+
+def test_writer_failure_does_not_block_callers(tmp_path, monkeypatch):
+    log = AuditLog(str(tmp_path), queue_size=2)
+
+    def broken(data):
+        raise OSError(errno.EIO, "Input/output error")
+
+    monkeypatch.setattr(log, "_append", broken)
+    log.record(make_record(0))
+    wait_for(lambda: log.failed is not None)
+
+    outcome = []
+
+    def caller():
+        for i in range(1, 6):  # more than the queue holds
+            try:
+                log.record(make_record(i))
+                outcome.append("ok")
+            except OSError:
+                outcome.append("error")
+
+    thread = threading.Thread(target=caller)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), "record() blocked on a dead writer"
+    assert outcome == ["error"] * 5
+    with pytest.raises(OSError):
+        log.flush()
+
+    monkeypatch.undo()  # the disk recovers: the next write catches up, in order
+    log.record(make_record(6))
+    assert log.flush()
+    log.close()
+    assert [r["amount"] for r in query(str(tmp_path))] == [1000.0 * i for i in range(7)]
+    assert all(os.path.exists(p[:-len(".jsonl")] + ".idx") for p in glob.glob(str(tmp_path / "*.jsonl")))
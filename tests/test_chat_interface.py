@@ -0,0 +1,176 @@
+# file: tests/test_chat_interface.py
+"""
+Whole conversations through gradio_app.chat_interface, with the benchmark's
+StubModel standing in for Gemini and the demo customers.json.
+"""
+import asyncio
+import os
+
+import pytest
+
+import gemini_api
+import llm_guard
+import tracing
+from audit_log import get_audit_log, query
+from bench_chat_interface import REPLY, StubModel
+from chat_session import Step
+from gradio_app import DONE_MESSAGE, _browser_load, chat_interface
+
+FALLBACK = "Great, let's get your application moving!"
+
+
+class FailingModel(StubModel):
+    """A Gemini that errors on every call."""
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        raise ConnectionError("upstream unavailable")
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        raise ConnectionError("upstream unavailable")
+
+
+@pytest.fixture
+def model(monkeypatch):
+    def install(model):
+        monkeypatch.setitem(gemini_api._models, gemini_api.DEFAULT_MODEL, model)
+        return model
+    gemini_api.get_llm_cache().clear()
+    llm_guard.breaker.record_success()
+    install(StubModel(0.0, chunks=4))
+    yield install
+    llm_guard.breaker.record_success()
+
+
+def turn(message, state, upload=None):
+    """Run one chat turn; (history, session, pdf) as of its last update."""
+    async def run():
+        updates = [update async for update in chat_interface(message, state, upload)]
+        assert updates, "a turn must yield at least once"
+        return updates[-1]
+    history, session, _, _, pdf = asyncio.run(run())
+    return history, session, pdf
+
+
+def converse(*messages):
+    """Start a conversation and send `messages`; returns the last turn's result."""
+    history, state, pdf = turn("", None)
+    for message in messages:
+        history, state, pdf = turn(message, {"session_id": state.session_id})
+    return history, state, pdf
+
+
+def write_slip(directory, net_salary: int) -> str:
+    path = os.path.join(directory, "payslip.csv")
+    with open(path, "w") as f:
+        f.write(f"Earnings,Amount\nBasic Salary,{net_salary // 2}\nNet Salary,{net_salary}\n")
+    return path
+
+
+def test_instant_approval_with_letter_and_audit_record(model):
+    history, state, pdf = converse("My name is Priya Sharma", "₹100,000", "3210")
+    assert state.step is Step.DONE and state.customer_id == "TC-1001"
+    assert history[-1][1].startswith("🎉 Approved!") and "Sanction letter generated" in history[-1][1]
+    assert pdf and os.path.exists(pdf)
+    amount_reply = next(bot for _, bot in history if bot and "₹100,000 noted" in bot)
+    assert REPLY in amount_reply
+
+    get_audit_log().flush()
+    records = list(query(get_audit_log().directory, customer="TC-1001"))
+    assert any(r["session"] == state.session_id and r["decision"] == "APPROVE" for r in records)
+
+    history, state, pdf = turn("thanks", {"session_id": state.session_id})
+    assert history[-1] == (None, DONE_MESSAGE) and pdf == state.sanction_file
+
+    async def reload():
+        return [update async for update in _browser_load("", {"session_id": state.session_id}, None)][-1]
+    history, browser_state, *_ = asyncio.run(reload())
+    assert browser_state["session_id"] != state.session_id  # reloading starts a new application
+    assert len(history) == 1 and "your full name" in history[0][1]
+
+
+def test_salary_slip_path_approves(model, tmp_path):
+    history, state, _ = converse("anjali mehta", "150000", "6655")
+    assert state.step is Step.UPLOAD_PAYSLIP and "upload your salary slip" in history[-1][1]
+
+    history, state, pdf = turn("", {"session_id": state.session_id}, write_slip(tmp_path, 75000))
+    assert state.step is Step.DONE and state.monthly_salary == 75000
+    assert "APPROVED" in history[-1][1] and pdf and os.path.exists(pdf)
+
+
+def test_over_twice_the_limit_is_rejected_with_what_fits(model):
+    history, state, pdf = converse("Sameer Khan", "500000", "5544")
+    assert state.step is Step.DONE and pdf is None
+    assert history[-1][1].startswith("❌ Loan not approved.")
+    assert "You can borrow up to ₹120,000 instantly" in history[-1][1]
+
+
+def test_invalid_amount_asks_again(model):
+    history, state, _ = converse("Priya Sharma", "lots")
+    assert state.step is Step.GET_AMOUNT and history[-1][1].startswith("Invalid amount")
+    history, state, _ = turn("50000", {"session_id": state.session_id})
+    assert state.step is Step.VERIFY_PHONE
+
+
+def test_wrong_phone_digits_end_the_application(model):
+    history, state, _ = converse("Priya Sharma", "50000", "0000")
+    assert state.step is Step.DONE and history[-1][1].startswith("❌ Phone verification failed")
+
+
+def test_matched_name_is_only_shown_after_phone_check(model):
+    history, state, _ = converse("Priya Sharmaa", "50000", "0000")
+    assert state.customer_id == "TC-1001" and state.step is Step.DONE
+    assert not any("Priya Sharma" in bot.replace("Priya Sharmaa", "") for _, bot in history if bot)
+
+    history, state, _ = converse("Priya Sharmaa", "50000", "3210")
+    assert any(bot.startswith("✅ KYC and Phone Verified, Priya Sharma!") for _, bot in history if bot)
+    assert state.customer_name == "Priya Sharma"
+
+
+def test_turn_updates_can_be_driven_from_different_tasks(model):
+    # a server may resume the generator in a new task for every update; the
+    # spans must not leak into (or be reset from) another task's context
+    _, state, _ = converse("Priya Sharma")
+    tracing.reset()
+
+    async def drive():
+        updates = chat_interface("50000", {"session_id": state.session_id}, None)
+        async def step():
+            return await updates.__anext__()
+        count = 0
+        while True:
+            try:
+                await asyncio.ensure_future(step())
+            except StopAsyncIteration:
+                return count
+            count += 1
+
+    updates = asyncio.run(drive())
+    stats = tracing.snapshot()
+    assert updates > 1 and stats[("chat.get_amount", "ok")]["count"] == 1
+    assert stats[("chat.get_amount.update", "ok")]["count"] == updates + 1
+    assert tracing._current_span.get() is None
+
+
+def test_unknown_customer_fails_kyc(model):
+    history, state, _ = converse("Nobody Known Here", "50000", "1234")
+    assert state.step is Step.DONE and history[-1][1] == "❌ KYC not found."
+
+
+def test_bad_salary_slip_can_be_uploaded_again(model, tmp_path):
+    _, state, _ = converse("Anjali Mehta", "150000", "6655")
+    bad = tmp_path / "payslip.csv"
+    bad.write_bytes(b"\x00\x01 not a csv")
+    history, state, _ = turn("", {"session_id": state.session_id}, str(bad))
+    assert state.step is Step.UPLOAD_PAYSLIP and history[-1][1].startswith("❌ Error uploading payslip")
+
+    history, state, _ = turn("", {"session_id": state.session_id}, write_slip(tmp_path, 12000))
+    assert state.step is Step.DONE and "REJECTED" in history[-1][1]
+
+
+def test_llm_failure_falls_back_to_fixed_text(model):
+    model(FailingModel(0.0))
+    history, state, pdf = converse("Priya Sharma", "100000", "3210")
+    amount_reply = next(bot for _, bot in history if bot and "₹100,000 noted" in bot)
+    assert FALLBACK in amount_reply and REPLY not in amount_reply
+    assert state.step is Step.DONE and history[-1][1].startswith("🎉 Approved!")
+    assert pdf and os.path.exists(pdf)
@@ -0,0 +1,28 @@
+# file: tests/test_checkpointing.py
+import sqlite3
+import threading
+
+import pytest
+
+from checkpointing import TunedSqliteSaver
+
+
+def test_readers_of_finished_threads_are_closed(tmp_path):
+    saver = TunedSqliteSaver(str(tmp_path / "checkpoints.sqlite"), commit_interval=0)
+    saver.setup()
+
+    def read():
+        with saver.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()
+            return saver._readers.conn
+
+    readers = []
+    for _ in range(20):  # e.g. a thread pool that replaces its workers
+        thread = threading.Thread(target=lambda: readers.append(read()))
+        thread.start()
+        thread.join()
+    read()
+    assert len(saver._reader_conns) == 1  # only this (live) thread's reader is kept
+    with pytest.raises(sqlite3.ProgrammingError):
+        readers[0].execute("SELECT 1")  # closed, not just forgotten
+    saver.close()
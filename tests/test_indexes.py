@@ -0,0 +1,86 @@
+# file: tests/test_indexes.py
+import json
+
+import pytest
+
+import columnar_store
+from customer_store import CustomerStore
+from eligibility import EligibilityIndex
+from name_index import NameIndex
+from synthetic_data import make_customers
+
+
+@pytest.fixture(scope="module")
+def snapshots(tmp_path_factory):
+    """The same customers as a JSON snapshot and as a .col snapshot."""
+    customers = make_customers(500)
+    customers[7]["full_name"] = "  Zoë   Ünal "
+    directory = tmp_path_factory.mktemp("customers")
+    json_path, col_path = directory / "customers.json", directory / "customers.col"
+    json_path.write_text(json.dumps(customers))
+    columnar_store.convert(str(json_path), str(col_path))
+    return customers, CustomerStore(customers=customers).snapshot(), columnar_store.ColumnarSnapshot(str(col_path))
+
+
+def test_col_file_carries_the_name_index(snapshots):
+    customers, snapshot, col = snapshots
+    built, mapped = NameIndex(snapshot), NameIndex(col)
+    assert not mapped.postings.flags.writeable  # a view into the mapping, not a copy
+    for name in ("Priya Sharma 0", "priya  shrma 0", "ZOE UNAL", "zoë ünal", "Nobody At All", ""):
+        assert built.search(name) == mapped.search(name)
+
+
+def test_search_exact_and_typo(snapshots):
+    customers, _, col = snapshots
+    index = NameIndex(col)
+    c = customers[42]
+    assert index.search(c["full_name"].upper()) == [(c["customer_id"], c["full_name"], 1.0)]
+    assert index.resolve(c["full_name"].replace("a", "", 1)) == c["customer_id"]
+
+
+def test_eligibility_from_columns(snapshots):
+    customers, snapshot, col = snapshots
+    for index in (EligibilityIndex(snapshot), EligibilityIndex(col)):
+        assert len(index) == len(customers)
+        for c in customers[:100]:
+            profile = c["financial_profile"]
+            e = index.get(c["customer_id"])
+            assert (e.customer_id, e.credit_score, e.pre_approved_limit) == (
+                c["customer_id"], profile["credit_score"], profile["pre_approved_limit"])
+            limit = profile["pre_approved_limit"]
+            expected = ("REJECT" if profile["credit_score"] < 700 else "APPROVE")
+            assert index.decide(c["full_name"], limit)["decision"] == expected
+    missing = EligibilityIndex(col).decide("Nobody", 1000)
+    assert missing == {"decision": "REJECT", "reason": "Customer data missing"}
+    missing["session"] = "abc"  # callers annotate results; the shared template must not change
+    assert EligibilityIndex(col).decide("Nobody", 1000) == {"decision": "REJECT", "reason": "Customer data missing"}
+
+
+def test_reload_builds_each_index_once_and_swaps_it_in(tmp_path, monkeypatch):
+    import eligibility
+    import name_index
+    customers = make_customers(50)
+    path = tmp_path / "customers.json"
+    path.write_text(json.dumps(customers))
+    store = CustomerStore(str(path))
+    old_eligibility, old_names = eligibility.get_eligibility_index(store), name_index.get_name_index(store)
+
+    built, served_during_build = [], []
+
+    class CountingIndex(EligibilityIndex):
+        def __init__(self, snapshot):
+            served_during_build.append(eligibility.get_eligibility_index(store))
+            super().__init__(snapshot)
+            built.append(self)
+
+    monkeypatch.setattr(eligibility, "EligibilityIndex", CountingIndex)
+    customers[0]["financial_profile"]["monthly_salary"] += 1000
+    path.write_text(json.dumps(customers))
+    assert store.refresh(force=True) is not None
+
+    assert served_during_build == [old_eligibility]  # requests kept the old index meanwhile
+    assert eligibility.get_eligibility_index(store) is built[0]
+    assert built[0].snapshot is store.snapshot()
+    assert len(built) == 1
+    names = name_index.get_name_index(store)
+    assert names is not old_names and names.snapshot is store.snapshot()
@@ -0,0 +1,72 @@
+# file: tests/test_llm_batcher.py
+import asyncio
+import json
+import threading
+
+import pytest
+
+import gemini_api
+import llm_guard
+from bench_chat_interface import StubResponse
+from llm_batcher import ExplanationBatcher, build_explanation_prompt
+
+
+class BatchModel:
+    """Answers a numbered batch prompt with a JSON array; records each request's timeout."""
+
+    def __init__(self):
+        self.timeouts = []
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.timeouts.append(request_options["timeout"])
+        self.release.wait(30)
+        n = sum(1 for line in prompt.splitlines() if line[:1].isdigit())
+        return StubResponse(json.dumps([f"Sentence {i}." for i in range(1, n + 1)]))
+
+
+@pytest.fixture
+def model(monkeypatch):
+    def install(model):
+        monkeypatch.setitem(gemini_api._models, gemini_api.DEFAULT_MODEL, model)
+        return model
+    gemini_api.get_llm_cache().clear()
+    llm_guard.breaker.record_success()
+    yield install
+    llm_guard.breaker.record_success()
+
+
+def test_async_cache_hit_skips_the_sync_lookup(model, monkeypatch):
+    prompt = build_explanation_prompt("REJECT", "Credit score below 700")
+    gemini_api.get_llm_cache().put(gemini_api.DEFAULT_MODEL, prompt, "Cached sentence.")
+
+    def blocking_get(*args):
+        raise AssertionError("sync cache lookup on the event loop")
+
+    monkeypatch.setattr(gemini_api.get_llm_cache(), "get", blocking_get)
+    batcher = ExplanationBatcher()
+    text = asyncio.run(batcher.explain_async("REJECT", "Credit score below 700", fallback="fallback"))
+    assert text == "Cached sentence."
+    assert batcher.stats["cache_hits"] == 1 and batcher.stats["upstream_calls"] == 0
+
+
+def test_batch_deadline_scales_and_uses_its_own_guard(model):
+    batch_model = model(BatchModel())
+    batch_model.release.set()
+    batcher = ExplanationBatcher(max_batch=4, max_wait=0.5, deadline=1.0, item_deadline=0.5)
+    items = [("REJECT", f"reason {i}") for i in range(4)]
+    shared_samples = len(llm_guard.latency.samples)
+    assert batcher.explain_many(items) == [f"Sentence {i}." for i in range(1, 5)]
+    assert batch_model.timeouts == [2.5]  # 1.0 + 3 extra items * 0.5
+    assert len(batcher.latency.samples) == 1
+    assert len(llm_guard.latency.samples) == shared_samples
+
+
+def test_failing_batches_do_not_trip_the_shared_breaker(model):
+    hanging = model(BatchModel())  # never released: every batch misses its deadline
+    batcher = ExplanationBatcher(max_batch=2, max_wait=0.5, deadline=0.1, item_deadline=0.0)
+    for i in range(llm_guard.breaker.failure_threshold):
+        assert batcher.explain_many([("REJECT", f"a{i}"), ("REJECT", f"b{i}")], ["f1", "f2"]) == ["f1", "f2"]
+    assert batcher.breaker.state == "open"
+    assert llm_guard.breaker.state == "closed"
+    hanging.release.set()
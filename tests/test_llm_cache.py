@@ -0,0 +1,102 @@
+# file: tests/test_llm_cache.py
+import asyncio
+import contextlib
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from llm_cache import LLMCache, cache_key
+
+from conftest import REPO_ROOT
+
+
+def disk_row(path, model, prompt):
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        return conn.execute("SELECT response, last_used FROM llm_cache WHERE key = ?",
+                            (cache_key(model, prompt),)).fetchone()
+
+
+def test_memory_and_disk_round_trip(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMCache(path)
+    cache.put("m", "Hello   there", "hi")
+    assert cache.get("m", "Hello there") == "hi"  # whitespace-normalized key, from memory
+    assert cache.flush()
+    cache.close()
+
+    other = LLMCache(path)  # another process, say: only the disk tier is shared
+    assert other.get("m", "Hello there") == "hi"
+    assert other.get("m", "Hello there") == "hi"
+    assert other.get("m", "unknown") is None
+    stats = other.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    other.close()
+
+
+def test_expired_entries_are_misses_and_removed(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMCache(path, ttl_seconds=-1)
+    cache.put("m", "p", "stale")
+    assert cache.get("m", "p") is None  # expired in memory
+    assert cache.flush()
+    assert cache.get("m", "p") is None  # and on disk, which drops it
+    assert cache.flush()
+    assert disk_row(path, "m", "p") is None
+    cache.close()
+
+
+def test_disk_hit_on_event_loop_reads_in_a_worker_thread(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer = LLMCache(path)
+    writer.put("m", "p", "hello")
+    writer.close()
+    written_at = disk_row(path, "m", "p")[1]
+
+    cache = LLMCache(path)
+    threads = []
+    original = cache._get_disk
+    cache._get_disk = lambda key: threads.append(threading.current_thread()) or original(key)
+
+    async def lookup():
+        return await cache.get_async("m", "p"), threading.current_thread()
+
+    time.sleep(0.01)
+    text, loop_thread = asyncio.run(lookup())
+    assert text == "hello"
+    assert threads and threads[0] is not loop_thread
+    assert asyncio.run(cache.get_async("m", "p")) == "hello"  # now from memory
+    assert len(threads) == 1
+    assert cache.flush()
+    assert disk_row(path, "m", "p")[1] > written_at  # last_used refreshed by the writer
+    cache.close()
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_memory_entries=10, max_disk_entries=100)
+    for i in range(300):
+        cache.put("m", f"prompt {i}", str(i))
+    assert cache.flush()
+    assert cache.stats()["disk_entries"] <= 110
+    assert cache.get("m", "prompt 299") == "299"
+    cache.clear()
+    assert cache.get("m", "prompt 299") is None
+    assert cache.stats()["disk_entries"] == 0
+    cache.close()
+
+
+def test_importing_the_app_opens_no_cache(tmp_path):
+    path = tmp_path / "llm_cache.sqlite"
+    code = (
+        "import threading, gemini_api, llm_guard, llm_batcher\n"
+        "print(sorted(t.name for t in threading.enumerate()))\n"
+        "gemini_api.get_llm_cache().put('m', 'p', 'r')\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True,
+                         timeout=30, env={**os.environ, "LLM_CACHE_PATH": str(path), "TRACE_FILE": ""})
+    assert out.returncode == 0, out.stderr
+    assert "llm-cache-writer" not in out.stdout.splitlines()[0]
+    assert path.exists()  # created on first use, and the queued write committed at exit
+    assert disk_row(str(path), "m", "p")[0] == "r"
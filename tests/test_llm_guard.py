@@ -0,0 +1,126 @@
+# file: tests/test_llm_guard.py
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import gemini_api
+import llm_guard
+from bench_chat_interface import REPLY, StubModel, StubResponse
+
+from conftest import REPO_ROOT
+
+
+class HangingModel:
+    """A Gemini that never answers; records the request options it was called with."""
+
+    def __init__(self):
+        self.options = []
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.options.append(request_options)
+        self.release.wait(30)
+        raise TimeoutError("no reply")
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        self.options.append(request_options)
+        await asyncio.sleep(30)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Install a model for DEFAULT_MODEL; start from a closed breaker and an empty cache."""
+    def install(model):
+        monkeypatch.setitem(gemini_api._models, gemini_api.DEFAULT_MODEL, model)
+        return model
+    gemini_api.get_llm_cache().clear()
+    llm_guard.breaker.record_success()
+    yield install
+    llm_guard.breaker.record_success()
+
+
+def test_guarded_call_answers(model):
+    model(StubModel(0.0))
+    assert llm_guard.guarded_call("hello?", "fallback", deadline=2.0) == REPLY
+
+
+def test_guarded_call_falls_back_at_deadline_with_bounded_request(model):
+    hanging = model(HangingModel())
+    start = time.monotonic()
+    assert llm_guard.guarded_call("anyone there?", "fallback", deadline=0.2) == "fallback"
+    assert time.monotonic() - start < 1.0
+    assert hanging.options[0] == {"timeout": 0.2, "retry": None}
+    hanging.release.set()
+
+
+def test_async_requests_carry_timeout_and_no_retry(model):
+    hanging = model(HangingModel())
+    result = asyncio.run(llm_guard.guarded_call_async("anyone there?", "fallback", deadline=0.2))
+    assert result == "fallback"
+    assert hanging.options[0] == {"timeout": 0.2, "retry": None}
+
+
+def test_exit_does_not_wait_for_abandoned_calls():
+    # a guarded call to a Gemini that never answers must not hold up interpreter exit
+    code = (
+        "import sys, threading; sys.path.insert(0, 'tests'); import conftest\n"
+        "import gemini_api, llm_guard\n"
+        "class Hang:\n"
+        "    def generate_content(self, prompt, stream=False, request_options=None):\n"
+        "        threading.Event().wait(60)\n"
+        "gemini_api._models[gemini_api.DEFAULT_MODEL] = Hang()\n"
+        "print(llm_guard.guarded_call('hi', 'fallback', deadline=0.2))\n"
+    )
+    start = time.monotonic()
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True,
+                         timeout=30, env={**os.environ, "TRACE_FILE": ""})
+    assert out.stdout.strip().endswith("fallback"), out.stderr
+    assert time.monotonic() - start < 15
+
+
+def stream(prompt: str, deadline: float) -> list:
+    async def collect():
+        return [chunk async for chunk in llm_guard.guarded_stream_async(prompt, "fallback", deadline=deadline)]
+    return asyncio.run(collect())
+
+
+class BreakingModel:
+    """Streams one chunk, then the connection drops."""
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        async def chunks():
+            yield StubResponse("Great, let's get")
+            raise ConnectionError("stream reset")
+        return chunks()
+
+
+def test_stream_answers_and_caches(model):
+    model(StubModel(0.05, chunks=4))
+    assert "".join(stream("stream please", 2.0)).strip() == REPLY
+    assert gemini_api.get_llm_cache().get(gemini_api.DEFAULT_MODEL, "stream please") == REPLY
+
+
+def test_stream_cut_off_at_deadline_ends_cleanly(model):
+    model(StubModel(2.0, chunks=8))
+    chunks = stream("slow stream", 0.6)
+    assert 1 < len(chunks) < 9
+    assert chunks[-1] == "…" and "fallback" not in chunks
+    assert llm_guard.breaker.failures == 0  # Gemini answered, just slowly
+    assert gemini_api.get_llm_cache().get(gemini_api.DEFAULT_MODEL, "slow stream") is None
+
+
+def test_stream_error_after_tokens_keeps_the_text(model):
+    model(BreakingModel())
+    assert stream("breaks", 2.0) == ["Great, let's get", "…"]
+    assert llm_guard.breaker.failures == 0
+
+
+def test_stream_without_tokens_falls_back_and_counts_failure(model):
+    model(HangingModel())
+    assert stream("silent", 0.2) == ["fallback"]
+    assert llm_guard.breaker.failures == 1
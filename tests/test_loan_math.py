@@ -0,0 +1,52 @@
+# file: tests/test_loan_math.py
+"""EMI values and the salary-slip decisions they lead to, pinned for reference cases."""
+
+import numpy as np
+import pytest
+
+import loan_math
+import tools
+
+
+@pytest.mark.parametrize("principal, expected", [
+    (100000, 4801.29),
+    (250000, 12003.22),
+    (500000, 24006.44),
+])
+def test_emi_at_default_terms(principal, expected):
+    # reducing balance, 14% p.a., 24 months
+    assert loan_math.emi(principal) == pytest.approx(expected, abs=0.01)
+
+
+def test_emi_other_terms_and_zero_rate():
+    assert loan_math.emi(120000, annual_rate=0.0, tenure_months=12) == pytest.approx(10000)
+    assert loan_math.emi(100000, annual_rate=0.12, tenure_months=12) == pytest.approx(8884.88, abs=0.01)
+
+
+def test_emi_broadcasts():
+    grid = loan_math.emi(np.array([100000, 250000]), tenure_months=[[12], [24]])
+    assert grid.shape == (2, 2)
+    assert grid[1, 1] == pytest.approx(12003.22, abs=0.01)
+    assert isinstance(loan_math.emi(100000), float)
+
+
+def test_max_principal_inverts_emi():
+    assert loan_math.max_principal(loan_math.emi(250000)) == pytest.approx(250000)
+
+
+def test_amortization_pays_off_principal():
+    schedule = loan_math.amortization(250000)
+    assert schedule["principal"].sum() == pytest.approx(250000)
+    assert schedule["balance"][0, -1] == pytest.approx(0, abs=1e-6)
+
+
+@pytest.mark.parametrize("loan, salary, status, emi", [
+    (100000, 20000, "APPROVED", 4801.29),
+    (200000, 20000, "APPROVED", 9602.58),
+    (250000, 20000, "REJECTED", 12003.22),  # approved under the old 2%-of-principal rule (EMI 5,000)
+    (250000, 24006.44, "APPROVED", 12003.22),  # EMI exactly half the salary
+    (250000, 24006.42, "REJECTED", 12003.22),
+])
+def test_salary_slip_decision(loan, salary, status, emi):
+    result = tools.perform_final_underwriting_with_salary(loan, salary)
+    assert (result["loan_status"], result["emi"]) == (status, emi)
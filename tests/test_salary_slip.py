@@ -0,0 +1,181 @@
+# file: tests/test_salary_slip.py
+import zipfile
+
+import pytest
+from fpdf import FPDF
+
+import salary_slip
+from salary_slip import SalarySlipError, extract_salary
+
+SHEET_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+
+
+@pytest.fixture(autouse=True)
+def cold_cache():
+    salary_slip._cache.clear()
+
+
+def write_csv(tmp_path, text, name="slip.csv"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def write_xlsx(tmp_path, sheet_xml, shared_strings=None, name="slip.xlsx"):
+    path = tmp_path / name
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("xl/worksheets/sheet1.xml", sheet_xml)
+        if shared_strings is not None:
+            zf.writestr("xl/sharedStrings.xml",
+                        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        + "".join(f"<si><t>{s}</t></si>" for s in shared_strings) + "</sst>")
+    return str(path)
+
+
+def write_pdf(tmp_path, lines, name="slip.pdf"):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    for line in lines:
+        pdf.cell(0, 10, line, new_x="LMARGIN", new_y="NEXT")
+    path = tmp_path / name
+    pdf.output(str(path))
+    return str(path)
+
+
+def write_raw_pdf(tmp_path, content: bytes, name="raw.pdf"):
+    path = tmp_path / name
+    path.write_bytes(b"%%PDF-1.4\n1 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n%%%%EOF\n"
+                     % (len(content), content))
+    return str(path)
+
+
+# ----------------------------
+# Well-formed slips
+# ----------------------------
+def test_csv_prefers_net_over_gross_and_basic(tmp_path):
+    path = write_csv(tmp_path, "Earnings,Amount\nBasic Salary,40000\nGross Salary,\"62,000\"\nNet Pay,55000.50\n")
+    result = extract_salary(path)
+    assert result["monthly_salary"] == 55000.50
+    assert result["salary_label"] == "net"
+    assert result["sha256"] == salary_slip.file_sha256(path)
+
+
+def test_csv_header_style_amount_in_next_row(tmp_path):
+    path = write_csv(tmp_path, "Employee,Gross Earnings\nA. Sharma,48000\n")
+    assert extract_salary(path)["monthly_salary"] == 48000
+
+
+def test_pdf(tmp_path):
+    path = write_pdf(tmp_path, ["ACME Pvt Ltd - Payslip", "Basic Salary: 30,000", "Net Salary: Rs. 45,500"])
+    result = extract_salary(path)
+    assert result["monthly_salary"] == 45500
+    assert result["salary_label"] == "net"
+
+
+def test_xlsx_shared_strings(tmp_path):
+    sheet = (SHEET_HEADER
+             + '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1"><v>70000</v></c></row>'
+             + '</sheetData></worksheet>')
+    path = write_xlsx(tmp_path, sheet, shared_strings=["Net Salary"])
+    assert extract_salary(path)["monthly_salary"] == 70000
+
+
+def test_result_is_cached_by_content(tmp_path):
+    a = write_csv(tmp_path, "Net Pay,51000\n", name="a.csv")
+    b = write_csv(tmp_path, "Net Pay,51000\n", name="b.csv")
+    extract_salary(a)
+    hits = salary_slip.cache_stats["hits"]
+    assert extract_salary(b)["monthly_salary"] == 51000
+    assert salary_slip.cache_stats["hits"] == hits + 1
+
+
+# ----------------------------
+# Rejected before parsing
+# ----------------------------
+def test_unsupported_type(tmp_path):
+    path = tmp_path / "slip.docx"
+    path.write_bytes(b"x")
+    with pytest.raises(SalarySlipError, match="Unsupported file type"):
+        extract_salary(str(path))
+
+
+def test_missing_and_empty_files(tmp_path):
+    with pytest.raises(SalarySlipError, match="not found"):
+        extract_salary(str(tmp_path / "nope.csv"))
+    with pytest.raises(SalarySlipError, match="empty"):
+        extract_salary(write_csv(tmp_path, ""))
+
+
+def test_too_large(tmp_path, monkeypatch):
+    monkeypatch.setattr(salary_slip, "MAX_SLIP_BYTES", 10)
+    with pytest.raises(SalarySlipError, match="too large"):
+        extract_salary(write_csv(tmp_path, "Net Pay,51000\n"))
+
+
+def test_no_salary_found(tmp_path):
+    with pytest.raises(SalarySlipError, match="Could not find a salary"):
+        extract_salary(write_csv(tmp_path, "Name,Department\nA. Sharma,Finance\n"))
+
+
+# ----------------------------
+# Malformed content: always a SalarySlipError, never a raw parser error
+# ----------------------------
+def test_pdf_not_a_pdf(tmp_path):
+    path = tmp_path / "slip.pdf"
+    path.write_bytes(b"hello, not a pdf")
+    with pytest.raises(SalarySlipError, match="not a valid PDF"):
+        extract_salary(str(path))
+
+
+def test_pdf_bad_number_operand(tmp_path):
+    path = write_raw_pdf(tmp_path, b"BT 1.2.3 4 Td (Net Pay 50000) Tj ET")
+    with pytest.raises(SalarySlipError, match="Could not read salary slip"):
+        extract_salary(path)
+
+
+def test_pdf_corrupt_deflate_stream_is_skipped(tmp_path):
+    path = tmp_path / "slip.pdf"
+    path.write_bytes(b"%PDF-1.4\n<< /Length 8 /Filter /FlateDecode >>\nstream\nnotzlib!\nendstream\n")
+    with pytest.raises(SalarySlipError, match="Could not find a salary"):
+        extract_salary(str(path))
+
+
+def test_csv_oversized_field(tmp_path):
+    path = write_csv(tmp_path, 'Net Pay,"' + "9" * 200000 + "\n")
+    with pytest.raises(SalarySlipError, match="Could not read salary slip"):
+        extract_salary(path)
+
+
+def test_xlsx_not_a_zip(tmp_path):
+    path = tmp_path / "slip.xlsx"
+    path.write_bytes(b"PK\x03\x04 truncated")
+    with pytest.raises(SalarySlipError):
+        extract_salary(str(path))
+
+
+def test_xlsx_truncated_sheet_xml(tmp_path):
+    sheet = SHEET_HEADER + '<row r="1"><c r="A1" t="inlineStr"><is><t>Net Pay</t></is></c><c r="B1"><v>7'
+    with pytest.raises(SalarySlipError, match="Could not read salary slip"):
+        extract_salary(write_xlsx(tmp_path, sheet))
+
+
+def test_xlsx_shared_string_out_of_range(tmp_path):
+    sheet = SHEET_HEADER + '<row r="1"><c r="A1" t="s"><v>5</v></c></row></sheetData></worksheet>'
+    with pytest.raises(SalarySlipError, match="Could not read salary slip"):
+        extract_salary(write_xlsx(tmp_path, sheet, shared_strings=["Net Pay"]))
+
+
+def test_xlsx_non_numeric_value(tmp_path):
+    sheet = SHEET_HEADER + '<row r="1"><c r="A1"><v>abc</v></c></row></sheetData></worksheet>'
+    with pytest.raises(SalarySlipError, match="Could not read salary slip"):
+        extract_salary(write_xlsx(tmp_path, sheet))
+
+
+def test_xlsx_without_worksheets(tmp_path):
+    path = tmp_path / "slip.xlsx"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("docProps/app.xml", "<x/>")
+    with pytest.raises(SalarySlipError, match="no worksheets"):
+        extract_salary(str(path))
@@ -0,0 +1,52 @@
+# file: tests/test_session_store.py
+import numpy as np
+import pytest
+
+from chat_session import ChatSession, Step
+from session_store import create_session_store, decode_record, encode_record
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def store(request, tmp_path):
+    target = {"memory": "", "sqlite": f":{tmp_path / 'sessions.sqlite'}", "file": f":{tmp_path / 'sessions'}"}
+    return create_session_store(request.param + target[request.param])
+
+
+def test_round_trip(store):
+    session = ChatSession(customer_name="Priya Sharma", customer_id="TC-100001", loan_amount=150000.0,
+                          step=Step.VERIFY_PHONE, history=[("hi", None), (None, "Hello!")])
+    store.save(session.session_id, session.to_state(), session.history)
+    record = store.load(session.session_id)
+    assert record["history"] == [("hi", None), (None, "Hello!")]
+    restored = ChatSession.from_record(record["state"], record["history"])
+    assert restored == session
+    assert restored.step is Step.VERIFY_PHONE
+
+
+def test_large_records_are_compressed_and_numpy_values_stored(store):
+    history = [(f"message {i}", f"reply {i}") for i in range(100)]
+    state = {"session_id": "abcdef0123456789", "loan_amount": np.float64(25000.5), "emi": np.int64(1200)}
+    blob = encode_record(state, history)
+    assert blob[:1] == b"z"  # past COMPRESS_BYTES
+    store.save("abcdef0123456789", state, history)
+    record = store.load("abcdef0123456789")
+    assert record == decode_record(blob)
+    assert record["state"]["loan_amount"] == 25000.5 and record["history"] == history
+
+
+def test_expiry_delete_and_prune(store):
+    store.save("expired-session", {"step": "done"}, [], ttl_seconds=-1)
+    store.save("live-session", {"step": "get_name"}, [])
+    assert store.load("expired-session") is None
+    assert store.load("live-session")["state"] == {"step": "get_name"}
+    assert store.prune() == 1
+    store.delete("live-session")
+    assert store.load("live-session") is None
+    assert store.stats["saves"] == 2
+
+
+def test_untrusted_session_ids(store):
+    assert store.load("../../etc/passwd") is None
+    assert store.load(None) is None
+    with pytest.raises(ValueError):
+        store.save("a/b", {}, [])
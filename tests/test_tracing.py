@@ -0,0 +1,45 @@
+# file: tests/test_tracing.py
+import re
+import urllib.request
+
+import pytest
+
+import tracing
+from tracing import BUCKETS, METRIC_NAME
+
+
+@pytest.fixture(autouse=True)
+def clean_histograms():
+    tracing.reset()
+    yield
+    tracing.reset()
+
+
+def bucket_lines(text: str, span: str) -> list:
+    pattern = re.compile(rf'^{METRIC_NAME}_bucket{{span="{re.escape(span)}",status="ok",le="([^"]+)"}} (\d+)$')
+    return [(m.group(1), int(m.group(2))) for m in map(pattern.match, text.splitlines()) if m]
+
+
+def test_every_cumulative_bucket_is_exported():
+    for seconds in (0.001, 0.001, 0.2):
+        tracing.observe("llm.stream", seconds)
+    buckets = bucket_lines(tracing.metrics_text(), "llm.stream")
+    assert len(buckets) == len(BUCKETS) + 1
+    assert [le for le, _ in buckets[:-1]] == [f"{b:.6g}" for b in BUCKETS] and buckets[-1][0] == "+Inf"
+    counts = [n for _, n in buckets]
+    assert counts == sorted(counts) and counts[0] == 0 and counts[-1] == 3
+    assert dict(buckets)[f"{BUCKETS[-1]:.6g}"] == 3
+
+
+def test_metrics_server_is_local_by_default():
+    tracing.observe("chat.get_name", 0.01)
+    server = tracing.start_metrics_server(0)
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+        assert len(bucket_lines(body, "chat.get_name")) == len(BUCKETS) + 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,109 @@
+# file: tests/test_upload_store.py
+import hashlib
+import os
+import time
+
+import pytest
+
+from salary_slip import SalarySlipError
+from upload_store import UploadStore
+
+SLIP = b"Earnings,Amount\nBasic Salary,45000\nNet Pay,40000\n"
+
+
+def write(path, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def age_file(path: str, seconds: float):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def last_used_ago(store: UploadStore, stored, seconds: float):
+    """Pretend `stored` was last uploaded `seconds` ago (in the store's index, not the file)."""
+    with store._transaction() as db:
+        db.execute("UPDATE objects SET last_used = ? WHERE name = ?",
+                   (time.time() - seconds, store._object_name(stored.path)))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UploadStore(str(tmp_path / "uploads"), retention_seconds=100, gc_interval=0, gc_grace_seconds=10)
+    yield store
+    store.close()
+
+
+def test_identical_uploads_are_stored_once(store, tmp_path):
+    first = store.put(write(tmp_path / "a.csv", SLIP), "payslip.csv")
+    second = store.put(write(tmp_path / "b.csv", SLIP), "payslip.csv")
+    assert first.sha256 == second.sha256 == hashlib.sha256(SLIP).hexdigest()
+    assert (first.deduped, second.deduped) == (False, True)
+    assert first.path == store.object_path(first.sha256, ".csv")
+    with open(first.path, "rb") as f:
+        assert f.read() == SLIP
+    assert store.usage() == {"objects": 1, "bytes": len(SLIP)}
+    assert [n for n in os.listdir(store.objects_dir) if n.startswith(".tmp")] == []
+
+
+def test_source_file_is_never_shared_or_touched(store, tmp_path):
+    src = write(tmp_path / "a.csv", SLIP)
+    age_file(src, 1000)
+    before = os.stat(src)
+    stored = store.put(src, "payslip.csv")
+    store.put(src, "payslip.csv")  # dedupe path too
+    after = os.stat(src)
+    assert after.st_nlink == 1 and after.st_mtime == before.st_mtime
+    assert not os.path.samefile(src, stored.path)
+
+    write(src, SLIP.replace(b"40000", b"99999"))  # edited in place afterwards
+    with open(stored.path, "rb") as f:
+        assert hashlib.sha256(f.read()).hexdigest() == stored.sha256
+
+
+def test_rejected_upload_leaves_nothing_behind(store, tmp_path):
+    with pytest.raises(SalarySlipError):
+        store.put(write(tmp_path / "a.csv", b"\x00binary"), "payslip.csv")
+    store.max_bytes = 1024
+    with pytest.raises(SalarySlipError):
+        store.put(write(tmp_path / "big.csv", SLIP * 100), "payslip.csv")
+    assert os.listdir(store.objects_dir) == []
+    assert store.stats["rejected"] == 2
+
+
+def test_gc_follows_the_index_not_file_times(store, tmp_path):
+    old = store.put(write(tmp_path / "a.csv", SLIP), "a.csv")
+    fresh = store.put(write(tmp_path / "b.csv", SLIP + b"Bonus,1\n"), "b.csv")
+    last_used_ago(store, old, 1000)
+    age_file(fresh.path, 1000)  # an old file, but uploaded again just now as far as the index knows
+    assert store.gc()["removed"] == 1
+    assert not os.path.exists(old.path) and os.path.exists(fresh.path)
+    assert store.usage()["objects"] == 1
+
+    again = store.put(write(tmp_path / "c.csv", SLIP), "a.csv")  # stored afresh after gc
+    assert not again.deduped and os.path.exists(again.path)
+
+
+def test_gc_removes_stray_files_after_the_grace_window(store):
+    stale_tmp = write(os.path.join(store.objects_dir, ".tmp1.2"), b"partial")
+    in_progress = write(os.path.join(store.objects_dir, ".tmp1.3"), b"partial")
+    os.makedirs(os.path.join(store.objects_dir, "ab"))
+    orphan = write(os.path.join(store.objects_dir, "ab", "ab12.csv"), SLIP)  # upload crashed before indexing
+    age_file(stale_tmp, 60)
+    age_file(orphan, 60)
+    assert store.gc()["removed"] == 2
+    assert not os.path.exists(stale_tmp) and not os.path.exists(orphan)
+    assert os.path.exists(in_progress)
+
+
+def test_background_gc(tmp_path):
+    store = UploadStore(str(tmp_path / "uploads"), retention_seconds=100, gc_interval=0.05)
+    stored = store.put(write(tmp_path / "a.csv", SLIP), "a.csv")
+    last_used_ago(store, stored, 1000)
+    deadline = time.monotonic() + 5
+    while os.path.exists(stored.path):
+        assert time.monotonic() < deadline, "background gc never ran"
+        time.sleep(0.02)
+    store.close()
@@ -1,18 +1,44 @@
 # file: tools.py
 import os
-from fpdf import FPDF
-from datetime import datetime
-from gemini_api import call_gemini
+import threading
+from llm_guard import guarded_call
 from crm_server import CRMServer
+from eligibility import MISSING, evaluate, get_eligibility_index
+import loan_math
+from name_index import get_name_index
 from credit_bureau import CreditBureau
 from offer_mart import OfferMart
+from letter_service import letter_service
+from audit_log import record_decision
+from salary_slip import extract_salary, SalarySlipError
+from upload_store import get_upload_store
+from session_io import ask, say
+from tracing import traced
 
-# Initialize mock APIs
-crm = CRMServer()
-bureau = CreditBureau()
-offers = OfferMart()
+# Mock APIs, created on first use (building them loads customers.json), so
+# importing tools stays cheap. `tools.crm` etc. still work via __getattr__.
+_SERVICE_FACTORIES = {"crm": CRMServer, "bureau": CreditBureau, "offers": OfferMart}
+_services = {}
+_services_lock = threading.Lock()
 
 
+def _service(name: str):
+    service = _services.get(name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(name)
+            if service is None:
+                service = _services[name] = _SERVICE_FACTORIES[name]()
+    return service
+
+
+def __getattr__(name):
+    if name in _SERVICE_FACTORIES:
+        return _service(name)
+    raise AttributeError(f"module 'tools' has no attribute '{name}'")
+
+
+@traced("tool.chat_with_customer")
 def chat_with_customer(prompt, conversation_history):
     """
     Generates a friendly response from the sales agent using the LLM.
@@ -29,87 +55,122 @@ def chat_with_customer(prompt, conversation_history):
     Customer said: "{prompt}"
     """
 
-    response = call_gemini(full_prompt)
+    response = guarded_call(full_prompt, fallback="Happy to help! Could you share your full name and the loan amount you need?")
     return response
 
 
+@traced("tool.resolve_customer")
+def resolve_customer(name: str) -> dict:
+    """
+    Match a typed name to one customer (typos and spacing tolerated). The
+    returned customer_id is what the CRM / bureau / offer lookups should use.
+    """
+    index = get_name_index()
+    best = index.match(name)
+    if best is None:
+        candidates = [{"customer_id": cid, "full_name": full} for cid, full, _ in index.search(name, limit=3)]
+        return {"status": "error", "message": "Customer not found", "candidates": candidates}
+    customer_id, full_name, score = best
+    return {"status": "success", "customer_id": customer_id, "full_name": full_name, "score": score}
+
+@traced("tool.verify_kyc")
 def verify_kyc(name: str) -> dict:
     """Verify customer KYC from CRM."""
-    return crm.get_kyc_details(name)
+    return _service("crm").get_kyc_details(name)
 
-def verify_phone(name: str, last4_digits: str) -> dict:
-    """Verify last 4 digits of phone number from CRM."""
-    return crm.verify_phone_last4(name, last4_digits)
+@traced("tool.verify_phone")
+def verify_phone(name: str, last4_digits: str, kyc_result: dict = None) -> dict:
+    """
+    Verify last 4 digits of phone number from CRM. Pass the verify_kyc()
+    reply as `kyc_result` to check against it without another lookup.
+    """
+    if kyc_result is not None:
+        if kyc_result.get("status") != "success":
+            return {"status": "error", "message": "Customer not found"}
+        return CRMServer.match_phone_last4(kyc_result["kyc"], last4_digits)
+    return _service("crm").verify_phone_last4(name, last4_digits)
 
+@traced("tool.fetch_credit_score")
 def fetch_credit_score(name: str) -> dict:
     """Fetch credit score from Credit Bureau."""
-    return bureau.get_credit_score(name)
+    return _service("bureau").get_credit_score(name)
 
+@traced("tool.get_offer_details")
 def get_offer_details(name: str) -> dict:
     """Fetch pre-approved limit & salary."""
-    return offers.get_offer(name)
-
-def perform_underwriting(name: str, loan_amount: float) -> dict:
+    return _service("offers").get_offer(name)
+
+@traced("tool.max_borrowable")
+def max_borrowable(name: str) -> dict:
+    """Largest loan the customer can get instantly / with a salary slip (one index lookup)."""
+    limits = get_eligibility_index().max_borrowable(name)
+    if limits is None:
+        return {"status": "error", "message": "Customer not found"}
+    return {"status": "success", **limits}
+
+@traced("tool.perform_underwriting")
+def perform_underwriting(name: str, loan_amount: float, session_id: str = None) -> dict:
     """
     Underwriting logic:
     1. Approve if loan <= pre-approved limit.
     2. If loan <= 2x limit, request salary slip and approve only if EMI <= 50% of salary.
     3. Reject if loan > 2x limit or credit score < 700.
+    The final decision is appended to the audit log (audit_log.py).
     """
-    offer = offers.get_offer(name)
-    score_info = bureau.get_credit_score(name)
+    result, salary = _underwrite_cli(name, loan_amount)
+    record_decision("perform_underwriting", name, loan_amount, result, session_id, salary=salary)
+    return result
 
-    if offer["status"] != "success" or score_info["status"] != "success":
-        return {"decision": "REJECT", "reason": "Customer data missing"}
 
-    limit = offer["limit"]
-    salary = offer["salary"]
-    score = score_info["score"]
-
-    if score < 700:
-        return {"decision": "REJECT", "reason": f"Low credit score: {score}"}
-
-    # Within pre-approved limit → approve directly
-    if loan_amount <= limit:
-        return {"decision": "APPROVE", "reason": "Within pre-approved limit"}
+def _underwrite_cli(name: str, loan_amount: float) -> tuple:
+    """(decision dict, monthly salary from the slip or None) for perform_underwriting."""
+    # thresholds are precomputed per customer (eligibility.py): one lookup
+    eligibility = get_eligibility_index().get(name)
+    if eligibility is None:
+        return dict(MISSING), None
+    outcome = eligibility.decide(loan_amount)
 
     # Above limit but ≤ 2× limit → request salary slip
-    elif loan_amount <= 2 * limit:
-        print("Loan above pre-approved limit. Please upload your salary slip to continue.")
+    if outcome["decision"] == "PAYSALARY_REQUIRED":
+        salary = eligibility.monthly_salary
+        say("Loan above pre-approved limit. Please upload your salary slip to continue.")
 
-        # Keep asking until a "file path" is provided
+        # Keep asking until a readable salary slip is provided
         slip_path = ""
         while not slip_path:
-            slip_path = input("Enter path to your salary slip file: ").strip()
+            slip_path = ask("Enter path to your salary slip file: ").strip()
             if not slip_path:
-                print(" No file provided. Please upload your salary slip to continue.")
+                say(" No file provided. Please upload your salary slip to continue.")
+                continue
+            try:
+                salary = extract_salary(slip_path)["monthly_salary"]
+            except SalarySlipError as e:
+                say(f" {e}")
+                slip_path = ""
+
+        say(f"✅ Salary slip received: {slip_path} (monthly salary ₹{salary:,.2f})")
+
+        # EMI at the standard terms (loan_math: 14% p.a., 24 months, reducing balance)
+        emi = loan_math.emi(loan_amount)
+        if emi <= loan_math.SALARY_EMI_RATIO * salary:
+            return {"decision": "APPROVE", "reason": f"EMI ₹{emi:,.2f} within 50% salary"}, salary
+        else:
+            return {"decision": "REJECT", "reason": f"EMI ₹{emi:,.2f} exceeds 50% salary"}, salary
 
-        # Simulate checking the slip (in real app, we would validate PDF/Excel)
-        print(f"✅ Salary slip received: {slip_path}")
+    return outcome, None
 
-        # EMI calculation (2 years, 14% flat interest)
-        total_repayment = loan_amount + loan_amount * 0.14 * 2
-        emi = total_repayment / 24
-        if emi <= 0.5 * salary:
-            return {"decision": "APPROVE", "reason": f"EMI ₹{emi:,.2f} within 50% salary"}
-        else:
-            return {"decision": "REJECT", "reason": f"EMI ₹{emi:,.2f} exceeds 50% salary"}
+@traced("tool.submit_sanction_letter")
+def submit_sanction_letter(name: str, amount: float, reason: str = None):
+    """
+    Queue a sanction letter PDF for rendering and return a LetterHandle at once.
+    `handle.path` is the final file path; `handle.result()` waits for the file.
+    """
+    return letter_service.submit(name, amount, reason)
 
-    else:
-        return {"decision": "REJECT", "reason": "Loan exceeds 2× pre-approved limit"}
-
-def generate_sanction_letter(name: str, amount: float) -> str:
-    """Generate a simple sanction letter PDF."""
-    file_name = f"Sanction_Letter_{name.replace(' ', '_')}.pdf"
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, "Loan Sanction Letter", ln=True, align="C")
-    pdf.cell(200, 10, f"Date: {datetime.now().strftime('%Y-%m-%d')}", ln=True)
-    pdf.cell(200, 10, f"Customer: {name}", ln=True)
-    pdf.cell(200, 10, f"Approved Amount: INR{amount:,.2f}", ln=True)
-    pdf.multi_cell(0, 10, "Your loan application has been approved based on your credit and income profile.")
-    pdf.output(file_name)
+@traced("tool.generate_sanction_letter")
+def generate_sanction_letter(name: str, amount: float, reason: str = None) -> str:
+    """Generate a simple sanction letter PDF (waits for it to be written)."""
+    file_name = submit_sanction_letter(name, amount, reason).result()
     print(f"[PDF] Created {file_name}")
     return file_name
 
@@ -119,98 +180,104 @@ def upload_salary_slip() -> str:
     - For CLI: asks for a file path and checks existence.
     - Returns file path if valid, else None.
     """
-    print("📤 Please upload your salary slip file (PDF or image).")
+    say("📤 Please upload your salary slip file (PDF or image).")
     while True:
-        file_path = input("Enter the path to your salary slip file: ").strip()
+        file_path = ask("Enter the path to your salary slip file: ").strip()
         if os.path.exists(file_path):
-            print(f"✅ Salary slip uploaded successfully: {file_path}")
+            say(f"✅ Salary slip uploaded successfully: {file_path}")
             return file_path
         else:
-            print(" File not found. Please try again.")
+            say(" File not found. Please try again.")
 
 # Inside tools.py
-def perform_final_underwriting_with_salary(loan_amount, salary):
+@traced("tool.perform_final_underwriting_with_salary")
+def perform_final_underwriting_with_salary(loan_amount, salary, name: str = None, session_id: str = None):
     """
-    Approves the loan if estimated EMI ≤ 50% of monthly salary.
-    EMI is roughly estimated as 0.02 * loan_amount (2% of loan as monthly EMI)
+    Approves the loan if EMI ≤ 50% of monthly salary (same EMI as
+    perform_underwriting: loan_math at the standard terms). The decision is
+    appended to the audit log under `name`.
     """
-    emi = 0.02 * loan_amount
-    if emi <= 0.5 * salary:
-        return {
+    emi = round(loan_math.emi(loan_amount), 2)
+    if emi <= loan_math.SALARY_EMI_RATIO * salary:
+        result = {
             "loan_status": "APPROVED",
             "emi": emi,
             "reason": f"EMI ₹{emi:.2f} ≤ 50% of salary ₹{salary:.2f}"
         }
     else:
-        return {
+        result = {
             "loan_status": "REJECTED",
             "emi": emi,
             "reason": f"EMI ₹{emi:.2f} exceeds 50% of salary ₹{salary:.2f}"
         }
+    record_decision("perform_final_underwriting_with_salary", name, loan_amount, result, session_id,
+                    salary=salary)
+    return result
     
     
+@traced("tool.process_uploaded_salary_slip")
 def process_uploaded_salary_slip(uploaded_file):
     """
     Handles salary slip uploaded via Gradio.
     `uploaded_file` is either:
       - a string path, or
       - a Gradio file object with `.name` or `.tmp_path`.
+    The slip goes into the content-addressed upload store (upload_store.py),
+    which checks size and type before storing and hashes it on the way in;
+    the stored copy is then parsed with that hash.
     """
-    import os, shutil
-
     # Check if it's a Gradio file object
     if isinstance(uploaded_file, dict) and "name" in uploaded_file and "tmp_path" in uploaded_file:
-        src_path = uploaded_file["tmp_path"]
-        dest_path = f"./uploads/{uploaded_file['name']}"
-        os.makedirs("./uploads", exist_ok=True)
-        shutil.copy(src_path, dest_path)
-        uploaded_file_path = dest_path
+        src_path, name = uploaded_file["tmp_path"], uploaded_file["name"]
     else:
-        uploaded_file_path = uploaded_file  # assume normal path
+        src_path = getattr(uploaded_file, "name", uploaded_file)  # plain path or tempfile wrapper
+        name = src_path
 
-    # Dummy: extract monthly_salary (replace with real parsing)
-    monthly_salary = 50000  # mock value
+    try:
+        stored = get_upload_store().put(src_path, name)
+        salary_info = extract_salary(stored.path, sha256=stored.sha256, file_type=stored.file_type)
+    except SalarySlipError as e:
+        return {"status": "error", "message": str(e)}
 
     return {
         "status": "success",
-        "file_name": uploaded_file_path,
-        "salary_info": {"monthly_salary": monthly_salary}
+        "file_name": stored.path,
+        "salary_info": salary_info,
     }
 
 
 # tools.py (add this function for Gradio)
-def perform_underwriting_gradio(name: str, loan_amount: float) -> dict:
+@traced("tool.perform_underwriting_gradio")
+def perform_underwriting_gradio(name: str, loan_amount: float, profile: dict = None,
+                                session_id: str = None) -> dict:
     """
     Gradio-friendly underwriting:
     - Approve if loan <= pre-approved limit.
     - If loan <= 2x limit, request salary slip (PAYSALARY_REQUIRED).
     - Reject if loan > 2x limit or credit score < 700.
+    With a prefetched `profile` (prefetch.py) this is pure computation. The
+    decision is appended to the audit log.
     """
-    offer = offers.get_offer(name)
-    score_info = bureau.get_credit_score(name)
-
-    if offer["status"] != "success" or score_info["status"] != "success":
-        return {"decision": "REJECT", "reason": "Customer data missing"}
+    result = _underwrite_gradio(name, loan_amount, profile)
+    record_decision("perform_underwriting_gradio", name, loan_amount, result, session_id)
+    return result
 
-    limit = offer["limit"]
-    salary = offer["salary"]
-    score = score_info["score"]
 
-    if score < 700:
-        return {"decision": "REJECT", "reason": f"Low credit score: {score}"}
-
-    # Within pre-approved limit → approve directly
-    if loan_amount <= limit:
-        return {"decision": "APPROVE", "reason": "Within pre-approved limit"}
-
-    # Above limit but ≤ 2× limit → request salary slip
-    elif loan_amount <= 2 * limit:
-        # Return special decision to trigger payslip upload in Gradio
-        return {
-            "decision": "PAYSALARY_REQUIRED",
-            "reason": "Loan above pre-approved limit. Requires salary slip."
-        }
-
-    # Above 2× limit → reject
+def _underwrite_gradio(name: str, loan_amount: float, profile: dict) -> dict:
+    if profile is None:
+        # precomputed thresholds (eligibility.py): one lookup, no service calls
+        eligibility = get_eligibility_index().get(name)
     else:
-        return {"decision": "REJECT", "reason": "Loan exceeds 2× pre-approved limit"}
+        offer, score_info = profile["offer"], profile["score"]
+        if offer["status"] != "success" or score_info["status"] != "success":
+            eligibility = None
+        else:
+            eligibility = evaluate(None, score_info["score"], offer["limit"], offer["salary"])
+    if eligibility is None:
+        return dict(MISSING)
+
+    result = eligibility.decide(loan_amount)
+    if result["decision"] == "REJECT" and not eligibility.reject_reason:
+        # over the ceiling: tell the customer what they could borrow instead
+        result["max_borrowable"] = eligibility.max_borrowable()
+    return result
@@ -0,0 +1,334 @@
+# file: tracing.py
+"""
+Lightweight span tracing for the agent graph, the Gradio chat handler and
+the tools.
+
+    with span("tool.verify_kyc", customer=name):
+        ...
+
+    @traced("node.sales")
+    def sales_agent(state): ...
+
+Every finished span:
+- is counted in a per-name latency histogram (fixed log-spaced buckets, so
+  recording is one bisect and one increment under a lock), exported as
+  Prometheus text with p50/p95/p99 estimates (`metrics_text()`, or over HTTP
+  with `start_metrics_server()`),
+- is queued for the JSONL trace file when TRACE_FILE is set (off by
+  default; sampled by TRACE_SAMPLE_RATE). A background thread writes the
+  queue in batches and rotates the file at TRACE_MAX_BYTES; when the queue
+  is full, spans are dropped (and counted) rather than slowing the caller
+  down.
+
+Parent/child links come from a contextvar, so nesting works across threads'
+own call stacks and across awaits in asyncio tasks. A span has to end in the
+context it started in, so don't keep one open across a `yield` in an async
+generator (its next step may run in another task): wrap the work between
+yields instead, as gradio_app.chat_interface does.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+TRACE_FILE = os.getenv("TRACE_FILE", "")  # e.g. traces.jsonl; "" = no trace file
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", 50 * 1024 * 1024))
+TRACE_QUEUE_SIZE = 10000
+METRIC_NAME = "smartloan_span_duration_seconds"
+
+# bucket upper bounds in seconds: 50µs × 2^(i/4), up to ~50s (≤19% wide each)
+BUCKETS = [50e-6 * 2 ** (i / 4) for i in range(81)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+# ----------------------------
+# Histograms
+# ----------------------------
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot = +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * ((rank - seen) / n)
+            seen += n
+        return BUCKETS[-1]
+
+
+_histograms = {}  # (span name, status) -> Histogram
+_hist_lock = threading.Lock()
+
+
+def _observe(name: str, status: str, seconds: float):
+    key = (name, status)
+    with _hist_lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = Histogram()
+        h.observe(seconds)
+
+
+def observe(name: str, seconds: float, status: str = "ok"):
+    """Record a latency measured outside a span (e.g. time to first token) in `name`'s histogram."""
+    _observe(name, status, seconds)
+
+
+def snapshot() -> dict:
+    """{(name, status): {"count", "sum", "p50", "p95", "p99"}} for every span name seen."""
+    with _hist_lock:
+        return {
+            key: {"count": h.count, "sum": h.sum,
+                  **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}}
+            for key, h in _histograms.items()
+        }
+
+
+def reset():
+    with _hist_lock:
+        _histograms.clear()
+
+
+# ----------------------------
+# JSONL export
+# ----------------------------
+class TraceWriter:
+    """Background thread that appends queued span records to a JSONL file."""
+
+    def __init__(self, path: str, max_bytes: int = TRACE_MAX_BYTES, queue_size: int = TRACE_QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: dict):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until everything queued so far is on disk."""
+        done = threading.Event()
+        self.queue.put(done, timeout=timeout)
+        done.wait(timeout)
+
+    def _run(self):
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < 1000:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                lines = []
+                written = 0
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        f.write("".join(lines))
+                        f.flush()
+                        lines = []
+                        item.set()
+                    else:
+                        lines.append(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                        written += 1
+                if lines:
+                    f.write("".join(lines))
+                    f.flush()
+                self.written += written
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    os.replace(self.path, self.path + ".1")
+                    f = open(self.path, "a", encoding="utf-8")
+        except Exception as e:
+            print(f"[Tracing] Trace writer stopped: {e}")
+        finally:
+            f.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    if _writer is None and TRACE_FILE:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TraceWriter(TRACE_FILE)
+    return _writer
+
+
+def flush():
+    if _writer is not None:
+        _writer.flush()
+
+
+# ----------------------------
+# Spans
+# ----------------------------
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "sampled")
+
+    def __init__(self, name, trace_id, span_id, parent_id, attrs, sampled):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.sampled = sampled
+
+    def set(self, key: str, value):
+        self.attrs[key] = value
+
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block of code as a span named `name`; yields the Span (use .set() to add attributes)."""
+    parent = _current_span.get()
+    if parent is None:
+        trace_id = "%016x" % random.getrandbits(64)
+        sampled = TRACE_SAMPLE_RATE >= 1.0 or random.random() < TRACE_SAMPLE_RATE
+    else:
+        trace_id, sampled = parent.trace_id, parent.sampled
+    s = Span(name, trace_id, "%016x" % random.getrandbits(64),
+             parent.span_id if parent is not None else None, attrs, sampled)
+    token = _current_span.set(s)
+    status = "ok"
+    start_wall = time.time()
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        status = "error"
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        _observe(name, status, duration)
+        if sampled:
+            writer = _get_writer()
+            if writer is not None:
+                writer.emit({
+                    "trace_id": s.trace_id, "span_id": s.span_id, "parent_id": s.parent_id,
+                    "name": name, "start": round(start_wall, 6),
+                    "duration_ms": round(duration * 1000, 3), "status": status,
+                    "pid": os.getpid(), "attrs": s.attrs,
+                })
+
+
+def traced(name: str = None):
+    """Decorator: run every call of the function (sync or async) inside a span."""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ----------------------------
+# Prometheus export
+# ----------------------------
+def _labels(name, status, **extra):
+    labels = f'span="{name}",status="{status}"'
+    for key, value in extra.items():
+        labels += f',{key}="{value}"'
+    return labels
+
+
+def metrics_text() -> str:
+    """All span histograms in the Prometheus text exposition format."""
+    with _hist_lock:
+        items = sorted((key, list(h.counts), h.count, h.sum, [h.quantile(q) for q in QUANTILES])
+                       for key, h in _histograms.items())
+    lines = [
+        f"# HELP {METRIC_NAME} Span latency in seconds.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for (name, status), counts, count, total, _ in items:
+        cumulative = 0
+        # every bucket, empty or not: Prometheus needs the same `le` series in every scrape
+        for bound, n in zip(BUCKETS, counts):
+            cumulative += n
+            lines.append(f"{METRIC_NAME}_bucket{{{_labels(name, status, le=f'{bound:.6g}')}}} {cumulative}")
+        lines.append(f"{METRIC_NAME}_bucket{{{_labels(name, status, le='+Inf')}}} {count}")
+        lines.append(f"{METRIC_NAME}_sum{{{_labels(name, status)}}} {total:.6f}")
+        lines.append(f"{METRIC_NAME}_count{{{_labels(name, status)}}} {count}")
+
+    lines.append(f"# HELP {METRIC_NAME}_quantile Estimated span latency quantiles in seconds.")
+    lines.append(f"# TYPE {METRIC_NAME}_quantile gauge")
+    for (name, status), _, _, _, quantiles in items:
+        for q, value in zip(QUANTILES, quantiles):
+            lines.append(f"{METRIC_NAME}_quantile{{{_labels(name, status, quantile=q)}}} {value:.6f}")
+
+    writer = _writer
+    lines.append("# TYPE smartloan_trace_spans_dropped_total counter")
+    lines.append(f"smartloan_trace_spans_dropped_total {writer.dropped if writer else 0}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """Serve GET /metrics from a daemon thread (local-only unless `host` says otherwise); returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood the console
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"[Tracing] Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,278 @@
+# file: upload_store.py
+"""
+Content-addressed store for uploaded salary slips.
+
+- Each upload is read exactly once: it is streamed into a temp file inside
+  the store while the SHA-256 is computed, and that hash names the stored
+  object (uploads/objects/ab/<sha256><ext>). Identical slips are stored
+  once, and two uploads that happen to share a file name can no longer
+  overwrite each other.
+- The store only ever keeps its own copies. The caller's file is read,
+  never linked or touched, so editing or deleting it later can't change an
+  object under its hash.
+- Type and size are checked before the copy starts: the extension and
+  file size come from metadata, and the first bytes must look like the
+  claimed type. The streaming copy also stops as soon as a file grows
+  past the limit.
+- When each object was last uploaded is kept in the store's own index
+  (uploads/index.sqlite), which every worker process shares. Objects not
+  uploaded again within UPLOAD_RETENTION_SECONDS are removed by gc(), which
+  a background thread runs every UPLOAD_GC_INTERVAL_SECONDS. put() names
+  an object and gc() removes one inside a write transaction on that index,
+  so an upload that just matched an object can't lose it to a concurrent
+  gc. Files the index doesn't know (temp files, or an object whose upload
+  crashed before committing) are removed once they are older than
+  UPLOAD_GC_GRACE_SECONDS.
+
+    stored = get_upload_store().put(tmp_path, "slip.pdf")
+    extract_salary(stored.path, sha256=stored.sha256, file_type=stored.file_type)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from salary_slip import MAX_SLIP_BYTES, SalarySlipError, check_slip_file
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_RETENTION_SECONDS = float(os.getenv("UPLOAD_RETENTION_SECONDS", 30 * 24 * 3600))
+UPLOAD_GC_INTERVAL_SECONDS = float(os.getenv("UPLOAD_GC_INTERVAL_SECONDS", 3600))
+UPLOAD_GC_GRACE_SECONDS = float(os.getenv("UPLOAD_GC_GRACE_SECONDS", 3600))
+CHUNK_BYTES = 256 * 1024
+GC_BATCH = 500  # objects removed per index transaction, so uploads aren't held up for a whole pass
+
+
+@dataclass
+class StoredUpload:
+    sha256: str
+    path: str        # the stored object; parse this one
+    file_type: str   # ".pdf", ".csv" or ".xlsx"
+    size: int
+    deduped: bool    # the same content was already stored
+
+
+# ----------------------------
+# Type sniffing
+# ----------------------------
+def _looks_like(file_type: str, head: bytes) -> bool:
+    """Does the start of the file match its extension?"""
+    if file_type == ".pdf":
+        return head.lstrip(b"\x00\t\n\r ").startswith(b"%PDF-")
+    if file_type == ".xlsx":
+        return head.startswith(b"PK\x03\x04")
+    # CSV: text, so no NUL bytes (rules out binaries renamed to .csv)
+    return b"\x00" not in head
+
+
+class UploadStore:
+    def __init__(self, directory: str = UPLOAD_DIR, retention_seconds: float = UPLOAD_RETENTION_SECONDS,
+                 max_bytes: int = MAX_SLIP_BYTES, gc_interval: float = UPLOAD_GC_INTERVAL_SECONDS,
+                 gc_grace_seconds: float = UPLOAD_GC_GRACE_SECONDS):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.retention_seconds = retention_seconds
+        self.max_bytes = max_bytes
+        self.gc_interval = gc_interval
+        self.gc_grace_seconds = gc_grace_seconds
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.sqlite")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._db().execute("PRAGMA journal_mode=WAL")
+        self._db().execute("CREATE TABLE IF NOT EXISTS objects ("
+                           "name TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db().execute("CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used)")
+        self._lock = threading.Lock()
+        self.stats = {"uploads": 0, "deduped": 0, "copied": 0, "rejected": 0,
+                      "bytes_in": 0, "bytes_stored": 0, "gc_removed": 0}
+        self._stop = threading.Event()
+        if gc_interval > 0:
+            threading.Thread(target=self._gc_loop, name="upload-gc", daemon=True).start()
+
+    def object_path(self, sha256: str, file_type: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256 + file_type)
+
+    def put(self, src_path: str, name: str = None) -> StoredUpload:
+        """
+        Store the file at `src_path` (`name` is the client's file name; its
+        extension gives the type). Raises SalarySlipError for files that are
+        missing, empty, too large or not what their extension says.
+        """
+        tmp_path = os.path.join(self.objects_dir, f".tmp{os.getpid()}.{threading.get_ident()}")
+        try:
+            file_type = self._check(src_path, name)
+            with open(tmp_path, "wb") as dst:
+                sha256, size = self._copy(src_path, dst)
+            stored = self._commit(tmp_path, sha256, file_type, size)
+        except SalarySlipError:
+            self._count("rejected")
+            raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._count("uploads")
+        self._count("bytes_in", stored.size)
+        return stored
+
+    def close(self):
+        """Stop the background gc."""
+        self._stop.set()
+
+    def _check(self, src_path: str, name: str) -> str:
+        # size and extension from metadata, then the first bytes; nothing copied yet
+        file_type = check_slip_file(src_path, os.path.splitext(name or src_path)[1])
+        with open(src_path, "rb") as f:
+            head = f.read(512)
+        if not _looks_like(file_type, head):
+            raise SalarySlipError(f"The file does not look like a {file_type[1:].upper()} file.")
+        return file_type
+
+    def _copy(self, src_path: str, dst) -> tuple:
+        """Stream src_path into `dst`; (sha256, size) of the bytes written, stopping at max_bytes."""
+        digest, size = hashlib.sha256(), 0
+        with open(src_path, "rb") as src:
+            for chunk in iter(lambda: src.read(CHUNK_BYTES), b""):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise SalarySlipError(f"File is too large; the limit is {self.max_bytes // 1024} KB.")
+                digest.update(chunk)
+                dst.write(chunk)
+        return digest.hexdigest(), size
+
+    def _commit(self, tmp_path: str, sha256: str, file_type: str, size: int) -> StoredUpload:
+        # the copy is hashed; now give it its name, unless that content is already here
+        path = self.object_path(sha256, file_type)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._transaction() as db:
+            deduped = os.path.exists(path)
+            if not deduped:
+                os.replace(tmp_path, path)
+            db.execute("INSERT OR REPLACE INTO objects (name, size, last_used) VALUES (?, ?, ?)",
+                       (self._object_name(path), size, time.time()))
+        if not deduped:
+            self._count("copied")
+        return self._stored(sha256, path, file_type, size, deduped=deduped)
+
+    def _object_name(self, path: str) -> str:
+        return os.path.relpath(path, self.objects_dir).replace(os.sep, "/")
+
+    def _db(self) -> sqlite3.Connection:
+        # one connection per thread (they go away with it); transactions are explicit
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self._index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL: no fsync per upload; only last-use times at risk
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction on the index: one at a time across every thread and process."""
+        db = self._db()
+        # threads of this process queue here rather than in SQLite's sleeping busy handler
+        with self._write_lock:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _stored(self, sha256, path, file_type, size, deduped) -> StoredUpload:
+        if deduped:
+            self._count("deduped")
+        else:
+            self._count("bytes_stored", size)
+        return StoredUpload(sha256=sha256, path=path, file_type=file_type, size=size, deduped=deduped)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # ----------------------------
+    # Retention
+    # ----------------------------
+    def gc(self, now: float = None) -> dict:
+        """Remove objects not uploaded within retention_seconds, and stale files the index doesn't know."""
+        now = now or time.time()
+        cutoff = now - self.retention_seconds
+        removed, freed = 0, 0
+        while True:
+            with self._transaction() as db:
+                rows = db.execute("SELECT name, size FROM objects WHERE last_used < ? LIMIT ?",
+                                  (cutoff, GC_BATCH)).fetchall()
+                for name, size in rows:
+                    try:
+                        os.remove(os.path.join(self.objects_dir, name))
+                    except FileNotFoundError:
+                        pass
+                    removed += 1
+                    freed += size
+                db.executemany("DELETE FROM objects WHERE name = ?", [(name,) for name, _ in rows])
+            if len(rows) < GC_BATCH:
+                break
+        strays, stray_bytes = self._remove_strays(now - self.gc_grace_seconds)
+        removed += strays
+        freed += stray_bytes
+        self._count("gc_removed", removed)
+        if removed:
+            print(f"[Uploads] GC removed {removed} slips ({freed // 1024} KB)")
+        return {"removed": removed, "bytes_freed": freed}
+
+    def _remove_strays(self, before: float) -> tuple:
+        """Temp files and unindexed objects last written before `before` (the store's own files)."""
+        removed, freed = 0, 0
+        for root, _, files in os.walk(self.objects_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    if st.st_mtime >= before:
+                        continue  # being written, or about to be indexed
+                    if name.startswith(".tmp"):
+                        os.remove(path)  # left behind by a crashed upload
+                    else:
+                        with self._transaction() as db:
+                            known = db.execute("SELECT 1 FROM objects WHERE name = ?",
+                                               (self._object_name(path),)).fetchone()
+                            if known:
+                                continue
+                            os.remove(path)
+                    removed += 1
+                    freed += st.st_size
+                except FileNotFoundError:
+                    pass
+        return removed, freed
+
+    def _gc_loop(self):
+        while not self._stop.wait(self.gc_interval):
+            try:
+                self.gc()
+            except (OSError, sqlite3.Error) as e:
+                print(f"[Uploads] GC failed: {e}")
+
+    def usage(self) -> dict:
+        """Objects in the store and the bytes they occupy."""
+        count, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        return {"objects": count, "bytes": size}
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """The process-wide store under UPLOAD_DIR, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = UploadStore()
+    return _store